@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - LAN Pipelining Benchmark
+Measures REREAD? samples per second for different pipeline windows against a
+local TCP stand-in that delays each reply to mimic a network round trip
+"""
+
+import time
+import sys
+import os
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_lan_reader import REPLIES, open_standin
+
+
+def run(window, latency, duration):
+    """Return samples per second for the given pipeline window"""
+    m2000 = open_standin(REPLIES['reread'], latency)
+    count = 0
+    start = time.perf_counter()
+    try:
+        for _ in m2000.query_pipelined(itertools.repeat('REREAD?'), window=window):
+            count += 1
+            if time.perf_counter() - start >= duration:
+                break
+    finally:
+        m2000.socket.close()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 LAN pipelining benchmark')
+    parser.add_argument('--latency', type=float, default=2.0,
+                       help='Simulated round trip in milliseconds (default: 2.0)')
+    parser.add_argument('--duration', type=float, default=2.0,
+                       help='Seconds per measurement (default: 2.0)')
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                       help='Pipeline windows to test (default: 1 2 4 8 16)')
+    args = parser.parse_args()
+
+    print(f"Simulated round trip: {args.latency:.1f} ms")
+    print(f"{'Window':>6} {'Samples/s':>12} {'Speedup':>8}")
+    baseline = None
+    for window in args.windows:
+        rate = run(window, args.latency / 1000.0, args.duration)
+        baseline = baseline or rate
+        print(f"{window:>6} {rate:>12.0f} {rate / baseline:>7.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
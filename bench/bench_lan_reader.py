@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - LAN Reader Benchmark
+Compares the buffered LAN response reader against the old one-recv()-per-byte
+reader using a local TCP stand-in for the instrument
+"""
+
+import socket
+import threading
+import queue
+import time
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2000_lan import M2000_LAN
+
+
+# Typical replies: REREAD? of CH1 V/A/W and a HISTORYDATA?-sized reply (~7 KB)
+REPLIES = {
+    'reread': b'+2.30450E+2,+1.23400E-3,+2.84200E-1\r\n',
+    'historydata': (b','.join([b'1,+2.30450E+2'] * 512) + b'\r\n'),
+}
+
+
+def start_standin(reply, latency=0.0):
+    """
+    Start a TCP server answering every received line with a fixed reply
+
+    Args:
+        reply: Bytes sent back for each line
+        latency: Seconds each reply is held back, to mimic a network round trip
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+
+    def serve():
+        conn, _ = server.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        due = queue.Queue()
+
+        def sender():
+            # Replies leave in order, each no earlier than its due time
+            while True:
+                send_at = due.get()
+                if send_at is None:
+                    return
+                delay = send_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    conn.sendall(reply)
+                except OSError:
+                    return
+
+        if latency > 0:
+            threading.Thread(target=sender, daemon=True).start()
+        with conn, conn.makefile('rb') as reader:
+            for _ in reader:
+                if latency > 0:
+                    due.put(time.perf_counter() + latency)
+                else:
+                    conn.sendall(reply)
+        due.put(None)
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def legacy_read_response(m2000):
+    """Original M2000_LAN.read_response - one recv() syscall per byte"""
+    response = ""
+    while True:
+        data = m2000.socket.recv(1).decode('ascii')
+        if not data:
+            break
+        if data == '\n':
+            break
+        if data != '\r':
+            response += data
+    return response
+
+
+def open_standin(reply, latency=0.0):
+    """Create an M2000_LAN attached to a fresh stand-in (skips *RST/*IDN? setup)"""
+    port = start_standin(reply, latency)
+    m2000 = M2000_LAN(host='127.0.0.1', port=port)
+    m2000.socket = socket.create_connection(('127.0.0.1', port))
+    m2000.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    m2000.socket.settimeout(m2000.timeout)
+    m2000.connected = True
+    return m2000
+
+
+def run(reply, reader, duration):
+    """Return replies per second for the given reader function"""
+    m2000 = open_standin(reply)
+    expected = reply.rstrip(b'\r\n').decode('ascii')
+    count = 0
+    start = time.perf_counter()
+    try:
+        while time.perf_counter() - start < duration:
+            m2000.send_command('REREAD?')
+            if reader(m2000) != expected:
+                raise Exception("Reply mismatch")
+            count += 1
+    finally:
+        m2000.socket.close()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 LAN reader benchmark')
+    parser.add_argument('--duration', type=float, default=2.0,
+                       help='Seconds per measurement (default: 2.0)')
+    args = parser.parse_args()
+
+    print(f"{'Reply':<12} {'Bytes':>6} {'recv(1)':>12} {'buffered':>12} {'Speedup':>8}")
+    for name, reply in REPLIES.items():
+        legacy = run(reply, legacy_read_response, args.duration)
+        buffered = run(reply, M2000_LAN.read_response, args.duration)
+        print(f"{name:<12} {len(reply):>6} {legacy:>10.0f}/s {buffered:>10.0f}/s {buffered / legacy:>7.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
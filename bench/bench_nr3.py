@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - NR3 Decoding Benchmark
+Rows per second for the original split/float()/dict parsing, the compiled
+QueryPlan tuple parser and the NumPy NR3Decoder batch path
+"""
+
+import random
+import time
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2000_plan import compile_plan
+from m2000_nr3 import NR3Decoder, np
+
+
+def make_responses(rows, fields, seed=1):
+    """Synthetic REREAD? responses in fixed 11-character NR3 format"""
+    rng = random.Random(seed)
+    responses = []
+    for _ in range(rows):
+        values = []
+        for _ in range(fields):
+            mantissa = rng.randint(0, 999999)
+            exponent = rng.choice([-6, -3, 0, 3])
+            values.append(f"{rng.choice('+-')}{mantissa // 100000}.{mantissa % 100000:05d}"
+                          f"E{'+' if exponent >= 0 else '-'}{abs(exponent)}")
+        responses.append(",".join(values))
+    return responses
+
+
+def legacy_parse(response, channels, parameters):
+    """Parsing as originally done in get_measurement/stream_data"""
+    values = response.split(',')
+    results = {}
+    idx = 0
+    for param in parameters:
+        for channel in channels:
+            if idx < len(values):
+                try:
+                    results[f"{channel}_{param}"] = float(values[idx])
+                except ValueError:
+                    results[f"{channel}_{param}"] = values[idx]
+                idx += 1
+    return results
+
+
+def timed(func, rows):
+    start = time.perf_counter()
+    func()
+    return rows / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 NR3 decoding benchmark')
+    parser.add_argument('--rows', type=int, default=20000,
+                       help='Responses to decode (default: 20000)')
+    parser.add_argument('--batch', type=int, default=1000,
+                       help='Responses per NR3Decoder batch (default: 1000)')
+    args = parser.parse_args()
+
+    channels = ['CH1', 'CH2', 'CH3', 'CH4']
+    parameters = ['V', 'A', 'W']
+    plan = compile_plan(channels, parameters)
+    responses = make_responses(args.rows, len(plan))
+
+    results = {
+        'legacy dict': timed(lambda: [legacy_parse(r, channels, parameters) for r in responses], args.rows),
+        'plan tuple': timed(lambda: [plan.parse_values(r) for r in responses], args.rows),
+    }
+
+    if np is not None:
+        decoder = NR3Decoder(len(plan), capacity=args.batch)
+        single = NR3Decoder(len(plan), capacity=1)
+        results['nr3 single'] = timed(lambda: [single.decode(r) for r in responses], args.rows)
+
+        def batched():
+            for i in range(0, len(responses), args.batch):
+                decoder.decode_many(responses[i:i + args.batch])
+        results[f'nr3 batch {args.batch}'] = timed(batched, args.rows)
+
+    print(f"{args.rows} responses x {len(plan)} fields")
+    baseline = results['legacy dict']
+    for name, rate in results.items():
+        print(f"{name:<16} {rate:>12.0f} rows/s {rate / baseline:>7.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
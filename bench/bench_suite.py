@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Acquisition Benchmark Suite
+Runs every interface driver against its local stand-in (LAN simulator, pty
+serial port, fake hid) and measures connect time, single-query latency,
+sustained stream_data rate, CPU per sample and memory growth. Results are
+written as JSON and can be compared against a stored baseline; the exit code
+is 1 when a metric regressed beyond the tolerance.
+"""
+
+import contextlib
+import json
+import platform
+import threading
+import time
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2000_emulators import SerialStandin, install_fake_hid
+from m2000_plan import compile_plan
+from m2000_simulator import SimulatorServer
+from m2000_stats import LatencyHistogram
+
+TRANSPORTS = ('lan', 'rs232', 'usb')
+
+# Metric -> (better direction, absolute difference always tolerated)
+METRICS = {
+    'connect_cold_ms': ('lower', 5.0),
+    'connect_warm_ms': ('lower', 1.0),
+    'query_p50_ms': ('lower', 0.05),
+    'query_p99_ms': ('lower', 0.5),
+    'stream_rate_hz': ('higher', 1.0),
+    'cpu_per_sample_us': ('lower', 5.0),
+    'memory_growth_kb_per_min': ('lower', 512.0),
+}
+
+
+@contextlib.contextmanager
+def standin(transport, baudrate=115200, report_interval=0.001):
+    """
+    Run a local stand-in for one transport
+
+    Yields:
+        Callable returning a new, unconnected driver for the stand-in
+    """
+    if transport == 'lan':
+        from m2000_lan import M2000_LAN
+        server = SimulatorServer(port=0)
+        port = server.start_in_thread()
+        try:
+            yield lambda: M2000_LAN('127.0.0.1', port)
+        finally:
+            server.stop()
+    elif transport == 'rs232':
+        from m2000_rs232 import M2000_RS232
+        with SerialStandin(baudrate) as serial_standin:
+            yield lambda: M2000_RS232(serial_standin.port, baudrate)
+    elif transport == 'usb':
+        install_fake_hid(report_interval=report_interval)
+        from m2000_usb import M2000_USB
+        yield M2000_USB
+    else:
+        raise ValueError(f"Unknown transport {transport!r}, expected one of {TRANSPORTS}")
+
+
+@contextlib.contextmanager
+def quiet():
+    """Send the drivers' per-sample output to /dev/null (a StringIO would grow)"""
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        yield
+
+
+def rss_kb():
+    """Current resident set size in KB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Peak, not current
+
+
+class MemorySampler:
+    def __init__(self, interval=0.5):
+        """Background thread sampling RSS, for growth over a run"""
+        self.interval = interval
+        self.samples = []  # (seconds, KB)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        self.thread = threading.Thread(target=self._run, name='MemorySampler', daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.samples.append((time.monotonic() - self.start, rss_kb()))
+
+    def _run(self):
+        while True:
+            self.samples.append((time.monotonic() - self.start, rss_kb()))
+            if self.stop_event.wait(self.interval):
+                return
+
+    def growth_kb_per_min(self):
+        """Least-squares slope of RSS over the run, ignoring the first fifth (warm-up)"""
+        samples = self.samples[len(self.samples) // 5:]
+        if len(samples) < 2:
+            return 0.0
+        n = len(samples)
+        mean_t = sum(t for t, _ in samples) / n
+        mean_m = sum(m for _, m in samples) / n
+        var = sum((t - mean_t) ** 2 for t, _ in samples)
+        if var == 0:
+            return 0.0
+        slope = sum((t - mean_t) * (m - mean_m) for t, m in samples) / var
+        return slope * 60.0
+
+
+def bench_transport(transport, plan, args):
+    """Run all measurements for one transport; returns a metrics dictionary"""
+    result = {}
+    with standin(transport, args.baud, args.report_interval / 1000.0) as make_driver:
+        # Cold connect (*RST, *CLS and settling delays), then warm connect
+        m2000 = make_driver()
+        with quiet():
+            start = time.perf_counter()
+            if not m2000.connect():
+                raise Exception(f"{transport}: connect failed")
+            result['connect_cold_ms'] = (time.perf_counter() - start) * 1000.0
+            m2000.disconnect()
+
+        m2000 = make_driver()
+        with quiet():
+            start = time.perf_counter()
+            if not m2000.connect(warm=True):
+                raise Exception(f"{transport}: warm connect failed")
+            result['connect_warm_ms'] = (time.perf_counter() - start) * 1000.0
+
+        try:
+            # Single READ? query round trips
+            histogram = LatencyHistogram()
+            for _ in range(args.queries):
+                start = time.perf_counter_ns()
+                if not m2000.query(plan.command):
+                    raise Exception(f"{transport}: READ? returned no response")
+                histogram.record(time.perf_counter_ns() - start)
+            latency = histogram.to_dict()
+            result['query_mean_ms'] = latency['mean_ms']
+            result['query_p50_ms'] = latency['p50_ms']
+            result['query_p99_ms'] = latency['p99_ms']
+
+            # Sustained streaming through the driver's own loop; thread CPU time
+            # excludes the stand-in threads running in this process
+            with quiet(), MemorySampler() as memory:
+                cpu_start = time.thread_time()
+                stats = m2000.stream_data(args.channels, args.params,
+                                          duration=args.duration, sample_rate=args.rate)
+                cpu = time.thread_time() - cpu_start
+            ticks = stats['ticks']
+            result['stream_samples'] = ticks
+            result['stream_rate_hz'] = stats['achieved_rate']
+            result['stream_overruns'] = stats['overruns']
+            result['cpu_per_sample_us'] = cpu / ticks * 1e6 if ticks else None
+            result['rss_kb'] = memory.samples[-1][1]
+            result['memory_growth_kb_per_min'] = memory.growth_kb_per_min()
+        finally:
+            with quiet():
+                m2000.disconnect()
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results against a baseline
+
+    Returns:
+        List of (transport, metric, value, baseline value, regressed)
+    """
+    rows = []
+    for transport, metrics in results.items():
+        base_metrics = baseline.get('results', {}).get(transport)
+        if not base_metrics:
+            continue
+        for metric, (direction, slack) in METRICS.items():
+            value, base = metrics.get(metric), base_metrics.get(metric)
+            if value is None or base is None:
+                continue
+            allowed = max(abs(base) * tolerance, slack)
+            if direction == 'lower':
+                regressed = value > base + allowed
+            else:
+                regressed = value < base - allowed
+            rows.append((transport, metric, value, base, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 cross-transport acquisition benchmark')
+    parser.add_argument('--transports', nargs='+', default=list(TRANSPORTS), choices=TRANSPORTS,
+                       help='Transports to test (default: all)')
+    parser.add_argument('--channels', nargs='+', default=['CH1'],
+                       help='Channels to read (default: CH1)')
+    parser.add_argument('--params', nargs='+', default=['V', 'A', 'W'],
+                       help='Parameters to read (default: V A W)')
+    parser.add_argument('--queries', type=int, default=200,
+                       help='Single READ? queries to time (default: 200)')
+    parser.add_argument('--duration', type=float, default=10.0,
+                       help='Seconds of streaming per transport (default: 10)')
+    parser.add_argument('--rate', type=float, default=0.0,
+                       help='Stream sample rate in Hz, 0 = as fast as possible (default: 0)')
+    parser.add_argument('--baud', type=int, default=115200,
+                       help='RS232 stand-in baud rate (default: 115200)')
+    parser.add_argument('--report-interval', type=float, default=1.0,
+                       help='USB HID polling interval in ms (default: 1.0)')
+    parser.add_argument('--output', metavar='FILE',
+                       help='Write results as JSON (use as a later --baseline)')
+    parser.add_argument('--baseline', metavar='FILE',
+                       help='Compare against a previous --output file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                       help='Allowed relative regression against the baseline (default: 0.25)')
+    args = parser.parse_args()
+
+    plan = compile_plan(args.channels, args.params)
+    report = {
+        'created': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'values': list(plan.keys), 'queries': args.queries, 'duration_s': args.duration,
+                   'rate_hz': args.rate, 'baud': args.baud,
+                   'report_interval_ms': args.report_interval},
+        'results': {},
+    }
+
+    print(f"{'Transport':<10} {'Cold':>9} {'Warm':>9} {'Query p50':>10} {'p99':>8} "
+          f"{'Stream':>10} {'CPU/sample':>11} {'Mem growth':>12}")
+    for transport in args.transports:
+        r = bench_transport(transport, plan, args)
+        report['results'][transport] = r
+        cpu = f"{r['cpu_per_sample_us']:>8.1f} us" if r['cpu_per_sample_us'] is not None else f"{'-':>11}"
+        print(f"{transport:<10} {r['connect_cold_ms']:>6.1f} ms {r['connect_warm_ms']:>6.2f} ms "
+              f"{r['query_p50_ms']:>7.3f} ms {r['query_p99_ms']:>5.2f} ms "
+              f"{r['stream_rate_hz']:>7.1f} Hz {cpu} {r['memory_growth_kb_per_min']:>7.0f} KB/min")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(report['results'], baseline, args.tolerance)
+    print(f"\nComparison with {args.baseline} (tolerance {args.tolerance:.0%})")
+    print(f"{'Transport':<10} {'Metric':<26} {'Value':>10} {'Baseline':>10} {'Change':>8}")
+    for transport, metric, value, base, regressed in rows:
+        change = f"{(value - base) / abs(base):+.0%}" if base else "-"
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{transport:<10} {metric:<26} {value:>10.3f} {base:>10.3f} {change:>8}{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Transport Throughput Benchmark
+Measures the REREAD? rate each interface driver achieves without hardware:
+LAN against the protocol simulator, RS232 against pty stand-ins at each baud
+rate and USB against the fake hid module. Runs on plain Linux, so it can gate
+regressions in the serial and USB hot paths in CI (--min-rate).
+"""
+
+import json
+import time
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_suite import TRANSPORTS, quiet, standin
+from m2000_plan import compile_plan
+
+BAUD_RATES = [9600, 19200, 57600, 115200]
+
+
+def measure(m2000, plan, duration):
+    """Arm REREAD? and return (samples per second, mean round trip in ms)"""
+    m2000.query(plan.command)
+    count = 0
+    start = time.perf_counter()
+    while True:
+        if not m2000.query('REREAD?'):
+            raise Exception("REREAD? returned no response")
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            break
+    return count / elapsed, elapsed / count * 1000.0
+
+
+def bench(transport, plan, duration, baudrate=115200, report_interval=0.001):
+    """Connect to the transport's stand-in and measure REREAD?"""
+    with standin(transport, baudrate, report_interval) as make_driver:
+        m2000 = make_driver()
+        try:
+            with quiet():
+                if not m2000.connect(warm=True):
+                    raise Exception(f"{transport} connect failed")
+            return measure(m2000, plan, duration)
+        finally:
+            with quiet():
+                m2000.disconnect()
+
+
+def parse_min_rate(items):
+    """Parse ['rs232-9600=10', 'usb=50'] into {name: Hz}"""
+    limits = {}
+    for item in items or []:
+        name, _, hz = item.partition('=')
+        limits[name.strip()] = float(hz)
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 transport REREAD? throughput benchmark')
+    parser.add_argument('--transports', nargs='+', default=list(TRANSPORTS), choices=TRANSPORTS,
+                       help='Transports to test (default: all)')
+    parser.add_argument('--bauds', type=int, nargs='+', default=BAUD_RATES,
+                       help='RS232 baud rates to test (default: 9600 19200 57600 115200)')
+    parser.add_argument('--channels', nargs='+', default=['CH1'],
+                       help='Channels to read (default: CH1)')
+    parser.add_argument('--params', nargs='+', default=['V', 'A', 'W'],
+                       help='Parameters to read (default: V A W)')
+    parser.add_argument('--duration', type=float, default=2.0,
+                       help='Seconds per measurement (default: 2.0)')
+    parser.add_argument('--report-interval', type=float, default=1.0,
+                       help='USB HID polling interval in ms (default: 1.0)')
+    parser.add_argument('--json', metavar='FILE',
+                       help='Write results as JSON')
+    parser.add_argument('--min-rate', nargs='+', metavar='NAME=HZ',
+                       help='Fail (exit 1) if a result falls below this rate, e.g. rs232-115200=50')
+    args = parser.parse_args()
+
+    plan = compile_plan(args.channels, args.params)
+    cases = []
+    if 'lan' in args.transports:
+        cases.append(('lan', lambda: bench('lan', plan, args.duration)))
+    if 'rs232' in args.transports:
+        for baud in args.bauds:
+            cases.append((f'rs232-{baud}', lambda baud=baud: bench('rs232', plan, args.duration, baud)))
+    if 'usb' in args.transports:
+        report_interval = args.report_interval / 1000.0
+        cases.append(('usb', lambda: bench('usb', plan, args.duration, report_interval=report_interval)))
+
+    print(f"REREAD? of {len(plan.keys)} values: {', '.join(plan.keys)}")
+    print(f"{'Transport':<14} {'Samples/s':>10} {'Round trip':>11}")
+    results = {}
+    for name, run in cases:
+        rate, round_trip = run()
+        results[name] = {'rate_hz': rate, 'round_trip_ms': round_trip}
+        print(f"{name:<14} {rate:>10.1f} {round_trip:>8.2f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'values': plan.keys, 'duration_s': args.duration, 'results': results}, f, indent=2)
+
+    failed = []
+    for name, limit in parse_min_rate(args.min_rate).items():
+        if name not in results:
+            failed.append(f"{name}: not measured")
+        elif results[name]['rate_hz'] < limit:
+            failed.append(f"{name}: {results[name]['rate_hz']:.1f} Hz < {limit:.1f} Hz")
+    for failure in failed:
+        print(f"FAIL {failure}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
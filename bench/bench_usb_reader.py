@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - USB Reader Benchmark
+Compares the report-slicing USB response reader against the old per-byte
+chr() decoder, using canned 64-byte HID reports (no USB polling delay), so
+only host-side decoding cost is measured
+"""
+
+import time
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2000_emulators import install_fake_hid
+
+install_fake_hid()
+
+from m2000_usb import M2000_USB, REPORT_SIZE
+
+
+# REREAD? of 3 and of 21 values, and a HISTORYDATA?-sized reply (~7 KB)
+REPLIES = {
+    'reread-3': b','.join([b'+2.30450E+2'] * 3) + b'\r\n',
+    'reread-21': b','.join([b'+2.30450E+2'] * 21) + b'\r\n',
+    'historydata': b','.join([b'1,+2.30450E+2'] * 512) + b'\r\n',
+}
+
+
+class CannedDevice:
+    def __init__(self, reply):
+        """hidapi device answering every write with the same reply"""
+        self.reports = []
+        for i in range(0, len(reply), REPORT_SIZE - 1):
+            chunk = reply[i:i + REPORT_SIZE - 1]
+            self.reports.append([0] + list(chunk) + [0] * (REPORT_SIZE - 1 - len(chunk)))
+        self.queued = []
+
+    def write(self, report):
+        self.queued.extend(self.reports)
+        return len(report)
+
+    def read(self, max_length, timeout_ms=0):
+        return self.queued.pop(0) if self.queued else []
+
+    def close(self):
+        pass
+
+
+def legacy_read_response(m2000):
+    """Original M2000_USB.read_response - chr() per byte, 10 ms sleep on errors"""
+    response = ""
+    start_time = time.time()
+    while True:
+        if (time.time() - start_time) * 1000 > m2000.timeout:
+            raise Exception("Read timeout")
+        try:
+            data = m2000.device.read(64, timeout_ms=100)
+            if not data:
+                continue
+            for byte_val in data[1:]:
+                if byte_val == 0:
+                    break
+                elif byte_val == 10:
+                    return response
+                elif byte_val == 13:
+                    continue
+                elif 32 <= byte_val <= 126:
+                    response += chr(byte_val)
+                else:
+                    break
+        except Exception:
+            time.sleep(0.01)
+            continue
+
+
+def run(reply, reader, duration):
+    """Return replies per second for the given reader function"""
+    m2000 = M2000_USB()
+    m2000.device = CannedDevice(reply)
+    m2000.connected = True
+    expected = reply.rstrip(b'\r\n').decode('ascii')
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        m2000.send_command('REREAD?')
+        if reader(m2000) != expected:
+            raise Exception("Reply mismatch")
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 USB reader benchmark')
+    parser.add_argument('--duration', type=float, default=2.0,
+                       help='Seconds per measurement (default: 2.0)')
+    args = parser.parse_args()
+
+    print(f"{'Reply':<12} {'Bytes':>6} {'Reports':>8} {'per-byte':>12} {'sliced':>12} {'Speedup':>8}")
+    for name, reply in REPLIES.items():
+        reports = -(-len(reply) // (REPORT_SIZE - 1))
+        legacy = run(reply, legacy_read_response, args.duration)
+        sliced = run(reply, M2000_USB.read_response, args.duration)
+        print(f"{name:<12} {len(reply):>6} {reports:>8} {legacy:>10.0f}/s {sliced:>10.0f}/s "
+              f"{sliced / legacy:>7.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
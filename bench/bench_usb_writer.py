@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - USB Writer Benchmark
+Compares the old per-command USB writer (a new list per report, one write per
+command) against the preallocated report buffer with send_many() packing,
+counting HID reports and host time per batch of commands
+"""
+
+import time
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2000_emulators import install_fake_hid
+
+install_fake_hid()
+
+from m2000_plan import compile_plan
+from m2000_usb import M2000_USB
+
+
+# Command batches sent per sample
+BATCHES = {
+    'reread': ['REREAD?'],
+    'reread+err': ['REREAD?', '*ERR?'],
+    'settings': ['*CLS', 'HARMS,1,50', 'HARMS,2,50', 'REREAD?', '*ERR?'],
+    'read-21': [compile_plan(['CH1', 'CH2', 'CH3'], ['V', 'A', 'W', 'VA', 'VAR', 'PF', 'FREQ']).command],
+}
+
+
+class CountingDevice:
+    def __init__(self):
+        """hidapi device that only counts output reports"""
+        self.writes = 0
+
+    def write(self, report):
+        bytes(report)  # hidapi converts the report the same way
+        self.writes += 1
+        return len(report)
+
+    def close(self):
+        pass
+
+
+def legacy_send_command(m2000, command):
+    """Original M2000_USB.send_command - builds a new list for each report"""
+    cmd_bytes = (command + '\n').encode('ascii')
+    packet_size = 64
+    for i in range(0, len(cmd_bytes), packet_size - 1):
+        chunk = cmd_bytes[i:i + packet_size - 1]
+        report = [0] + list(chunk) + [0] * (packet_size - len(chunk) - 1)
+        if m2000.device.write(report) < 0:
+            raise Exception("USB write failed")
+
+
+def legacy_send_many(m2000, commands):
+    for command in commands:
+        legacy_send_command(m2000, command)
+
+
+def run(commands, sender, duration):
+    """Return (batches per second, reports per batch)"""
+    m2000 = M2000_USB()
+    m2000.device = CountingDevice()
+    m2000.connected = True
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        sender(m2000, commands)
+        count += 1
+    return count / (time.perf_counter() - start), m2000.device.writes / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 USB writer benchmark')
+    parser.add_argument('--duration', type=float, default=1.0,
+                       help='Seconds per measurement (default: 1.0)')
+    args = parser.parse_args()
+
+    print(f"{'Batch':<12} {'Reports':>8} {'Packed':>7} {'per-command':>13} {'send_many':>12} {'Speedup':>8}")
+    for name, commands in BATCHES.items():
+        legacy, legacy_reports = run(commands, legacy_send_many, args.duration)
+        packed, packed_reports = run(commands, M2000_USB.send_many, args.duration)
+        print(f"{name:<12} {legacy_reports:>8.0f} {packed_reports:>7.0f} {legacy:>11.0f}/s "
+              f"{packed:>10.0f}/s {packed / legacy:>7.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - asyncio Interface
+Non-blocking client so one event loop can drive many analyzers.
+LAN uses asyncio streams; RS232 and USB run the blocking driver on one
+dedicated worker thread per device.
+"""
+
+import asyncio
+import time
+import sys
+import argparse
+import functools
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from m2000_plan import compile_plan, pack_reads
+from m2000_schedule import DeadlineScheduler
+from m2000_stats import TransportStats
+
+# Import unit formatting module
+try:
+    from m2000_units import format_measurement_table
+except ImportError:
+    def format_measurement_table(data, title=""):
+        return str(data)
+
+
+# StreamReader line limit: a response may be 65535 characters plus the
+# terminator, more than asyncio's 64 KiB default
+STREAM_LIMIT = 128 * 1024
+
+
+class AsyncM2000(ABC):
+    """
+    Base class for asyncio M2000 clients
+
+    Subclasses implement connect(), disconnect() and query(); measurement
+    helpers and streaming are shared.
+    """
+
+    def __init__(self):
+        self.connected = False
+        self.lock = None  # Serializes query round trips, created on first use
+        self.scheduler = None  # DeadlineScheduler of the current/last stream, for its stats
+        self.stats = None  # TransportStats while instrumentation is enabled
+
+    def _get_lock(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        return self.lock
+
+    @abstractmethod
+    async def connect(self):
+        """Open the link and check the instrument; returns True on success"""
+
+    @abstractmethod
+    async def disconnect(self):
+        """Return the instrument to local control and close the link"""
+
+    @abstractmethod
+    async def query(self, command):
+        """Send a command and return its response line"""
+
+    @abstractmethod
+    def enable_stats(self, stats=None):
+        """Turn on per-query instrumentation (see m2000_stats); returns the TransportStats"""
+
+    async def stats_snapshot(self):
+        """Instrumentation counters as a dictionary (None while disabled)"""
+        return self.stats.to_dict() if self.stats is not None else None
+
+    async def check_errors(self):
+        """Check for interface errors"""
+        error_code = await self.query('*ERR?')
+        if error_code and error_code != '0':
+            print(f"M2000 Error Code: {error_code}")
+            return int(error_code)
+        return 0
+
+    async def get_measurement(self, channels=['CH1'], parameters=['V', 'A', 'W']):
+        """
+        Get measurements from specified channels
+
+        Args:
+            channels: List of channels ['CH1', 'CH2', 'CH3', 'CH4', 'VPA1', 'VPA2', 'VPA3']
+            parameters: List of parameters ['V', 'A', 'W', 'VA', 'VAR', 'PF', 'FREQ']
+
+        Returns:
+            Dictionary with measurement data
+        """
+        return (await self.get_measurements([(channels, parameters)]))[0]
+
+    async def get_measurements(self, requests):
+        """
+        Get several channel/parameter sets with as few round trips as possible
+
+        Args:
+            requests: List of (channels, parameters) pairs
+
+        Returns:
+            List with a measurement dictionary (or None) per request
+        """
+        packer = pack_reads(requests)
+        responses = [await self.query(command) for command in packer.commands]
+        if self.stats is None:
+            return packer.unpack(responses)
+
+        parse_start = time.monotonic_ns()
+        results = packer.unpack(responses)
+        self.stats.parsed('READ?', time.monotonic_ns() - parse_start)
+        return results
+
+    async def stream(self, channels=['CH1'], parameters=['V', 'A', 'W'],
+                     sample_rate=5.0, duration=0, policy='skip'):
+        """
+        Stream measurements as an async generator
+
+        Sends READ? once, then REREAD? at the requested rate.
+
+        Args:
+            channels: List of channels to monitor
+            parameters: List of parameters to read
+            sample_rate: Samples per second (0 = as fast as possible)
+            duration: Duration in seconds (0 = infinite)
+            policy: Missed deadline policy, 'skip' or 'catchup' (see m2000_schedule)
+
+        Yields:
+            (timestamp, data) tuples, timestamp in seconds since the epoch
+        """
+        plan = compile_plan(channels, parameters)
+        command = plan.command
+
+        # Absolute monotonic deadlines so the sample phase does not drift
+        self.scheduler = DeadlineScheduler(sample_rate, duration, policy)
+        async for elapsed in self.scheduler:
+            keyword = 'READ?' if command is plan.command else 'REREAD?'
+            response = await self.query(command)
+            command = 'REREAD?'
+
+            if response:
+                stats = self.stats
+                parse_start = time.monotonic_ns() if stats is not None else 0
+                data = plan.parse(response)
+                if stats is not None:
+                    stats.parsed(keyword, time.monotonic_ns() - parse_start)
+                yield self.scheduler.wall_time(elapsed), data
+
+
+class AsyncM2000_LAN(AsyncM2000):
+    def __init__(self, host='192.168.1.100', port=10733, timeout=5.0):
+        """
+        Initialize asyncio LAN connection to M2000 Power Analyzer
+
+        Args:
+            host: IP address or hostname of M2000
+            port: TCP port (always 10733 for M2000)
+            timeout: Connect and read timeout in seconds
+        """
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.last_read_command = None  # Re-sent by a warm connect so REREAD? keeps working
+        self.time_to_first_sample = None
+
+    def enable_stats(self, stats=None):
+        """Turn on per-query instrumentation (see m2000_stats); returns the TransportStats"""
+        self.stats = stats if stats is not None else TransportStats('lan')
+        self._round_trip = self._round_trip_timed
+        return self.stats
+
+    def disable_stats(self):
+        """Turn off instrumentation, restoring the plain round trip"""
+        self.__dict__.pop('_round_trip', None)
+        self.stats = None
+
+    async def connect(self, warm=False):
+        """
+        Open TCP connection and initialize the M2000
+
+        Args:
+            warm: Skip *RST/*CLS and the settling delay so the instrument keeps its
+                  configuration. The link is checked with a single query: the last
+                  READ? command if there was one (so REREAD? can resume at once),
+                  otherwise *IDN?
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            connect_start = loop.time()
+            print(f"Connecting to M2000 at {self.host}:{self.port}...")
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, limit=STREAM_LIMIT), self.timeout)
+
+            if warm and self.last_read_command:
+                # Re-arm REREAD? with the last READ?; its reply is the first sample
+                response = await self._round_trip(self.last_read_command)
+                alive = bool(response)
+            else:
+                if not warm:
+                    # Wait for connection to stabilize
+                    await asyncio.sleep(0.1)
+
+                    # Initialize device using correct M2000 protocol
+                    self.writer.write(b'*RST\n*CLS\n')  # Reset and clear - no response
+                    await self.writer.drain()
+
+                response = await self._round_trip('*IDN?')
+                alive = bool(response) and 'APS' in response
+
+            if alive:
+                self.connected = True
+                self.time_to_first_sample = loop.time() - connect_start
+                if warm:
+                    print(f"Warm connect: first response after {self.time_to_first_sample * 1000:.1f} ms")
+                else:
+                    print(f"Connected to: {response}")
+                return True
+            else:
+                print(f"Unexpected response: {response}")
+                await self._close()
+                return False
+
+        except asyncio.TimeoutError:
+            print("Connection timeout - check IP address and network")
+        except ConnectionRefusedError:
+            print("Connection refused - check if M2000 is powered on and LAN enabled")
+        except Exception as e:
+            print(f"LAN connection failed: {e}")
+        await self._close()
+        return False
+
+    async def _close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = None
+        self.writer = None
+
+    async def disconnect(self):
+        """Close TCP connection"""
+        if self.writer:
+            try:
+                if self.connected:
+                    await self.send_command('LOCAL')  # Return to local control
+            except Exception:
+                pass
+            finally:
+                self.connected = False
+                await self._close()
+                print("LAN connection closed")
+
+    async def send_command(self, command):
+        """Send command to M2000"""
+        if not self.connected or not self.writer:
+            raise Exception("Not connected to M2000")
+
+        self.writer.write((command + '\n').encode('ascii'))
+        await self.writer.drain()
+
+    async def _round_trip(self, command):
+        self.writer.write((command + '\n').encode('ascii'))
+        await self.writer.drain()
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+        except asyncio.TimeoutError:
+            # A late response would leave the stream out of step - drop the connection
+            self.connected = False
+            await self._close()
+            raise Exception("Read timeout")
+        if not line:
+            self.connected = False
+            await self._close()
+            raise Exception("Connection closed by M2000")
+        return line.rstrip(b'\r\n').decode('ascii')
+
+    async def _round_trip_timed(self, command):
+        stats = self.stats
+        data = (command + '\n').encode('ascii')
+        start = time.monotonic_ns()
+        self.writer.write(data)
+        await self.writer.drain()
+        stats.sent(data, start, time.monotonic_ns())
+        try:
+            # First byte separately so network wait and transfer time can be told apart
+            line = await asyncio.wait_for(self.reader.read(1), self.timeout)
+            first = time.monotonic_ns()
+            if line and line != b'\n':
+                line += await asyncio.wait_for(self.reader.readline(), self.timeout)
+        except asyncio.TimeoutError:
+            stats.timeout()
+            self.connected = False
+            await self._close()
+            raise Exception("Read timeout")
+        if not line:
+            self.connected = False
+            await self._close()
+            raise Exception("Connection closed by M2000")
+        stats.received(len(line), first, time.monotonic_ns())
+        return line.rstrip(b'\r\n').decode('ascii')
+
+    async def query(self, command):
+        """Send query command and return response"""
+        if not self.connected or not self.writer:
+            raise Exception("Not connected to M2000")
+
+        async with self._get_lock():
+            response = await self._round_trip(command)
+        if command[:5].upper() == 'READ?':
+            self.last_read_command = command
+        return response
+
+
+class AsyncM2000_Threaded(AsyncM2000):
+    def __init__(self, device):
+        """
+        Wrap a blocking M2000 interface (M2000_RS232 or M2000_USB)
+
+        All blocking calls for this device run on one dedicated worker thread,
+        so the event loop never blocks and calls stay in order.
+
+        Args:
+            device: Blocking interface instance (not yet connected)
+        """
+        super().__init__()
+        self.device = device
+        self.executor = None  # Worker thread, started on first use and stopped by disconnect()
+
+    async def _call(self, func, *args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1,
+                                               thread_name_prefix=type(self.device).__name__)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def connect(self, *args, warm=False):
+        """Connect the wrapped interface on its worker thread (see its connect())"""
+        connect = functools.partial(self.device.connect, *args, warm=warm)
+        self.connected = bool(await self._call(connect))
+        return self.connected
+
+    async def disconnect(self):
+        """Disconnect the wrapped interface and stop its worker thread"""
+        try:
+            await self._call(self.device.disconnect)
+        finally:
+            self.connected = False
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None  # connect() starts a new one
+
+    async def send_command(self, command):
+        """Send command to M2000"""
+        await self._call(self.device.send_command, command)
+
+    def enable_stats(self, stats=None):
+        """Turn on instrumentation of the wrapped interface; returns its TransportStats"""
+        self.stats = self.device.enable_stats(stats)
+        return self.stats
+
+    async def stats_snapshot(self):
+        """Instrumentation counters, read on the worker thread that updates them"""
+        stats = self.stats
+        if stats is None:
+            return None
+        if self.executor is None:
+            return stats.to_dict()
+        return await self._call(stats.to_dict)
+
+    def disable_stats(self):
+        """Turn off instrumentation of the wrapped interface"""
+        self.device.disable_stats()
+        self.stats = None
+
+    async def query(self, command):
+        """Send query command and return response"""
+        return await self._call(self.device.query, command)
+
+
+class AsyncM2000_RS232(AsyncM2000_Threaded):
+    def __init__(self, port='COM1', baudrate=115200, timeout=1.0):
+        """asyncio wrapper around M2000_RS232 (requires pyserial)"""
+        from m2000_rs232 import M2000_RS232
+        super().__init__(M2000_RS232(port=port, baudrate=baudrate, timeout=timeout))
+
+
+class AsyncM2000_USB(AsyncM2000_Threaded):
+    def __init__(self, vid=4292, pid=34869, timeout=5000):
+        """asyncio wrapper around M2000_USB (requires hidapi)"""
+        from m2000_usb import M2000_USB
+        super().__init__(M2000_USB(vid=vid, pid=pid, timeout=timeout))
+
+
+async def run_hosts(hosts, port, channels, parameters, sample_rate, duration):
+    """Stream from several LAN analyzers concurrently on one event loop"""
+
+    async def run_one(host):
+        m2000 = AsyncM2000_LAN(host=host, port=port)
+        if not await m2000.connect():
+            return 0
+        count = 0
+        try:
+            async for timestamp, data in m2000.stream(channels, parameters, sample_rate, duration):
+                values = " ".join(f"{key}={value}" for key, value in data.items())
+                print(f"[{host}] {values}")
+                count += 1
+        finally:
+            await m2000.disconnect()
+        return count
+
+    counts = await asyncio.gather(*(run_one(host) for host in hosts), return_exceptions=True)
+    for host, result in zip(hosts, counts):
+        if isinstance(result, Exception):
+            print(f"{host}: error: {result}")
+        else:
+            print(f"{host}: {result} samples")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='APS M2000 asyncio LAN client')
+    parser.add_argument('--hosts', nargs='+', default=['192.168.1.100'],
+                       help='One or more M2000 IP addresses (default: 192.168.1.100)')
+    parser.add_argument('--port', type=int, default=10733,
+                       help='TCP port (default: 10733)')
+    parser.add_argument('--channels', nargs='+', default=['CH1'],
+                       choices=['CH1', 'CH2', 'CH3', 'CH4', 'VPA1', 'VPA2', 'VPA3'],
+                       help='Channels to monitor (default: CH1)')
+    parser.add_argument('--params', nargs='+', default=['V', 'A', 'W'],
+                       choices=['V', 'A', 'W', 'VA', 'VAR', 'PF', 'FREQ', 'PHASE'],
+                       help='Parameters to read (default: V A W)')
+    parser.add_argument('--stream', action='store_true',
+                       help='Stream data continuously')
+    parser.add_argument('--duration', type=float, default=10,
+                       help='Stream duration in seconds (default: 10)')
+    parser.add_argument('--rate', type=float, default=5.0,
+                       help='Sample rate in Hz (default: 5.0)')
+
+    args = parser.parse_args()
+
+    async def single():
+        m2000 = AsyncM2000_LAN(host=args.hosts[0], port=args.port)
+        if not await m2000.connect():
+            print("Failed to connect to M2000")
+            return 1
+        try:
+            data = await m2000.get_measurement(args.channels, args.params)
+            print(format_measurement_table(data, "Measurement Results") if data else "No data received")
+        finally:
+            await m2000.disconnect()
+        return 0
+
+    try:
+        if args.stream:
+            asyncio.run(run_hosts(args.hosts, args.port, args.channels, args.params,
+                                  args.rate, args.duration))
+            return 0
+        return asyncio.run(single())
+    except KeyboardInterrupt:
+        print("\nOperation cancelled by user")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Binary Columnar Log
+Append-only log of fixed-size records (int64 timestamp in ns since the Unix
+epoch, then one float32/float64 per channel/parameter) behind a JSON schema
+header. Records are contiguous, so a log opens as a NumPy memmap with zero
+copies, also while it is still being written. CRC32 checksums of each block
+of records are kept in a sidecar file (<log>.crc), so the record area stays
+one array. Files use the .m2b extension.
+Requires: pip install numpy
+"""
+
+import io
+import json
+import math
+import os
+import struct
+import time
+import zlib
+import sys
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from m2000_units import format_measurement, get_base_unit
+
+
+MAGIC = b'M2000LOG'
+CRC_MAGIC = b'M2000CRC'
+VERSION = 1
+EXTENSION = '.m2b'
+DTYPES = ('float32', 'float64')
+BLOCK_RECORDS = 4096   # Records per checksummed block
+HEADER_ALIGN = 64      # Record area starts on a 64-byte boundary
+
+_PREFIX = struct.Struct('<8sI')  # Magic, header size including padding
+_BLOCK = struct.Struct('<IIqq')  # CRC32, records, first and last timestamp (ns)
+
+
+def is_binary_log(path):
+    """True if path names a binary log (.m2b)"""
+    return str(path).lower().endswith(EXTENSION)
+
+
+def record_dtype(n_values, dtype='float32'):
+    """NumPy dtype of one record: int64 'time' plus n_values floats 'values'"""
+    return np.dtype([('time', '<i8'), ('values', '<f4' if dtype == 'float32' else '<f8', (n_values,))])
+
+
+def split_key(key):
+    """'CH1_V' -> ('CH1', 'V'); keys without a parameter give (key, '')"""
+    channel, _, param = key.rpartition('_')
+    return (channel, param) if channel else (key, '')
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def read_header(f):
+    """
+    Read the schema header of a binary log
+
+    Returns:
+        (schema dictionary, header size in bytes)
+    """
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size:
+        raise Exception("Not an M2000 binary log (file too short)")
+    magic, size = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise Exception("Not an M2000 binary log (bad magic)")
+    schema = json.loads(f.read(size - _PREFIX.size).decode('utf-8').rstrip(' \n\0'))
+    if schema.get('version') != VERSION:
+        raise Exception(f"Unsupported binary log version {schema.get('version')}")
+    return schema, size
+
+
+def read_blocks(path):
+    """
+    Block checksums of a log from its sidecar
+
+    Returns:
+        List of (crc32, records, first ns, last ns)
+    """
+    try:
+        with open(path + '.crc', 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    if data[:len(CRC_MAGIC)] != CRC_MAGIC:
+        raise Exception(f"{path}.crc is not an M2000 checksum file")
+    data = data[len(CRC_MAGIC):]
+    usable = len(data) - len(data) % _BLOCK.size  # Ignore a torn last entry
+    return list(_BLOCK.iter_unpack(data[:usable]))
+
+
+class BinaryLogWriter:
+    def __init__(self, path, keys, units=None, dtype='float32', block_records=BLOCK_RECORDS,
+                 time_origin=None, append=False, index_interval=0):
+        """
+        Create (or continue) a binary log
+
+        Also usable as the sink of an m2000_log.LogWriter: write() takes
+        records whose first two items are the timestamp in seconds since
+        time_origin and the sequence of values.
+
+        Args:
+            path: Log file (.m2b); checksums go to path + '.crc'
+            keys: Result keys, e.g. QueryPlan.keys ('CH1_V', 'CH1_A', ...)
+            units: Unit per key (default: from m2000_units.get_base_unit)
+            dtype: 'float32' or 'float64' values
+            block_records: Records per checksummed block
+            time_origin: Wall-clock seconds that record timestamps count from
+                         (default: now)
+            append: Continue an existing log with the same keys instead of truncating it
+            index_interval: Seconds per time index bucket (m2000_index), 0 = no index
+        """
+        if np is None:
+            raise ImportError("BinaryLogWriter requires numpy: pip install numpy")
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype {dtype!r}, expected one of {DTYPES}")
+
+        self.path = path
+        self.keys = tuple(keys)
+        self.origin_ns = time.time_ns() if time_origin is None else int(round(time_origin * 1e9))
+        self.block_crc = 0
+        self.block_count = 0
+        self.block_first = 0
+        self.block_last = 0
+
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            self._open_existing()
+        else:
+            if units is None:
+                units = [get_base_unit(split_key(key)[1]) for key in self.keys]
+            self.schema = {
+                'version': VERSION,
+                'keys': list(self.keys),
+                'units': list(units),
+                'dtype': dtype,
+                'block_records': block_records,
+                'time_origin_ns': self.origin_ns,
+                'created': time.time(),
+            }
+            self.file = open(path, 'wb')
+            self.file.write(self._encode_header())
+            self.crc_file = open(path + '.crc', 'wb')
+            self.crc_file.write(CRC_MAGIC)
+            self.records = 0
+
+        self.dtype = record_dtype(len(self.keys), self.schema['dtype'])
+        self.block_records = self.schema['block_records']
+        self.index = None
+        if index_interval:
+            from m2000_index import TimeIndexWriter, index_path  # m2000_index reads binary logs
+            self.index = TimeIndexWriter(index_path(path), index_interval,
+                                         self.schema['time_origin_ns'] / 1e9, 'records', append)
+        self.flush()
+
+    def _encode_header(self):
+        body = json.dumps(self.schema).encode('utf-8') + b'\n'
+        size = _PREFIX.size + len(body)
+        size += -size % HEADER_ALIGN
+        return _PREFIX.pack(MAGIC, size) + body.ljust(size - _PREFIX.size, b' ')
+
+    def _open_existing(self):
+        """Reopen for appending: drop a torn record and the partial block's checksum"""
+        with open(self.path, 'rb') as f:
+            self.schema, header_size = read_header(f)
+        if tuple(self.schema['keys']) != self.keys:
+            print(f"Cannot append to {self.path}: it logs {self.schema['keys']}")
+            raise Exception(f"Cannot append to {self.path}: different channels/parameters")
+
+        dtype = record_dtype(len(self.keys), self.schema['dtype'])
+        block_records = self.schema['block_records']
+        self.records = (os.path.getsize(self.path) - header_size) // dtype.itemsize
+        full_blocks = self.records // block_records
+        blocks = []
+        for block in read_blocks(self.path)[:full_blocks]:
+            if block[1] != block_records:
+                break
+            blocks.append(block)
+
+        self.file = open(self.path, 'r+b')
+        self.file.truncate(header_size + self.records * dtype.itemsize)
+        self.file.seek(0, os.SEEK_END)
+        self.crc_file = open(self.path + '.crc', 'wb')
+        self.crc_file.write(CRC_MAGIC)
+        for block in blocks:
+            self.crc_file.write(_BLOCK.pack(*block))
+
+        # Checksum the records after the last recorded block again (a partial
+        # block, or blocks whose checksums were lost when the writer died)
+        self.dtype = dtype
+        self.block_records = block_records
+        start = len(blocks) * block_records
+        if start < self.records:
+            self._checksum(np.fromfile(self.path, dtype, self.records - start,
+                                       offset=header_size + start * dtype.itemsize))
+
+    def write(self, records):
+        """
+        Append (seconds since time_origin, values, ...) records
+
+        Returns:
+            Bytes written
+        """
+        n = len(records)
+        if not n:
+            return 0
+        seconds = np.fromiter((record[0] for record in records), np.float64, n)
+        try:
+            values = np.array([record[1] for record in records], np.float64)
+        except (TypeError, ValueError):
+            # Non-numeric fields (error text) become NaN
+            values = np.array([[_to_float(v) for v in record[1]] for record in records], np.float64)
+        return self.write_arrays(self.origin_ns + np.rint(seconds * 1e9).astype(np.int64), values)
+
+    def write_arrays(self, times_ns, values):
+        """
+        Append records from arrays
+
+        Args:
+            times_ns: int64 timestamps in ns since the Unix epoch, shape (n,)
+            values: Values, shape (n, len(keys)); missing values as NaN
+
+        Returns:
+            Bytes written
+        """
+        block = np.empty(len(times_ns), self.dtype)
+        block['time'] = times_ns
+        block['values'] = values
+        return self.write_records(block)
+
+    def write_records(self, block):
+        """Append a structured array of records (dtype record_dtype())"""
+        data = block.tobytes()
+        self.file.write(data)
+        self._checksum(block, data)
+        if self.index is not None:
+            self.index.add_many((block['time'] - self.schema['time_origin_ns']) / 1e9, self.records)
+        self.records += len(block)
+        self.flush()
+        return len(data)
+
+    def _checksum(self, block, data=None):
+        """Add records to the running block checksums, across write boundaries"""
+        data = memoryview(block.tobytes() if data is None else data)
+        times = block['time']
+        size = self.dtype.itemsize
+        n = len(block)
+        i = 0
+        while i < n:
+            take = min(n - i, self.block_records - self.block_count)
+            if self.block_count == 0:
+                self.block_first = int(times[i])
+            self.block_crc = zlib.crc32(data[i * size:(i + take) * size], self.block_crc)
+            self.block_last = int(times[i + take - 1])
+            self.block_count += take
+            i += take
+            if self.block_count == self.block_records:
+                self._end_block()
+
+    def _end_block(self):
+        self.crc_file.write(_BLOCK.pack(self.block_crc, self.block_count,
+                                        self.block_first, self.block_last))
+        self.block_crc = 0
+        self.block_count = 0
+
+    def flush(self):
+        """Hand written records to the OS, so readers of a live log see them"""
+        self.file.flush()
+        self.crc_file.flush()
+        if self.index is not None:
+            self.index.flush()  # After the records it points to
+
+    def sync(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+        os.fsync(self.crc_file.fileno())
+        if self.index is not None:
+            self.index.sync()
+
+    def close(self):
+        """Checksum the partial last block and close the files"""
+        if self.file.closed:
+            return
+        if self.block_count:
+            self._end_block()
+        self.file.close()
+        self.crc_file.close()
+        if self.index is not None:
+            self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BinaryLog:
+    def __init__(self, path, data=None):
+        """
+        Open a binary log as a read-only memmap
+
+        Args:
+            path: Log file (.m2b)
+            data: Contents of the log already in memory (e.g. a decompressed
+                  segment); path then only locates the .crc sidecar
+        """
+        if np is None:
+            raise ImportError("BinaryLog requires numpy: pip install numpy")
+        self.path = path
+        self.data = data
+        with (io.BytesIO(data) if data is not None else open(path, 'rb')) as f:
+            self.schema, self.header_size = read_header(f)
+        self.keys = tuple(self.schema['keys'])
+        self.units = tuple(self.schema['units'])
+        self.dtype = record_dtype(len(self.keys), self.schema['dtype'])
+        self.block_records = self.schema['block_records']
+        self.time_origin_ns = self.schema['time_origin_ns']
+        self.refresh()
+
+    def refresh(self):
+        """
+        Map records appended since the log was opened (live logs)
+
+        Returns:
+            Number of complete records
+        """
+        if self.data is not None:
+            n = (len(self.data) - self.header_size) // self.dtype.itemsize
+            self.records = np.frombuffer(self.data, self.dtype, n, self.header_size)
+            return n
+        n = max(0, (os.path.getsize(self.path) - self.header_size) // self.dtype.itemsize)
+        if n:
+            self.records = np.memmap(self.path, self.dtype, 'r', self.header_size, (n,))
+        else:
+            self.records = np.empty(0, self.dtype)
+        return n
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def time(self):
+        """int64 ns since the Unix epoch (view, no copy)"""
+        return self.records['time']
+
+    @property
+    def values(self):
+        """All values, shape (records, keys) (view, no copy)"""
+        return self.records['values']
+
+    def column(self, key):
+        """Values of one key, e.g. 'CH1_V' (strided view, no copy)"""
+        return self.values[:, self.keys.index(key)]
+
+    def seconds(self, start=0, stop=None):
+        """Timestamps as float seconds since the log's time origin"""
+        return (self.time[start:stop] - self.time_origin_ns) / 1e9
+
+    def verify(self):
+        """
+        Check the block checksums
+
+        Returns:
+            Dictionary with 'blocks' (checked), 'bad' (indices of blocks that
+            fail), 'unchecked' (records without a checksum: a live or torn tail)
+        """
+        size = self.dtype.itemsize
+        raw = self.records.view(np.uint8) if len(self.records) else b''
+        bad = []
+        checked = 0
+        covered = 0
+        for index, (crc, count, _, _) in enumerate(read_blocks(self.path)):
+            start = index * self.block_records
+            if start + count > len(self.records):
+                break
+            covered = max(covered, start + count)
+            checked += 1
+            if zlib.crc32(raw[start * size:(start + count) * size]) != crc:
+                bad.append(index)
+        return {'blocks': checked, 'bad': bad, 'unchecked': len(self.records) - covered}
+
+    def info(self):
+        """Summary dictionary: records, time span, rate and schema"""
+        n = len(self.records)
+        span = (int(self.time[-1]) - int(self.time[0])) / 1e9 if n > 1 else 0.0
+        return {
+            'path': self.path,
+            'records': n,
+            'keys': list(self.keys),
+            'units': list(self.units),
+            'dtype': self.schema['dtype'],
+            'record_bytes': self.dtype.itemsize,
+            'start': int(self.time[0]) / 1e9 if n else None,
+            'end': int(self.time[-1]) / 1e9 if n else None,
+            'span_s': span,
+            'rate_hz': (n - 1) / span if span > 0 else None,
+        }
+
+    def csv_header(self, scaled=False):
+        """CSV header line: unit-suffixed keys as create_csv_header writes them, or plain keys"""
+        if scaled:
+            return "Timestamp," + ",".join(self.keys)
+        return "Timestamp," + ",".join(f"{key}({unit})" if unit else key
+                                       for key, unit in zip(self.keys, self.units))
+
+    def export_csv(self, out, scaled=False, absolute=False, start=0, stop=None, chunk=65536,
+                   header=True):
+        """
+        Write records as CSV for sharing
+
+        Args:
+            out: Writable text file
+            scaled: Format values with their unit prefix ("230.450 V", "1.234 mA")
+                    via m2000_units instead of raw numbers with unit headers
+            absolute: Timestamps as Unix epoch seconds instead of seconds since the time origin
+            start, stop: Record range
+            chunk: Records formatted at a time (bounds memory)
+            header: Write the header line first
+
+        Returns:
+            Number of rows written
+        """
+        params = [split_key(key)[1] for key in self.keys]
+        if header:
+            out.write(self.csv_header(scaled) + "\n")
+        row_format = "%.3f" + ",%.6g" * len(self.keys) + "\n"
+        origin = 0 if absolute else self.time_origin_ns
+        stop = len(self.records) if stop is None else min(stop, len(self.records))
+        rows = 0
+        for i in range(start, stop, chunk):
+            j = min(i + chunk, stop)
+            seconds = ((self.time[i:j] - origin) / 1e9).tolist()
+            values = self.values[i:j].tolist()
+            if scaled:
+                lines = [f"{t:.3f}," + ",".join('' if v != v else format_measurement(v, p)
+                                               for v, p in zip(row, params)) + "\n"
+                         for t, row in zip(seconds, values)]
+            else:
+                lines = [row_format % (t, *row) for t, row in zip(seconds, values)]
+            out.write(''.join(lines))
+            rows += j - i
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 binary log tool')
+    parser.add_argument('log', help='Binary log file (.m2b)')
+    parser.add_argument('--verify', action='store_true',
+                       help='Check the block checksums (exit 1 on a bad block)')
+    parser.add_argument('--export', metavar='CSV',
+                       help="Export to CSV ('-' for stdout)")
+    parser.add_argument('--scaled', action='store_true',
+                       help='Export values with unit prefixes (230.450 V, 1.234 mA)')
+    parser.add_argument('--absolute', action='store_true',
+                       help='Export Unix epoch timestamps instead of seconds since start')
+
+    args = parser.parse_args()
+
+    log = BinaryLog(args.log)
+    status = 0
+    if args.export:
+        if args.export == '-':
+            log.export_csv(sys.stdout, args.scaled, args.absolute)
+        else:
+            with open(args.export, 'w') as f:
+                rows = log.export_csv(f, args.scaled, args.absolute)
+            print(f"Exported {rows} records to {args.export}")
+        return 0
+
+    info = log.info()
+    print(f"{info['path']}: {info['records']} records of {info['record_bytes']} bytes "
+          f"({info['dtype']}), {info['span_s']:.3f}s", end='')
+    print(f" at {info['rate_hz']:.1f} Hz" if info['rate_hz'] else "")
+    for key, unit in zip(log.keys, log.units):
+        print(f"  {key}" + (f" ({unit})" if unit else ""))
+
+    if args.verify:
+        result = log.verify()
+        print(f"{result['blocks']} blocks checked, {len(result['bad'])} bad, "
+              f"{result['unchecked']} records without a checksum")
+        for index in result['bad']:
+            print(f"  Bad block {index}: records {index * log.block_records}-"
+                  f"{(index + 1) * log.block_records - 1}")
+        status = 1 if result['bad'] else 0
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Log Converter
+Converts stream_data CSV logs into columnar files for analysis: Parquet
+(one row group per chunk), Feather (Arrow IPC, one record batch per chunk)
+or the .m2b binary log. CSV is read in fixed-size chunks, so memory stays
+bounded whatever the file size; headers with unit suffixes such as
+CH1_V(V) become float64 columns named CH1_V with the unit, channel and
+parameter in the column metadata. Several files convert in parallel in a
+process pool.
+Requires: pip install numpy (and pyarrow for Parquet/Feather)
+"""
+
+import itertools
+import io
+import os
+import re
+import time
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc  # Feather v2 is the Arrow IPC file format
+except ImportError:
+    pa = None
+
+from m2000_binlog import EXTENSION, BinaryLogWriter, split_key
+from m2000_segments import MANIFEST_SUFFIX, CsvStream, read_manifest
+
+
+FORMATS = {
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'm2b': EXTENSION,
+}
+
+# "CH1_V(V)" -> name "CH1_V", unit "V"
+_HEADER_RE = re.compile(r'^\s*(?P<name>[^()]+?)\s*(?:\((?P<unit>[^()]*)\))?\s*$')
+
+
+def parse_header(line):
+    """
+    Split a CSV header into column names and units
+
+    Args:
+        line: Header line as written by create_csv_header, e.g. "Timestamp,CH1_V(V),CH1_PF"
+
+    Returns:
+        (names, units) - units are '' where the header has none
+    """
+    names, units = [], []
+    for column in line.rstrip('\r\n').split(','):
+        match = _HEADER_RE.match(column)
+        if not match:
+            raise ValueError(f"Unrecognized column header {column!r}")
+        names.append(match.group('name'))
+        units.append(match.group('unit') or '')
+    return names, units
+
+
+def read_chunks(f, n_columns, chunk_rows, counts=None):
+    """
+    Parse a CSV body chunk by chunk
+
+    Rows with the wrong number of fields (a torn last line, error text with
+    commas) are dropped.
+
+    Args:
+        f: Text file positioned after the header
+        n_columns: Fields per row
+        chunk_rows: Lines read per chunk
+        counts: Optional dictionary; counts['skipped'] is increased by the
+                number of non-blank lines that were dropped
+
+    Yields:
+        float64 array of shape (rows, n_columns); empty or non-numeric
+        fields become NaN
+    """
+    while True:
+        lines = list(itertools.islice(f, chunk_rows))
+        if not lines:
+            return
+        try:
+            data = np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2)
+        except ValueError:
+            # Empty fields, error text or a torn last line: keep the rows with the
+            # right field count and parse those with the tolerant parser
+            good = [line for line in lines if line.count(',') == n_columns - 1]
+            if good:
+                data = np.genfromtxt(io.StringIO(''.join(good)), delimiter=',',
+                                     dtype=np.float64, ndmin=2)
+            else:
+                data = np.empty((0, n_columns))
+        if data.shape[1] != n_columns:
+            raise ValueError(f"Rows have {data.shape[1]} fields, header has {n_columns}")
+        if counts is not None:
+            counts['skipped'] = (counts.get('skipped', 0)
+                                 + sum(1 for line in lines if line.strip()) - len(data))
+        yield data
+
+
+def arrow_schema(names, units):
+    """Arrow schema: float64 columns with unit/channel/parameter metadata"""
+    fields = []
+    for name, unit in zip(names, units):
+        if name == 'Timestamp':
+            metadata = {'unit': 's'}
+        else:
+            channel, param = split_key(name)
+            metadata = {'unit': unit, 'channel': channel, 'parameter': param}
+        fields.append(pa.field(name, pa.float64(), metadata=metadata))
+    return pa.schema(fields, metadata={'source': 'm2000 stream_data'})
+
+
+def convert_file(source, target, fmt='parquet', chunk_rows=100000, compression='zstd',
+                 time_origin=0.0):
+    """
+    Convert one CSV log
+
+    Args:
+        source: CSV log with a Timestamp column first, or the manifest of a
+                segmented CSV log (read as one stream)
+        target: Output file
+        fmt: 'parquet', 'feather' or 'm2b'
+        chunk_rows: Rows per chunk (= Parquet row group / Feather record batch)
+        compression: Parquet/Feather codec ('zstd', 'lz4', 'snappy', 'none')
+        time_origin: Wall-clock seconds the CSV timestamps count from (m2b)
+
+    Returns:
+        Dictionary with source, target, rows, skipped (malformed rows dropped),
+        chunks, bytes in/out and seconds
+    """
+    if np is None:
+        raise ImportError("Log conversion requires numpy: pip install numpy")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {tuple(FORMATS)}")
+    if fmt != 'm2b' and pa is None:
+        raise ImportError("Parquet/Feather output requires pyarrow: pip install pyarrow")
+
+    start = time.perf_counter()
+    rows = chunks = 0
+    counts = {'skipped': 0}
+    codec = None if compression == 'none' else compression
+    segmented = source.endswith(MANIFEST_SUFFIX)
+    with (CsvStream(source) if segmented else open(source, newline='')) as f:
+        names, units = parse_header(f.readline())
+        if names[0] != 'Timestamp':
+            raise ValueError(f"{source}: first column is {names[0]!r}, expected 'Timestamp'")
+
+        if fmt == 'm2b':
+            writer = BinaryLogWriter(target, names[1:], units[1:], dtype='float64',
+                                     time_origin=time_origin)
+            write = lambda data: writer.write_arrays(
+                writer.origin_ns + np.rint(data[:, 0] * 1e9).astype(np.int64), data[:, 1:])
+        else:
+            schema = arrow_schema(names, units)
+            if fmt == 'parquet':
+                writer = pq.ParquetWriter(target, schema, compression=codec or 'none')
+                write = lambda data: writer.write_table(
+                    pa.Table.from_arrays([pa.array(data[:, i]) for i in range(len(names))],
+                                         schema=schema), row_group_size=len(data))
+            else:
+                writer = pa.ipc.new_file(target, schema,
+                                         options=pa.ipc.IpcWriteOptions(compression=codec))
+                write = lambda data: writer.write_batch(
+                    pa.RecordBatch.from_arrays([pa.array(data[:, i]) for i in range(len(names))],
+                                               schema=schema))
+
+        try:
+            for data in read_chunks(f, len(names), chunk_rows, counts):
+                if not len(data):
+                    continue
+                write(data)
+                rows += len(data)
+                chunks += 1
+        finally:
+            writer.close()
+
+    return {
+        'source': source,
+        'target': target,
+        'rows': rows,
+        'skipped': counts['skipped'],
+        'chunks': chunks,
+        'bytes_in': sum(map(os.path.getsize, read_manifest(source)['paths'])) if segmented
+                    else os.path.getsize(source),
+        'bytes_out': os.path.getsize(target),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def target_path(source, fmt, output_dir=None):
+    """Output file for a source: same name with the format's extension"""
+    name = os.path.basename(source)
+    if name.endswith(MANIFEST_SUFFIX):
+        name = name[:-len(MANIFEST_SUFFIX)]
+    stem = os.path.splitext(name)[0]
+    return os.path.join(output_dir or os.path.dirname(source) or '.', stem + FORMATS[fmt])
+
+
+def convert_files(sources, fmt='parquet', output_dir=None, jobs=None, **options):
+    """
+    Convert several CSV logs in a process pool
+
+    Args:
+        sources: CSV files
+        fmt: 'parquet', 'feather' or 'm2b'
+        output_dir: Directory for the outputs (default: next to each source)
+        jobs: Worker processes (default: one per CPU, at most one per file)
+        **options: convert_file() options
+
+    Yields:
+        convert_file() result dictionaries, or {'source', 'error'}, as files finish
+    """
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(sources)))
+    if jobs == 1:
+        for source in sources:
+            try:
+                yield convert_file(source, target_path(source, fmt, output_dir), fmt, **options)
+            except Exception as e:
+                yield {'source': source, 'error': str(e)}
+        return
+
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = {pool.submit(convert_file, source, target_path(source, fmt, output_dir),
+                               fmt, **options): source for source in sources}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {'source': futures[future], 'error': str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert M2000 CSV logs to Parquet, Feather or .m2b')
+    parser.add_argument('files', nargs='+',
+                       help='CSV logs written by stream_data, or manifests of segmented logs')
+    parser.add_argument('--format', choices=FORMATS, default='parquet',
+                       help='Output format (default: parquet)')
+    parser.add_argument('--output-dir', type=str,
+                       help='Directory for converted files (default: next to each CSV)')
+    parser.add_argument('--chunk-rows', type=int, default=100000,
+                       help='Rows read per chunk = Parquet row group size (default: 100000)')
+    parser.add_argument('--compression', default='zstd',
+                       help="Parquet/Feather codec: zstd, lz4, snappy or none (default: zstd)")
+    parser.add_argument('--jobs', type=int, default=0,
+                       help='Worker processes, 0 = one per CPU (default: 0)')
+
+    args = parser.parse_args()
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    failed = 0
+    total_rows = 0
+    for result in convert_files(args.files, args.format, args.output_dir, args.jobs or None,
+                                chunk_rows=args.chunk_rows, compression=args.compression):
+        if 'error' in result:
+            failed += 1
+            print(f"FAILED {result['source']}: {result['error']}")
+            continue
+        total_rows += result['rows']
+        skipped = f" ({result['skipped']} malformed rows skipped)" if result['skipped'] else ""
+        print(f"{result['source']} -> {result['target']}: {result['rows']} rows{skipped} in "
+              f"{result['chunks']} chunks, {result['bytes_in'] / 1e6:.1f} MB -> "
+              f"{result['bytes_out'] / 1e6:.1f} MB, {result['seconds']:.2f}s")
+
+    elapsed = time.perf_counter() - start
+    print(f"Converted {len(args.files) - failed}/{len(args.files)} files, {total_rows} rows "
+          f"in {elapsed:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Network Discovery
+asyncio scanner for LAN analyzers: CIDR ranges (up to /16), a bounded number
+of non-blocking connects in flight, an *IDN? probe on each open port and
+results reported as soon as a unit answers. Found units and scanned ranges
+are cached on disk with a TTL, so repeating a discovery is near-instant.
+"""
+
+import asyncio
+import ipaddress
+import json
+import os
+import time
+import sys
+import argparse
+
+
+DEFAULT_PORT = 10733
+DEFAULT_TTL = 3600.0  # Seconds a cached scan stays valid
+MAX_PREFIX_HOSTS = 1 << 16  # Largest range scanned in one go (/16)
+
+
+def default_cache_path():
+    """~/.cache/m2000/discovery.json (or under $XDG_CACHE_HOME)"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'm2000', 'discovery.json')
+
+
+def parse_network(text):
+    """
+    Parse a range to scan: CIDR ('192.168.0.0/22'), a single address or
+    the old network base form ('192.168.1' = 192.168.1.0/24)
+
+    Returns:
+        ipaddress.IPv4Network
+    """
+    text = text.strip()
+    if '/' not in text and text.count('.') == 2:
+        text += '.0/24'
+    network = ipaddress.ip_network(text, strict=False)
+    if network.num_addresses > MAX_PREFIX_HOSTS:
+        raise ValueError(f"{network} is larger than a /16")
+    return network
+
+
+def network_hosts(network):
+    """Addresses to probe: all hosts, or the address itself for /31, /32"""
+    if network.num_addresses <= 2:
+        return [str(address) for address in network]
+    return [str(address) for address in network.hosts()]
+
+
+def concurrency_limit(requested):
+    """Cap connects in flight below the open file limit"""
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ImportError, ValueError, OSError):
+        return requested
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft - 64))
+
+
+class DiscoveryCache:
+    def __init__(self, path=None, ttl=DEFAULT_TTL):
+        """
+        Units found and ranges scanned, persisted as JSON
+
+        Args:
+            path: Cache file (default: default_cache_path())
+            ttl: Seconds before a scanned range has to be scanned again
+        """
+        self.path = path or default_cache_path()
+        self.ttl = ttl
+        self.networks = {}  # CIDR -> time of the last complete scan
+        self.units = {}     # "host:port" -> {'host', 'port', 'idn', 'seen'}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.networks = dict(data.get('networks', {}))
+            self.units = dict(data.get('units', {}))
+        except (OSError, ValueError):
+            self.networks = {}
+            self.units = {}
+
+    def save(self):
+        """Write the cache atomically"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = f"{self.path}.tmp"
+        with open(temp, 'w') as f:
+            json.dump({'networks': self.networks, 'units': self.units}, f, indent=1)
+        os.replace(temp, self.path)
+
+    def fresh(self, network, port):
+        """
+        Cached units in a range, if it was scanned within the TTL
+
+        Returns:
+            List of (host, idn), or None if the range needs scanning
+        """
+        scanned = self.networks.get(f"{network}:{port}")
+        if scanned is None or time.time() - scanned > self.ttl:
+            return None
+        return [(unit['host'], unit['idn']) for unit in self.units.values()
+                if unit['port'] == port and ipaddress.ip_address(unit['host']) in network]
+
+    def scanned(self, network, port, found):
+        """Record a complete scan of a range and the units that answered"""
+        now = time.time()
+        # Units in the range that did not answer this time are gone
+        for key, unit in list(self.units.items()):
+            if unit['port'] == port and ipaddress.ip_address(unit['host']) in network:
+                del self.units[key]
+        for host, idn in found:
+            self.units[f"{host}:{port}"] = {'host': host, 'port': port, 'idn': idn, 'seen': now}
+        self.networks[f"{network}:{port}"] = now
+
+
+async def probe(host, port=DEFAULT_PORT, connect_timeout=0.3, idn_timeout=1.0):
+    """
+    Check one address for an M2000
+
+    Returns:
+        *IDN? response if an APS instrument answered, else None
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), connect_timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        writer.write(b'*IDN?\n')
+        await writer.drain()
+        response = await asyncio.wait_for(reader.readline(), idn_timeout)
+        response = response.decode('ascii', 'replace').strip()
+        return response if 'APS' in response else None
+    except (OSError, asyncio.TimeoutError, ValueError):
+        # ValueError: another service sent more than the line limit without a newline
+        return None
+    finally:
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), connect_timeout)
+        except (OSError, asyncio.TimeoutError):
+            pass
+
+
+async def scan(hosts, port=DEFAULT_PORT, concurrency=256, connect_timeout=0.3, idn_timeout=1.0):
+    """
+    Probe addresses with at most concurrency connects in flight
+
+    Yields:
+        (host, idn) for each M2000 as soon as it answers
+    """
+    found = asyncio.Queue()
+    addresses = iter(hosts)
+
+    async def worker():
+        # Workers share one iterator, so only concurrency probes exist at a time
+        for host in addresses:
+            idn = await probe(host, port, connect_timeout, idn_timeout)
+            if idn:
+                found.put_nowait((host, idn))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    finished = asyncio.gather(*workers)
+    finished.add_done_callback(lambda _: found.put_nowait(None))
+    try:
+        while True:
+            item = await found.get()
+            if item is None:
+                break
+            yield item
+        await finished  # Re-raise unexpected worker errors
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+async def discover(networks, port=DEFAULT_PORT, concurrency=256, connect_timeout=0.3,
+                   idn_timeout=1.0, cache=None, refresh=False):
+    """
+    Find M2000 units in one or more ranges
+
+    Ranges scanned within the cache TTL are answered from the cache;
+    the others are scanned and their results cached.
+
+    Args:
+        networks: CIDR strings or ipaddress networks
+        port: TCP port to probe
+        concurrency: Connects in flight at most (capped below the open file limit)
+        connect_timeout: Seconds to wait for a TCP connect
+        idn_timeout: Seconds to wait for the *IDN? reply
+        cache: DiscoveryCache, or None for no caching
+        refresh: Scan even ranges the cache still holds
+
+    Yields:
+        (host, idn, cached) for each unit as it is found
+    """
+    concurrency = concurrency_limit(concurrency)
+    for network in networks:
+        if not isinstance(network, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+            network = parse_network(network)
+
+        cached = None if cache is None or refresh else cache.fresh(network, port)
+        if cached is not None:
+            for host, idn in cached:
+                yield host, idn, True
+            continue
+
+        found = []
+        async for host, idn in scan(network_hosts(network), port, concurrency,
+                                    connect_timeout, idn_timeout):
+            found.append((host, idn))
+            yield host, idn, False
+        if cache is not None:
+            cache.scanned(network, port, found)
+            cache.save()
+
+
+async def discover_all(networks, **options):
+    """Collect discover() results into a list of (host, idn, cached)"""
+    return [unit async for unit in discover(networks, **options)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='APS M2000 Network Discovery')
+    parser.add_argument('networks', nargs='+',
+                       help="Ranges to scan: CIDR up to /16 (192.168.0.0/22), an address, "
+                            "or a /24 base (192.168.1)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                       help=f'TCP port to probe (default: {DEFAULT_PORT})')
+    parser.add_argument('--concurrency', type=int, default=256,
+                       help='Connects in flight at most (default: 256)')
+    parser.add_argument('--timeout', type=float, default=0.3,
+                       help='TCP connect timeout in seconds (default: 0.3)')
+    parser.add_argument('--idn-timeout', type=float, default=1.0,
+                       help='*IDN? reply timeout in seconds (default: 1.0)')
+    parser.add_argument('--cache', default=default_cache_path(),
+                       help='Cache file (default: %(default)s)')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL,
+                       help=f'Seconds a cached scan stays valid (default: {DEFAULT_TTL:.0f})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Neither read nor write the cache')
+    parser.add_argument('--refresh', action='store_true',
+                       help='Rescan ranges even if the cache still holds them')
+    parser.add_argument('--json', action='store_true',
+                       help='Print one JSON object per unit instead of text')
+
+    args = parser.parse_args()
+
+    try:
+        networks = [parse_network(text) for text in args.networks]
+    except ValueError as e:
+        print(f"Invalid range: {e}")
+        return 1
+
+    cache = None if args.no_cache else DiscoveryCache(args.cache, args.ttl)
+    total = sum(len(network_hosts(network)) for network in networks)
+
+    async def run():
+        count = 0
+        start = time.perf_counter()
+        if not args.json:
+            print(f"Scanning {total} addresses in {', '.join(map(str, networks))} "
+                  f"(port {args.port}, {concurrency_limit(args.concurrency)} connects in flight)")
+        async for host, idn, cached in discover(networks, args.port, args.concurrency,
+                                                args.timeout, args.idn_timeout, cache, args.refresh):
+            count += 1
+            if args.json:
+                print(json.dumps({'host': host, 'port': args.port, 'idn': idn, 'cached': cached}),
+                      flush=True)
+            else:
+                print(f"Found M2000 at {host}: {idn}{' (cached)' if cached else ''}", flush=True)
+        if not args.json:
+            print(f"{count} M2000 unit(s) found in {time.perf_counter() - start:.2f}s")
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nDiscovery stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Serial and USB Emulators
+Hardware-free stand-ins for the RS232 and USB interfaces, answering with the
+protocol simulator (m2000_simulator):
+
+- SerialStandin: pseudo-terminal pair; M2000_RS232 opens the slave side
+  like a real port, responses are paced at the configured baud rate
+- Fake hid module: in-process replacement for hidapi with 64-byte reports
+  paced at the HID polling interval; install it before importing m2000_usb
+
+Linux/macOS only (uses pty).
+"""
+
+import os
+import queue
+import select
+import sys
+import threading
+import time
+import types
+import argparse
+
+from m2000_simulator import M2000Simulator, TERMINATORS
+
+
+M2000_VID = 4292
+M2000_PID = 34869
+REPORT_SIZE = 64
+
+
+class SerialStandin:
+    def __init__(self, baudrate=115200, simulator=None, latency=0.0, check_baud=True):
+        """
+        Simulated M2000 behind a pseudo-terminal
+
+        Args:
+            baudrate: Line rate used to pace both directions (8N1: 10 bits per byte)
+            simulator: Shared M2000Simulator (default: a new one)
+            latency: Seconds of processing time before each response
+            check_baud: Ignore data while the host has the port set to another
+                        baud rate, as a real instrument would only see framing errors
+        """
+        self.baudrate = baudrate
+        self.check_baud = check_baud
+        self.simulator = simulator or M2000Simulator()
+        self.latency = latency
+        self.master = None
+        self.slave = None
+        self.port = None
+        self.threads = []
+        self.outgoing = None  # Replies waiting for the transmit side of the line
+        self.running = False
+        self.responses = 0
+
+    @property
+    def bytes_per_second(self):
+        return self.baudrate / 10.0
+
+    def start(self):
+        """Open the pty pair and start answering; returns the port name for pyserial"""
+        import tty
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.running = True
+        self.outgoing = queue.Queue()
+        # Full duplex: commands are received while earlier replies are still going out
+        self.threads = [threading.Thread(target=self._receive, name='SerialStandin rx', daemon=True),
+                        threading.Thread(target=self._transmit, name='SerialStandin tx', daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return self.port
+
+    def stop(self):
+        """Stop answering and close the pty pair"""
+        self.running = False
+        if self.threads:
+            self.outgoing.put(None)
+            for thread in self.threads:
+                thread.join(timeout=2)
+            self.threads = []
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.master = self.slave = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _receive(self):
+        session = self.simulator.session()
+        pending = b''
+        while self.running:
+            readable, _, _ = select.select([self.master], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                break
+            if self.check_baud and not self._host_baud_matches():
+                pending = b''
+                continue
+            # Received bytes occupied the line for their transmission time
+            time.sleep(len(data) / self.bytes_per_second)
+
+            parts = TERMINATORS.split(pending + data)
+            pending = parts.pop()
+            for part in parts:
+                if not part:
+                    continue
+                response = session.execute(part.decode('ascii', 'replace'))
+                if response is not None:
+                    if self.latency:
+                        time.sleep(self.latency)
+                    self.outgoing.put(response.encode('ascii') + b'\r\n')
+
+    def _host_baud_matches(self):
+        """The pty shares the host side's termios, including the speed pyserial set"""
+        import termios
+
+        speed = getattr(termios, f'B{self.baudrate}', None)
+        try:
+            attributes = termios.tcgetattr(self.master)
+        except termios.error:
+            return True
+        return speed is None or attributes[5] == speed
+
+    def _transmit(self):
+        """Write replies at the line rate in ~2 ms slices, each once it has fully left the wire"""
+        rate = self.bytes_per_second
+        step = max(1, int(rate * 0.002))
+        while True:
+            data = self.outgoing.get()
+            if data is None:
+                return
+            start = time.monotonic()
+            for offset in range(0, len(data), step):
+                chunk = data[offset:offset + step]
+                delay = start + (offset + len(chunk)) / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    os.write(self.master, chunk)
+                except OSError:
+                    return
+            self.responses += 1
+
+
+class FakeHidBackend:
+    def __init__(self, simulator=None, latency=0.0, report_interval=0.001,
+                 vid=M2000_VID, pid=M2000_PID):
+        """
+        Simulated M2000 USB HID interface
+
+        Args:
+            simulator: Shared M2000Simulator (default: a new one)
+            latency: Seconds of processing time before each response
+            report_interval: Seconds per HID report in each direction
+                             (full-speed interrupt endpoint: 1 ms)
+            vid: USB vendor ID reported by enumerate()
+            pid: USB product ID reported by enumerate()
+        """
+        self.simulator = simulator or M2000Simulator()
+        self.latency = latency
+        self.report_interval = report_interval
+        self.vid = vid
+        self.pid = pid
+        self.reports_in = 0
+        self.reports_out = 0
+
+    def enumerate(self, vid=0, pid=0):
+        if (vid and vid != self.vid) or (pid and pid != self.pid):
+            return []
+        return [{
+            'path': b'fake-m2000:0',
+            'vendor_id': self.vid,
+            'product_id': self.pid,
+            'serial_number': 'SIM00001',
+            'manufacturer_string': 'APS',
+            'product_string': 'M2000 (simulated)',
+            'interface_number': 0,
+        }]
+
+
+class FakeHidDevice:
+    def __init__(self, backend):
+        """hidapi-compatible device object answering from the simulator"""
+        self.backend = backend
+        self.session = None
+        self.nonblocking = False
+        self.pending = b''
+        self.reports = []           # [(available_at, report)] queued responses
+        self.next_write = 0.0       # Earliest time for the next OUT report
+        self.next_read = 0.0        # Earliest time for the next IN report
+        self.ready = threading.Condition()
+
+    def open(self, vendor_id=0, product_id=0, serial_number=None):
+        if not self.backend.enumerate(vendor_id, product_id):
+            raise OSError("open failed")
+        self.session = self.backend.simulator.session()
+
+    def open_path(self, path):
+        self.session = self.backend.simulator.session()
+
+    def close(self):
+        self.session = None
+
+    def set_nonblocking(self, value):
+        self.nonblocking = bool(value)
+        return 0
+
+    def get_manufacturer_string(self):
+        return 'APS'
+
+    def get_product_string(self):
+        return 'M2000 (simulated)'
+
+    def get_serial_number_string(self):
+        return 'SIM00001'
+
+    def write(self, report):
+        """Accept one OUT report (report ID + up to 63 data bytes)"""
+        if self.session is None:
+            raise OSError("device not open")
+        report = bytes(report)
+        if len(report) > REPORT_SIZE + 1:
+            return -1
+
+        # One report per polling interval
+        interval = self.backend.report_interval
+        now = time.monotonic()
+        if self.next_write > now:
+            time.sleep(self.next_write - now)
+            now = self.next_write
+        self.next_write = now + interval
+        self.backend.reports_in += 1
+
+        data = report[1:].split(b'\x00', 1)[0]
+        parts = TERMINATORS.split(self.pending + data)
+        self.pending = parts.pop()
+        for part in parts:
+            if not part:
+                continue
+            response = self.session.execute(part.decode('ascii', 'replace'))
+            if response is not None:
+                self._queue(response.encode('ascii') + b'\r\n', now)
+        return len(report)
+
+    def _queue(self, data, now):
+        interval = self.backend.report_interval
+        available = now + self.backend.latency
+        with self.ready:
+            if self.reports:
+                available = max(available, self.reports[-1][0] + interval)
+            for offset in range(0, len(data), REPORT_SIZE - 1):
+                chunk = data[offset:offset + REPORT_SIZE - 1]
+                report = [0] + list(chunk) + [0] * (REPORT_SIZE - 1 - len(chunk))
+                self.reports.append((available, report))
+                available += interval
+            self.ready.notify_all()
+
+    def read(self, max_length, timeout_ms=0):
+        """Return the next IN report as a list of ints, or [] on timeout"""
+        if self.session is None:
+            raise OSError("device not open")
+        if timeout_ms:
+            deadline = time.monotonic() + timeout_ms / 1000.0
+        elif self.nonblocking:
+            deadline = time.monotonic()
+        else:
+            deadline = None
+
+        with self.ready:
+            while True:
+                now = time.monotonic()
+                if self.reports:
+                    available = max(self.reports[0][0], self.next_read)
+                    if available <= now:
+                        _, report = self.reports.pop(0)
+                        self.next_read = now + self.backend.report_interval
+                        self.backend.reports_out += 1
+                        return report[:max_length]
+                    wake = available
+                else:
+                    wake = None
+                if deadline is not None and now >= deadline:
+                    return []
+                wakes = [t for t in (wake, deadline) if t is not None]
+                self.ready.wait(max(0.0, min(wakes) - now) if wakes else None)
+
+
+def make_fake_hid(simulator=None, latency=0.0, report_interval=0.001,
+                  vid=M2000_VID, pid=M2000_PID):
+    """
+    Build a module object with the hidapi interface used by m2000_usb
+
+    Returns:
+        Module with enumerate(), device() and .backend (FakeHidBackend)
+    """
+    backend = FakeHidBackend(simulator, latency, report_interval, vid, pid)
+    module = types.ModuleType('hid')
+    module.__doc__ = "Fake hidapi module backed by the M2000 protocol simulator"
+    module.backend = backend
+    module.enumerate = backend.enumerate
+    module.device = lambda: FakeHidDevice(backend)
+    module.Device = module.device
+    return module
+
+
+def install_fake_hid(simulator=None, latency=0.0, report_interval=0.001):
+    """
+    Make 'import hid' (and an already imported m2000_usb) use a fake device
+
+    Returns:
+        The fake hid module
+    """
+    module = make_fake_hid(simulator, latency, report_interval)
+    sys.modules['hid'] = module
+    if 'm2000_usb' in sys.modules:
+        sys.modules['m2000_usb'].hid = module
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description='APS M2000 serial port emulator (pty)')
+    parser.add_argument('--baud', type=int, default=115200,
+                       choices=[9600, 19200, 57600, 115200],
+                       help='Baud rate to emulate (default: 115200)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                       help='Response latency in ms (default: 0)')
+
+    args = parser.parse_args()
+
+    standin = SerialStandin(args.baud, latency=args.latency / 1000.0)
+    port = standin.start()
+    print(f"Simulated M2000 on {port} at {args.baud} baud")
+    print(f"Try: python3 m2000_rs232.py --port {port} --baud {args.baud} --stream")
+    print("Press Ctrl+C to stop\n")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\nEmulator stopped after {standin.responses} responses")
+    finally:
+        standin.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
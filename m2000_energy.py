@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Host-Side Energy Integration
+Integrates streamed W, VA and VAR samples into Wh, VAh and VARh per
+channel/VPA with the trapezoidal rule, continuously and on the host, so any
+number of named windows (a shift, the day, a test run) can run side by side;
+the instrument's own INTEG/INTEGTIME integrates one session at a time.
+
+Timestamps are the monotonic seconds-since-start of stream_data; samples
+that do not move forward are rejected. Intervals longer than max_gap are
+not integrated and are counted as gap time instead. Unavailable readings
+(NaN, error text) follow a gap policy:
+    skip - an interval with an unavailable end contributes nothing
+    hold - the last valid value stands in for the missing one
+    zero - the missing value counts as 0
+
+integrate() does the same integration vectorized over recorded arrays, and
+integrate_log() over CSV/.m2b logs and segmented logs.
+Requires: pip install numpy (batch mode only)
+"""
+
+import math
+import os
+import time
+import json
+import sys
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from m2000_binlog import BinaryLog, is_binary_log, split_key
+
+
+# Integrated quantity per streamed parameter
+ENERGY_UNITS = {
+    'W': 'Wh',
+    'VA': 'VAh',
+    'VAR': 'VARh',
+}
+
+GAP_POLICIES = ('skip', 'hold', 'zero')
+
+
+def energy_columns(keys):
+    """
+    Keys that integrate into energy
+
+    Args:
+        keys: Result keys, e.g. QueryPlan.keys ('CH1_V', 'CH1_W', 'VPA1_VAR', ...)
+
+    Returns:
+        List of (column index, key, energy key) - e.g. (1, 'CH1_W', 'CH1_Wh')
+    """
+    return [(i, key, f"{key}h") for i, key in enumerate(keys)
+            if split_key(key)[1] in ENERGY_UNITS]
+
+
+def parse_window(text):
+    """'day:86400' -> ('day', 86400.0); 'run' -> ('run', None)"""
+    name, _, period = text.partition(':')
+    if not name:
+        raise ValueError(f"Energy window {text!r} has no name")
+    return name, (float(period) if period else None)
+
+
+class EnergyMeter:
+    def __init__(self, keys, policy='skip', max_gap=None, time_origin=0.0, on_close=None,
+                 report=None):
+        """
+        Incremental energy integrator fed one sample at a time
+
+        Args:
+            keys: Result keys of the streamed values (non-energy keys are ignored)
+            policy: Unavailable value handling, 'skip', 'hold' or 'zero' (see GAP_POLICIES)
+            max_gap: Intervals longer than this many seconds are not integrated (None = no limit)
+            time_origin: Wall-clock seconds of timestamp 0; periodic windows align to the wall clock
+            on_close: Optional callable receiving the result of each periodic window as it closes
+            report: Optional JSON report path (see save())
+        """
+        if policy not in GAP_POLICIES:
+            raise ValueError(f"Unknown gap policy {policy!r}, expected one of {GAP_POLICIES}")
+        columns = energy_columns(keys)
+        if not columns:
+            raise ValueError("No W, VA or VAR values to integrate")
+
+        self.policy = policy
+        self.max_gap = max_gap or None
+        self.time_origin = time_origin or 0.0
+        self.on_close = on_close
+        self.report = report
+        self.indices = [i for i, _, _ in columns]
+        self.keys = [key for _, _, key in columns]
+
+        n = len(columns)
+        self.totals = [0.0] * n    # Wh/VAh/VARh since the first sample
+        self.covered = [0.0] * n   # Seconds integrated per key
+        self.previous = [math.nan] * n  # Effective values of the last sample
+        self.held = [math.nan] * n      # Last valid values ('hold')
+        self.first = None
+        self.last = None
+        self.samples = 0
+        self.rejected = 0   # Timestamps that did not move forward
+        self.gap_seconds = 0.0  # Intervals longer than max_gap
+
+        self.windows = {}
+        self.history = []   # Results of closed periodic windows
+
+    def _value(self, j, value):
+        """Effective value of one reading under the gap policy"""
+        if isinstance(value, float) and value == value:
+            self.held[j] = value
+            return value
+        if self.policy == 'hold':
+            return self.held[j]
+        if self.policy == 'zero':
+            return 0.0
+        return math.nan
+
+    def add(self, timestamp, values):
+        """
+        Integrate one sample
+
+        Args:
+            timestamp: Seconds since the stream started (monotonic)
+            values: All streamed values, in the order of keys
+        """
+        last = self.last
+        if last is not None and timestamp <= last:
+            self.rejected += 1
+            return
+        current = [self._value(j, values[i]) for j, i in enumerate(self.indices)]
+        self.samples += 1
+        if last is None:
+            self.first = self.last = timestamp
+            self.previous = current
+            for window in self.windows.values():
+                self._open_window(window)
+            return
+
+        dt = timestamp - last
+        previous = self.previous
+        if self.max_gap is not None and dt > self.max_gap:
+            self.gap_seconds += dt
+            valid = None
+        else:
+            valid = [a == a and b == b for a, b in zip(previous, current)]
+
+        # Periodic windows close at their boundary, mid-interval if need be
+        for window in self.windows.values():
+            period = window['period']
+            if period is None or window['stopped'] is not None:
+                continue
+            while self.time_origin + timestamp >= window['bucket_end']:
+                boundary = window['bucket_end'] - self.time_origin
+                totals = self.totals
+                if valid is not None:
+                    x = boundary - last
+                    totals = [total + (a + a + (b - a) * x / dt) * x / 7200.0 if ok else total
+                              for total, a, b, ok in zip(totals, previous, current, valid)]
+                self._roll_window(window, boundary, totals)
+
+        if valid is not None:
+            totals = self.totals
+            covered = self.covered
+            for j, ok in enumerate(valid):
+                if ok:
+                    totals[j] += (previous[j] + current[j]) * dt / 7200.0
+                    covered[j] += dt
+        self.previous = current
+        self.last = timestamp
+
+    def start_window(self, name, period=None):
+        """
+        Start (or restart) a named window
+
+        Args:
+            name: Window name, e.g. 'shift' or 'test-42'
+            period: Seconds per period: the window closes and reopens at every
+                    multiple of period on the wall clock (86400 = per UTC day);
+                    None = runs until stop_window()
+        """
+        window = {'name': name, 'period': period, 'start': None, 'stopped': None,
+                  'base': None, 'energy': None, 'bucket_end': None}
+        self.windows[name] = window
+        if self.last is not None:
+            self._open_window(window)
+        return window
+
+    def _open_window(self, window, start=None, base=None):
+        window['start'] = self.last if start is None else start
+        window['base'] = list(self.totals if base is None else base)
+        window['covered'] = list(self.covered)
+        if window['period']:
+            period = window['period']
+            window['bucket_end'] = (math.floor((self.time_origin + window['start']) / period) + 1) * period
+
+    def _roll_window(self, window, boundary, totals):
+        """Close a periodic window at boundary (energy totals there) and open the next period"""
+        result = self._result(window, boundary, totals)
+        self.history.append(result)
+        if self.on_close is not None:
+            self.on_close(result)
+        self._open_window(window, boundary, totals)
+
+    def stop_window(self, name):
+        """Stop a window; its result stays available until it is restarted"""
+        window = self.windows[name]
+        if window['stopped'] is None:
+            window['stopped'] = self.last
+            window['energy'] = self._result(window, self.last, self.totals)
+        return window['energy']
+
+    def remove_window(self, name):
+        """Forget a window"""
+        return self.windows.pop(name, None)
+
+    def _result(self, window, end, totals):
+        start = window['start']
+        base = window['base'] if window['base'] is not None else [0.0] * len(totals)
+        covered = window.get('covered') or [0.0] * len(totals)
+        return {
+            'name': window['name'],
+            'start': None if start is None else self.time_origin + start,
+            'end': None if end is None else self.time_origin + end,
+            'energy': {key: total - b for key, total, b in zip(self.keys, totals, base)},
+            'covered': {key: c - b for key, c, b in zip(self.keys, self.covered, covered)},
+        }
+
+    def window(self, name):
+        """Current (or final, once stopped) result of a window"""
+        window = self.windows[name]
+        if window['stopped'] is not None:
+            return window['energy']
+        return self._result(window, self.last, self.totals)
+
+    def results(self):
+        """Results of all windows plus the whole stream under 'total'"""
+        results = {'total': self._result({'name': 'total', 'start': self.first, 'base': None},
+                                         self.last, self.totals)}
+        for name in self.windows:
+            results[name] = self.window(name)
+        return results
+
+    def stats(self):
+        return {'samples': self.samples, 'rejected': self.rejected, 'gap_seconds': self.gap_seconds,
+                'policy': self.policy, 'max_gap': self.max_gap}
+
+    def summary(self):
+        """One-line energy totals"""
+        text = ", ".join(f"{key}={total:.6g}" for key, total in zip(self.keys, self.totals))
+        extra = []
+        if self.rejected:
+            extra.append(f"{self.rejected} out-of-order samples rejected")
+        if self.gap_seconds:
+            extra.append(f"{self.gap_seconds:.1f}s in gaps")
+        return text + (f" ({', '.join(extra)})" if extra else "")
+
+    def save(self, path):
+        """Write windows, closed periods and stats to a JSON report (atomically)"""
+        report = {'updated': time.time(), 'stats': self.stats(), 'windows': self.results(),
+                  'history': self.history}
+        temp = path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(report, f, indent=1)
+        os.replace(temp, path)
+
+
+def add_energy_arguments(parser):
+    """Add the --energy* options to an interface script's parser"""
+    parser.add_argument('--energy', nargs='*', metavar='NAME[:PERIOD]',
+                       help='Integrate W/VA/VAR into Wh/VAh/VARh while streaming; optional named '
+                            'windows, e.g. shift:28800 day:86400 run')
+    parser.add_argument('--energy-gap', choices=GAP_POLICIES, default='skip',
+                       help='Unavailable values: skip the interval, hold the last value or count '
+                            'as zero (default: skip)')
+    parser.add_argument('--energy-max-gap', type=float, default=0,
+                       help='Do not integrate across intervals longer than this many seconds '
+                            '(default: 0 = no limit)')
+    parser.add_argument('--energy-report', type=str,
+                       help='Write energy windows to this JSON file when streaming ends')
+
+
+def meter_options(args):
+    """stream_data energy options from parsed --energy* arguments (None = no integration)"""
+    if args.energy is None:
+        return None
+    return {'windows': [parse_window(text) for text in args.energy], 'policy': args.energy_gap,
+            'max_gap': args.energy_max_gap, 'report': args.energy_report}
+
+
+def open_energy(keys, time_origin, windows=(), policy='skip', max_gap=None, report=None):
+    """
+    Create the EnergyMeter of a stream, reporting failures the way the interface scripts do
+
+    Args:
+        keys: Result keys of the stream
+        time_origin: Wall-clock seconds of timestamp 0
+        windows: (name, period) pairs to start
+        policy, max_gap: See EnergyMeter
+        report: JSON report path, written by close_energy()
+
+    Returns:
+        EnergyMeter
+    """
+    def closed(result):
+        energy = ", ".join(f"{key}={value:.6g}" for key, value in result['energy'].items())
+        print(f"Energy window {result['name']} closed: {energy}")
+
+    try:
+        meter = EnergyMeter(keys, policy, max_gap, time_origin, on_close=closed, report=report)
+    except ValueError as e:
+        print(f"Cannot integrate energy: {e}")
+        raise Exception(f"Cannot integrate energy: {e}")
+    for name, period in windows:
+        meter.start_window(name, period)
+    return meter
+
+
+def close_energy(meter):
+    """Print the energy windows of a finished stream and write its report"""
+    print(f"Energy: {meter.summary()}")
+    for name, result in meter.results().items():
+        if name != 'total':
+            energy = ", ".join(f"{key}={value:.6g}" for key, value in result['energy'].items())
+            print(f"  {name}: {energy}")
+    if meter.report:
+        meter.save(meter.report)
+        print(f"Energy report: {meter.report}")
+
+
+def integrate(seconds, values, policy='skip', max_gap=None, period=None, time_origin=0.0):
+    """
+    Vectorized trapezoidal integration of recorded power values
+
+    Gives the same totals as feeding the samples to EnergyMeter one by one.
+
+    Args:
+        seconds: Timestamps in seconds since time_origin, shape (n,)
+        values: W/VA/VAR values, shape (n, k); NaN = unavailable
+        policy: 'skip', 'hold' or 'zero' (see GAP_POLICIES)
+        max_gap: Intervals longer than this many seconds are not integrated
+        period: Also split the energy into wall-clock periods of this many seconds
+        time_origin: Wall-clock seconds of timestamp 0
+
+    Returns:
+        Dictionary with 'energy' (k,) in Wh/VAh/VARh, 'covered' (k,) seconds,
+        'rejected', 'gap_seconds' and, with a period, 'period_start' (m,) wall
+        clock seconds and 'period_energy' (m, k)
+    """
+    if np is None:
+        raise ImportError("Batch energy integration requires numpy: pip install numpy")
+    if policy not in GAP_POLICIES:
+        raise ValueError(f"Unknown gap policy {policy!r}, expected one of {GAP_POLICIES}")
+
+    t = np.asarray(seconds, np.float64)
+    v = np.asarray(values, np.float64).reshape(len(t), -1)
+    # Only samples that move time forward, as EnergyMeter.add() accepts them
+    keep = np.ones(len(t), bool)
+    if len(t) > 1:
+        keep[1:] = t[1:] > np.maximum.accumulate(t)[:-1]
+    rejected = int(len(t) - keep.sum())
+    t, v = t[keep], v[keep]
+
+    if policy == 'zero':
+        v = np.nan_to_num(v, nan=0.0, posinf=0.0, neginf=0.0)
+    elif policy == 'hold':
+        rows = np.where(np.isnan(v), 0, np.arange(len(v))[:, None])
+        v = np.take_along_axis(v, np.maximum.accumulate(rows, axis=0), axis=0)
+
+    k = v.shape[1]
+    dt = np.diff(t)
+    ok = ~(np.isnan(v[:-1]) | np.isnan(v[1:]))
+    gaps = np.zeros(len(dt), bool) if not max_gap else dt > max_gap
+    ok &= ~gaps[:, None]
+    segments = np.where(ok, (v[:-1] + v[1:]) * (dt / 7200.0)[:, None], 0.0)
+
+    result = {
+        'energy': segments.sum(axis=0) if len(dt) else np.zeros(k),
+        'covered': np.where(ok, dt[:, None], 0.0).sum(axis=0) if len(dt) else np.zeros(k),
+        'rejected': rejected,
+        'gap_seconds': float(dt[gaps].sum()),
+    }
+
+    if period and len(t):
+        first = math.floor((time_origin + t[0]) / period)
+        last = math.floor((time_origin + t[-1]) / period)
+        edges = np.arange(first + 1, last + 1) * period - time_origin
+        cumulative = np.vstack([np.zeros(k), np.cumsum(segments, axis=0)])
+        # Energy up to each boundary: whole intervals before it plus the part
+        # of the interval it falls in, along the straight line between samples
+        i = np.clip(np.searchsorted(t, edges, 'right') - 1, 0, max(len(dt) - 1, 0))
+        at_edges = cumulative[i]
+        if len(dt):
+            x = (edges - t[i])[:, None]
+            a, b = v[i], v[i + 1]
+            part = (a + a + (b - a) * x / dt[i][:, None]) * x / 7200.0
+            at_edges = at_edges + np.where(ok[i] & (x > 0), part, 0.0)
+        marks = np.vstack([np.zeros(k), at_edges, cumulative[-1:]])
+        result['period_start'] = np.arange(first, last + 1) * float(period)
+        result['period_energy'] = np.diff(marks, axis=0)
+    return result
+
+
+def read_power(path, chunk_rows=100000):
+    """
+    Load the W/VA/VAR columns of a recorded log
+
+    Args:
+        path: CSV or .m2b log, or a segmented log's manifest/logical path
+
+    Returns:
+        (time_origin, energy keys, seconds (n,), values (n, k))
+    """
+    from m2000_convert import parse_header, read_chunks
+    from m2000_index import _open_index, index_path, segment_paths
+    from m2000_segments import open_compressed
+
+    origin = None
+    keys = None
+    times, blocks = [], []
+    for segment in segment_paths(path):
+        base = index_path(segment)[:-len('.idx')]
+        if is_binary_log(base):
+            if base != segment:
+                with open_compressed(segment) as f:
+                    log = BinaryLog(base, f.read())
+            else:
+                log = BinaryLog(segment)
+            columns = energy_columns(log.keys)
+            if origin is None:
+                origin = log.time_origin_ns / 1e9
+            times.append((log.time - int(round(origin * 1e9))) / 1e9)
+            blocks.append(log.values[:, [i for i, _, _ in columns]].astype(np.float64))
+        else:
+            index = _open_index(segment)
+            segment_origin = index.time_origin if index is not None else 0.0
+            if origin is None:
+                origin = segment_origin
+            with open_compressed(segment, 'rt') as f:
+                names, _ = parse_header(f.readline())
+                columns = energy_columns(names)
+                picks = [i for i, _, _ in columns]
+                for data in read_chunks(f, len(names), chunk_rows):
+                    times.append(data[:, 0] + (segment_origin - origin))
+                    blocks.append(data[:, picks])
+        if keys is None:
+            keys = [key for _, _, key in columns]
+        elif keys != [key for _, _, key in columns]:
+            raise ValueError(f"{segment}: columns differ from the first segment")
+
+    if not keys:
+        raise ValueError(f"{path}: no W, VA or VAR columns to integrate")
+    return (origin or 0.0, keys, np.concatenate(times) if times else np.empty(0),
+            np.vstack(blocks) if blocks else np.empty((0, len(keys))))
+
+
+def integrate_log(path, policy='skip', max_gap=None, period=None):
+    """
+    Recompute the energy of a recorded log (see integrate())
+
+    Returns:
+        integrate() result plus 'keys' and 'time_origin'
+    """
+    origin, keys, seconds, values = read_power(path)
+    result = integrate(seconds, values, policy, max_gap, period, origin)
+    result['keys'] = keys
+    result['time_origin'] = origin
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 energy from recorded logs')
+    parser.add_argument('logs', nargs='+',
+                       help='CSV or .m2b logs, or segmented logs (run.csv / run.manifest.json)')
+    parser.add_argument('--gap', choices=GAP_POLICIES, default='skip',
+                       help='Unavailable values: skip, hold or zero (default: skip)')
+    parser.add_argument('--max-gap', type=float, default=0,
+                       help='Do not integrate across intervals longer than this (default: 0 = no limit)')
+    parser.add_argument('--period', type=float, default=0,
+                       help='Also list energy per wall-clock period in seconds, e.g. 3600 or 86400')
+
+    args = parser.parse_args()
+
+    for path in args.logs:
+        start = time.perf_counter()
+        try:
+            result = integrate_log(path, args.gap, args.max_gap or None, args.period or None)
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}")
+            return 1
+        elapsed = time.perf_counter() - start
+        print(f"{path}: {result['rejected']} samples rejected, {result['gap_seconds']:.1f}s in gaps "
+              f"({elapsed:.3f}s)")
+        for key, energy, covered in zip(result['keys'], result['energy'], result['covered']):
+            print(f"  {key:<12} {energy:>16.6f}  over {covered:.1f}s")
+        if args.period:
+            print(f"\n{'Period':<20} " + " ".join(f"{key:>14}" for key in result['keys']))
+            for start_wall, row in zip(result['period_start'], result['period_energy']):
+                stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_wall))
+                print(f"{stamp:<20} " + " ".join(f"{value:>14.6f}" for value in row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Fleet Poller
+Polls many LAN analyzers concurrently from one event loop and merges their
+readings into a single time-aligned stream with per-unit health statistics
+"""
+
+import asyncio
+import json
+import time
+import sys
+import argparse
+
+from m2000_async import AsyncM2000_LAN
+from m2000_log import open_log
+from m2000_plan import compile_plan
+
+
+class FleetUnit:
+    def __init__(self, name, host, port=10733, channels=['CH1'], parameters=['V', 'A', 'W'],
+                 timeout=2.0):
+        """
+        One analyzer in the fleet with a persistent session
+
+        Args:
+            name: Label used in the merged stream
+            host: IP address or hostname of M2000
+            port: TCP port (always 10733 for M2000)
+            channels: Channels to read from this unit
+            parameters: Parameters to read from this unit
+            timeout: Connect and read timeout in seconds
+        """
+        self.name = name
+        self.host = host
+        self.port = port
+        self.channels = list(channels)
+        self.parameters = list(parameters)
+        self.client = AsyncM2000_LAN(host=host, port=port, timeout=timeout)
+        self.plan = compile_plan(self.channels, self.parameters)
+        self.read_command = self.plan.command
+        self.command = self.read_command  # READ? after (re)connect, then REREAD?
+        self.task = None
+
+        # Reconnect backoff
+        self.retry_delay = 0.5
+        self.max_retry_delay = 30.0
+        self.next_retry = 0.0
+
+        # Health statistics
+        self.polls = 0
+        self.samples = 0
+        self.errors = 0
+        self.late = 0
+        self.busy = 0
+        self.reconnects = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.last_error = None
+        self.last_sample = None
+
+    @property
+    def connected(self):
+        return self.client.connected
+
+    async def poll(self):
+        """Connect if needed, then read one sample; returns data dict or None"""
+        loop = asyncio.get_running_loop()
+        self.polls += 1
+        try:
+            if not self.client.connected:
+                if loop.time() < self.next_retry:
+                    return None
+                # Reconnect warm (no *RST) once the unit has been set up
+                warm = self.client.last_read_command is not None
+                if not await self.client.connect(warm=warm):
+                    self._failed(loop, "connect failed")
+                    return None
+                self.reconnects += 1
+                self.retry_delay = 0.5
+                self.command = 'REREAD?' if warm else self.read_command
+
+            start = loop.time()
+            response = await self.client.query(self.command)
+            latency = loop.time() - start
+            self.command = 'REREAD?'
+
+            if not response:
+                self.errors += 1
+                return None
+
+            self.samples += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            self.last_sample = time.time()
+            return self.plan.parse(response)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._failed(loop, str(e))
+            return None
+
+    def _failed(self, loop, message):
+        self.errors += 1
+        self.last_error = message
+        if not self.client.connected:
+            # Exponential backoff so a dead unit does not hog the loop
+            self.next_retry = loop.time() + self.retry_delay
+            self.retry_delay = min(self.retry_delay * 2, self.max_retry_delay)
+
+    def health(self):
+        """Return health statistics as a dictionary"""
+        return {
+            'host': self.host,
+            'connected': self.client.connected,
+            'polls': self.polls,
+            'samples': self.samples,
+            'errors': self.errors,
+            'late': self.late,
+            'busy': self.busy,
+            'reconnects': self.reconnects,
+            'connect_ms': (1000.0 * self.client.time_to_first_sample
+                           if self.client.time_to_first_sample is not None else None),
+            'latency_avg_ms': 1000.0 * self.latency_total / self.samples if self.samples else None,
+            'latency_max_ms': 1000.0 * self.latency_max,
+            'last_error': self.last_error,
+            'last_sample': self.last_sample,
+        }
+
+
+class M2000Fleet:
+    def __init__(self, units):
+        """
+        Initialize fleet poller
+
+        Args:
+            units: List of FleetUnit
+        """
+        self.units = units
+
+    @classmethod
+    def from_config(cls, path):
+        """
+        Load a fleet from a JSON file::
+
+            {
+              "channels": ["CH1"], "parameters": ["V", "A", "W"],
+              "units": [
+                {"name": "rack1", "host": "192.168.1.101"},
+                {"name": "rack2", "host": "192.168.1.102", "channels": ["VPA1"]}
+              ]
+            }
+
+        Top-level channels/parameters/port/timeout are defaults for each unit.
+        """
+        with open(path) as f:
+            config = json.load(f)
+
+        defaults = {
+            'port': config.get('port', 10733),
+            'channels': config.get('channels', ['CH1']),
+            'parameters': config.get('parameters', ['V', 'A', 'W']),
+            'timeout': config.get('timeout', 2.0),
+        }
+        units = []
+        for entry in config['units']:
+            options = {**defaults, **{k: v for k, v in entry.items() if k in defaults}}
+            units.append(FleetUnit(entry.get('name', entry['host']), entry['host'], **options))
+        return cls(units)
+
+    async def stream(self, sample_rate=1.0, duration=0):
+        """
+        Poll every unit once per tick and yield merged, time-aligned records
+
+        Each tick starts a REREAD? on every idle unit and waits until all have
+        answered or the next tick is due. Units still busy are reported as
+        missing for that tick and skipped on the next one, so a slow or dead
+        analyzer never stalls the others.
+
+        Args:
+            sample_rate: Ticks per second
+            duration: Duration in seconds (0 = infinite)
+
+        Yields:
+            (timestamp, {unit_name: data dict or None}) tuples
+        """
+        loop = asyncio.get_running_loop()
+        period = 1.0 / sample_rate
+        start = loop.time()
+        tick = start
+
+        try:
+            while duration <= 0 or tick - start <= duration:
+                timestamp = time.time()
+                started = {}
+                for unit in self.units:
+                    if unit.task is not None and not unit.task.done():
+                        unit.busy += 1
+                        continue
+                    unit.task = asyncio.create_task(unit.poll())
+                    started[unit.task] = unit
+
+                tick += period
+                if started:
+                    await asyncio.wait(started, timeout=max(0.0, tick - loop.time()))
+
+                record = {}
+                for task, unit in started.items():
+                    if task.done():
+                        record[unit.name] = task.result()
+                    else:
+                        unit.late += 1
+                        record[unit.name] = None
+                for unit in self.units:
+                    record.setdefault(unit.name, None)
+                yield timestamp, record
+
+                delay = tick - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    tick = loop.time()  # Fell behind - realign instead of bursting
+        finally:
+            for unit in self.units:
+                if unit.task is not None and not unit.task.done():
+                    unit.task.cancel()
+
+    async def close(self):
+        """Disconnect every unit"""
+        await asyncio.gather(*(unit.client.disconnect() for unit in self.units),
+                             return_exceptions=True)
+
+    def health(self):
+        """Return {unit_name: health statistics}"""
+        return {unit.name: unit.health() for unit in self.units}
+
+    def print_health(self):
+        """Print a one-line health summary per unit"""
+        print(f"\n{'Unit':<16} {'Host':<16} {'State':<6} {'Samples':>8} {'Errors':>7} "
+              f"{'Late':>5} {'Recon':>6} {'Avg ms':>8} {'Max ms':>8}")
+        for name, h in self.health().items():
+            avg = f"{h['latency_avg_ms']:.2f}" if h['latency_avg_ms'] is not None else '-'
+            state = 'up' if h['connected'] else 'down'
+            print(f"{name:<16} {h['host']:<16} {state:<6} {h['samples']:>8} {h['errors']:>7} "
+                  f"{h['late']:>5} {h['reconnects']:>6} {avg:>8} {h['latency_max_ms']:>8.2f}")
+
+
+async def run_fleet(fleet, sample_rate, duration, log_file=None, quiet=False, health_interval=10.0):
+    """Stream from the fleet, print/log merged records and health summaries"""
+    keys = [(unit.name, key) for unit in fleet.units for key in unit.plan.keys]
+
+    log = None
+    if log_file:
+        # Rows are written on the log writer thread, off the event loop
+        log = open_log(log_file, "Timestamp," + ",".join(f"{name}.{key}" for name, key in keys))
+
+    start = time.time()
+    last_health = start
+    ticks = 0
+    try:
+        async for timestamp, record in fleet.stream(sample_rate, duration):
+            ticks += 1
+            if log:
+                row = [f"{timestamp - start:.3f}"]
+                for name, key in keys:
+                    data = record[name]
+                    row.append(f"{data[key]}" if data and key in data else "")
+                log.write(",".join(row) + "\n")
+            if not quiet:
+                online = sum(1 for data in record.values() if data)
+                print(f"[{timestamp - start:8.2f}s] {online}/{len(record)} units reporting")
+            if health_interval and timestamp - last_health >= health_interval:
+                fleet.print_health()
+                last_health = timestamp
+    finally:
+        if log:
+            log.close()
+            print(f"Log: {log.summary()}")
+    return ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='APS M2000 Fleet Poller')
+    parser.add_argument('--config', type=str,
+                       help='JSON fleet file (units with host, channels, parameters)')
+    parser.add_argument('--hosts', nargs='+', default=[],
+                       help='M2000 IP addresses (alternative to --config)')
+    parser.add_argument('--port', type=int, default=10733,
+                       help='TCP port for --hosts (default: 10733)')
+    parser.add_argument('--channels', nargs='+', default=['CH1'],
+                       choices=['CH1', 'CH2', 'CH3', 'CH4', 'VPA1', 'VPA2', 'VPA3'],
+                       help='Channels for --hosts (default: CH1)')
+    parser.add_argument('--params', nargs='+', default=['V', 'A', 'W'],
+                       choices=['V', 'A', 'W', 'VA', 'VAR', 'PF', 'FREQ', 'PHASE'],
+                       help='Parameters for --hosts (default: V A W)')
+    parser.add_argument('--duration', type=float, default=10,
+                       help='Duration in seconds, 0 = infinite (default: 10)')
+    parser.add_argument('--rate', type=float, default=1.0,
+                       help='Fleet poll rate in Hz (default: 1.0)')
+    parser.add_argument('--timeout', type=float, default=2.0,
+                       help='Per-unit connect/read timeout in seconds (default: 2.0)')
+    parser.add_argument('--log', type=str,
+                       help='CSV file for the merged stream')
+    parser.add_argument('--quiet', action='store_true',
+                       help='Do not print a line per tick')
+    parser.add_argument('--health-interval', type=float, default=10.0,
+                       help='Seconds between health summaries, 0 = only at end (default: 10)')
+
+    args = parser.parse_args()
+
+    if args.config:
+        fleet = M2000Fleet.from_config(args.config)
+    elif args.hosts:
+        fleet = M2000Fleet([FleetUnit(host, host, args.port, args.channels, args.params, args.timeout)
+                            for host in args.hosts])
+    else:
+        print("Specify --config or --hosts")
+        return 1
+
+    async def run():
+        try:
+            ticks = await run_fleet(fleet, args.rate, args.duration, args.log,
+                                    args.quiet, args.health_interval)
+            print(f"\nFleet streaming finished after {ticks} ticks")
+        finally:
+            fleet.print_health()
+            await fleet.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nFleet streaming stopped")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Response Framing Helper
+Reusable receive buffers that split the M2000 byte stream (socket data, USB
+HID input reports or serial reads) into response lines
+"""
+
+# M2000 responses end with CR LF, but any of these may terminate a line
+LF = 0x0A
+CR = 0x0D
+
+
+class LineBuffer:
+    def __init__(self, chunk_size=65536):
+        """
+        Initialize receive buffer
+
+        Args:
+            chunk_size: Size of the preallocated buffer used for each recv_into()
+        """
+        self.chunk = bytearray(chunk_size)
+        self.chunk_view = memoryview(self.chunk)
+        self.pending = bytearray()
+        self.skip_lf = False  # Last frame ended with CR, swallow a following LF
+        self.eof = False
+
+    def __len__(self):
+        return len(self.pending)
+
+    def clear(self):
+        """Discard any buffered bytes (e.g. after reconnect or resync)"""
+        self.pending.clear()
+        self.skip_lf = False
+        self.eof = False
+
+    def feed(self, data):
+        """Append received bytes to the buffer"""
+        self.pending += data
+
+    def feed_report(self, report):
+        """
+        Append the payload of one HID input report
+
+        Args:
+            report: Report as returned by hidapi (list or bytes): report ID
+                    first, data padded with NUL bytes
+        """
+        data = bytes(report)
+        end = data.find(b'\x00', 1)
+        self.pending += data[1:end] if end >= 0 else data[1:]
+
+    def next_frame(self):
+        """
+        Pop the next complete line from the buffer
+
+        Returns:
+            Line as bytes without terminator, or None if no complete line is buffered
+        """
+        pending = self.pending
+        if self.skip_lf and pending:
+            if pending[0] == LF:
+                del pending[:1]
+            self.skip_lf = False
+
+        lf = pending.find(b'\n')
+        cr = pending.find(b'\r', 0, lf if lf >= 0 else len(pending))
+        if cr >= 0:
+            end = cr
+            if cr + 1 < len(pending):
+                # CR LF counts as a single terminator
+                consumed = cr + 2 if pending[cr + 1] == LF else cr + 1
+            else:
+                # LF may still be in flight
+                consumed = cr + 1
+                self.skip_lf = True
+        elif lf >= 0:
+            end = lf
+            consumed = lf + 1
+        else:
+            return None
+
+        frame = bytes(pending[:end])
+        del pending[:consumed]
+        return frame
+
+    def read_frame(self, sock):
+        """
+        Read the next line from a socket using large recv_into() calls
+
+        Bytes received after the terminator are kept for the next call.
+
+        Args:
+            sock: Connected socket (timeouts propagate to the caller)
+
+        Returns:
+            Line as bytes; on connection close, whatever was buffered
+        """
+        while True:
+            frame = self.next_frame()
+            if frame is not None:
+                return frame
+
+            if not self.fill(sock):
+                # Peer closed the connection - hand back the partial line
+                frame = bytes(self.pending)
+                self.pending.clear()
+                return frame
+
+    def fill(self, sock):
+        """
+        Receive once from a socket into the buffer
+
+        Returns:
+            Number of bytes received, 0 if the peer closed the connection
+        """
+        n = sock.recv_into(self.chunk)
+        if n == 0:
+            self.eof = True
+        else:
+            self.pending += self.chunk_view[:n]
+        return n
+
+    def read_frames(self, sock, count):
+        """Read count consecutive lines from a socket"""
+        return [self.read_frame(sock) for _ in range(count)]
+
+
+class RingBuffer:
+    def __init__(self, capacity=1 << 17):
+        """
+        Fixed-size circular receive buffer with the same line framing as LineBuffer
+
+        Bytes are copied in once and never shifted; the read position just
+        moves on. Used by the serial reader thread.
+
+        Args:
+            capacity: Bytes held at most (default 128 KB, twice the longest M2000 reply)
+        """
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.capacity = capacity
+        self.clear()
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        """Discard any buffered bytes"""
+        self.head = 0       # Position of the oldest byte
+        self.size = 0
+        self.scanned = 0    # Bytes from head already searched without a terminator
+        self.skip_lf = False
+
+    def write(self, data):
+        """
+        Append received bytes
+
+        Raises:
+            BufferError: Not enough room (nothing is written)
+        """
+        n = len(data)
+        if n > self.capacity - self.size:
+            raise BufferError(f"Receive buffer overrun ({self.size} + {n} > {self.capacity} bytes)")
+        tail = (self.head + self.size) % self.capacity
+        first = min(n, self.capacity - tail)
+        self.view[tail:tail + first] = data[:first]
+        if first < n:
+            self.view[:n - first] = data[first:]
+        self.size += n
+
+    def _find(self, start):
+        """Offset from head of the first CR or LF at or after start, or -1"""
+        buffer = self.buffer
+        for begin, end, base in self._segments(start):
+            lf = buffer.find(b'\n', begin, end)
+            cr = buffer.find(b'\r', begin, lf if lf >= 0 else end)
+            hit = cr if cr >= 0 else lf
+            if hit >= 0:
+                return base + hit - begin
+        return -1
+
+    def _segments(self, start):
+        """(begin, end, offset from head) of the buffered bytes past start, in order"""
+        capacity = self.capacity
+        begin = self.head + start
+        end = self.head + self.size
+        if begin >= capacity:
+            return [(begin - capacity, end - capacity, start)]
+        if end <= capacity:
+            return [(begin, end, start)]
+        return [(begin, capacity, start), (0, end - capacity, start + capacity - begin)]
+
+    def _byte(self, offset):
+        return self.buffer[(self.head + offset) % self.capacity]
+
+    def _take(self, count):
+        """Copy out and drop count bytes from the head"""
+        start = self.head
+        end = start + count
+        if end <= self.capacity:
+            data = bytes(self.view[start:end])
+        else:
+            data = bytes(self.view[start:]) + bytes(self.view[:end - self.capacity])
+        self._drop(count)
+        return data
+
+    def _drop(self, count):
+        self.head = (self.head + count) % self.capacity
+        self.size -= count
+        self.scanned = 0
+
+    def next_frame(self):
+        """
+        Pop the next complete line from the buffer
+
+        Returns:
+            Line as bytes without terminator, or None if no complete line is buffered
+        """
+        if self.skip_lf and self.size:
+            if self._byte(0) == LF:
+                self._drop(1)
+            self.skip_lf = False
+
+        end = self._find(self.scanned)
+        if end < 0:
+            self.scanned = self.size
+            return None
+
+        terminator = self._byte(end)
+        frame = self._take(end)
+        if terminator == CR:
+            if self.size > 1:
+                # CR LF counts as a single terminator
+                self._drop(2 if self._byte(1) == LF else 1)
+            else:
+                # LF may still be in flight
+                self._drop(1)
+                self.skip_lf = True
+        else:
+            self._drop(1)
+        return frame
+
+# Example usage and testing
+if __name__ == "__main__":
+    buf = LineBuffer()
+
+    print("=== Framing Test ===")
+    for chunk in [b'+2.30450E+2,+1.2', b'3400E-3\r', b'\n+5.00000E+1\n', b'APS,M2000\r\n']:
+        buf.feed(chunk)
+        frame = buf.next_frame()
+        while frame is not None:
+            print(f"frame: {frame!r}")
+            frame = buf.next_frame()
+    print(f"leftover bytes: {len(buf)}")
+
+    print("\n=== HID Report Test ===")
+    buf.clear()
+    for payload in [b'+2.30450E+2,+1.23400E-3,+2.84200E-1,+5.00000E+1,+9.99000E-1,+1.',
+                    b'00000E+0\r\n']:
+        buf.feed_report([0] + list(payload) + [0] * (63 - len(payload)))
+    print(f"frame: {buf.next_frame()!r}")
+
+    print("\n=== Ring Buffer Test ===")
+    ring = RingBuffer(48)
+    for chunk in [b'+2.30450E+2,+1.2', b'3400E-3\r', b'\n+5.00000E+1\n', b'APS,M2000\r\n'] * 3:
+        ring.write(chunk)
+        frame = ring.next_frame()
+        while frame is not None:
+            print(f"frame: {frame!r}")
+            frame = ring.next_frame()
+    print(f"leftover bytes: {len(ring)}")
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Sparse Time Index
+Sidecar index (<log>.idx) written alongside a log as it is produced: one
+entry per time bucket (default 1 s) holding the first timestamp in the
+bucket and where that row starts - a byte offset in a CSV log, a record
+number in a .m2b binary log. A time range is then read with one seek and a
+short read instead of a scan of the whole file, also while the log is still
+being appended and across the segments of a rotated log.
+"""
+
+import bisect
+import datetime
+import math
+import os
+import struct
+import sys
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from m2000_binlog import BinaryLog, is_binary_log
+from m2000_segments import COMPRESSIONS, MANIFEST_SUFFIX, open_compressed, read_manifest
+
+
+INDEX_MAGIC = b'M2000IDX'
+INDEX_SUFFIX = '.idx'
+DEFAULT_INTERVAL = 1.0  # Seconds per index bucket
+
+_INDEX_HEADER = struct.Struct('<8sddB7x')  # Magic, interval, time origin, unit (0 bytes, 1 records)
+_ENTRY = struct.Struct('<dq')              # Seconds since the time origin, offset
+UNITS = ('bytes', 'records')
+
+
+def index_path(log_path):
+    """Index sidecar of a log (or of a compressed segment's uncompressed name)"""
+    for suffix in COMPRESSIONS.values():
+        if log_path.endswith(suffix):
+            log_path = log_path[:-len(suffix)]
+    return log_path + INDEX_SUFFIX
+
+
+class TimeIndexWriter:
+    def __init__(self, path, interval=DEFAULT_INTERVAL, time_origin=0.0, unit='bytes', append=False):
+        """
+        Create (or continue) an index sidecar
+
+        Args:
+            path: Index file (see index_path())
+            interval: Seconds per bucket; one entry is written per bucket that has rows
+            time_origin: Wall-clock seconds of timestamp 0 (0 = unknown)
+            unit: 'bytes' (CSV offsets) or 'records' (binary log record numbers)
+            append: Continue an existing index instead of truncating it
+        """
+        if unit not in UNITS:
+            raise ValueError(f"Unknown index unit {unit!r}, expected one of {UNITS}")
+        self.path = path
+        self.interval = interval
+        self.last_bucket = None
+        self.pending = []
+
+        if append and os.path.exists(path) and os.path.getsize(path) >= _INDEX_HEADER.size:
+            index = TimeIndex(path)
+            self.interval = index.interval
+            if index.times:
+                self.last_bucket = math.floor(index.times[-1] / self.interval)
+            self.file = open(path, 'ab')
+            # Drop a torn last entry
+            self.file.truncate(_INDEX_HEADER.size + len(index.times) * _ENTRY.size)
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(_INDEX_HEADER.pack(INDEX_MAGIC, interval, time_origin or 0.0,
+                                               UNITS.index(unit)))
+            self.file.flush()
+
+    def add(self, timestamp, offset):
+        """Note a row; it gets an entry if it is the first one in its bucket"""
+        bucket = math.floor(timestamp / self.interval)
+        if bucket != self.last_bucket:
+            self.last_bucket = bucket
+            self.pending.append(_ENTRY.pack(timestamp, offset))
+
+    def add_many(self, seconds, first_offset):
+        """Vectorized add() for consecutive records (NumPy array of seconds)"""
+        buckets = np.floor(seconds / self.interval)
+        starts = np.flatnonzero(np.diff(buckets, prepend=math.nan if self.last_bucket is None
+                                        else self.last_bucket))
+        for i in starts.tolist():
+            self.pending.append(_ENTRY.pack(float(seconds[i]), first_offset + i))
+        if len(buckets):
+            self.last_bucket = int(buckets[-1])
+
+    def flush(self):
+        """Write pending entries - call after the rows they point to are flushed"""
+        if self.pending:
+            self.file.write(b''.join(self.pending))
+            self.pending = []
+        self.file.flush()
+
+    def sync(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class TimeIndex:
+    def __init__(self, path):
+        """
+        Read an index sidecar; refresh() picks up entries of a live log
+
+        Args:
+            path: Index file (see index_path())
+        """
+        self.path = path
+        self.times = []
+        self.offsets = []
+        self.size = _INDEX_HEADER.size
+        with open(path, 'rb') as f:
+            header = f.read(_INDEX_HEADER.size)
+        if len(header) < _INDEX_HEADER.size:
+            raise Exception(f"{path} is not an M2000 time index (file too short)")
+        magic, self.interval, self.time_origin, unit = _INDEX_HEADER.unpack(header)
+        if magic != INDEX_MAGIC:
+            raise Exception(f"{path} is not an M2000 time index (bad magic)")
+        self.unit = UNITS[unit]
+        self.refresh()
+
+    def refresh(self):
+        """Read entries appended since the last call; returns the number of entries"""
+        with open(self.path, 'rb') as f:
+            f.seek(self.size)
+            data = f.read()
+        usable = len(data) - len(data) % _ENTRY.size  # Ignore a torn last entry
+        for timestamp, offset in _ENTRY.iter_unpack(data[:usable]):
+            self.times.append(timestamp)
+            self.offsets.append(offset)
+        self.size += usable
+        return len(self.times)
+
+    def __len__(self):
+        return len(self.times)
+
+    def lookup(self, start):
+        """Offset of the bucket holding start: no row before it is at or after start"""
+        i = bisect.bisect_right(self.times, start) - 1
+        return self.offsets[i] if i >= 0 else None
+
+    def lookup_after(self, end):
+        """Offset of the first bucket starting after end, or None (read to the end)"""
+        i = bisect.bisect_right(self.times, end)
+        return self.offsets[i] if i < len(self.offsets) else None
+
+
+def _open_index(log_path):
+    path = index_path(log_path)
+    return TimeIndex(path) if os.path.exists(path) else None
+
+
+def csv_range(path, start, end):
+    """
+    Rows of a CSV log with start <= timestamp <= end
+
+    Seeks to the index bucket holding start (or scans from the top without
+    an index) and stops at the first row past end. A torn last line of a
+    log still being written is left out.
+
+    Args:
+        path: CSV log (may be a .gz/.zst segment; compressed files are read forward)
+        start, end: Seconds since the log's time origin (the Timestamp column)
+
+    Yields:
+        Row lines (text, with newline)
+    """
+    index = _open_index(path)
+    with open_compressed(path, 'rb') as f:
+        f.readline()  # Header
+        offset = index.lookup(start) if index is not None else None
+        if offset is not None:
+            f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break
+            try:
+                timestamp = float(raw[:raw.index(b',')])
+            except ValueError:
+                continue
+            if timestamp < start:
+                continue
+            if timestamp > end:
+                break
+            yield raw.decode('utf-8')
+
+
+def binary_range(path, start, end, log=None):
+    """
+    Records of a binary log with start <= timestamp <= end
+
+    Args:
+        path: .m2b log
+        start, end: Seconds since the log's time origin
+        log: Already open BinaryLog (e.g. a decompressed segment)
+
+    Returns:
+        (BinaryLog, first record, stop record) - log.records[first:stop] is the
+        range as a view
+    """
+    log = log if log is not None else BinaryLog(path)
+    index = _open_index(path)
+    n = len(log)
+    lo, hi = 0, n
+    if index is not None:
+        lo = min(index.lookup(start) or 0, n)
+        after = index.lookup_after(end)
+        hi = n if after is None else min(after, n)
+    times = log.time[lo:hi]
+    origin = log.time_origin_ns
+    first = lo if start == -math.inf else lo + int(np.searchsorted(times, origin + round(start * 1e9), 'left'))
+    stop = hi if end == math.inf else lo + int(np.searchsorted(times, origin + round(end * 1e9), 'right'))
+    return log, first, max(first, stop)
+
+
+def build_index(path, interval=DEFAULT_INTERVAL):
+    """
+    Index an existing log in one pass (logs written without an index)
+
+    Returns:
+        Number of index entries
+    """
+    if is_binary_log(path):
+        log = BinaryLog(path)
+        writer = TimeIndexWriter(index_path(path), interval, log.time_origin_ns / 1e9, 'records')
+        chunk = 1 << 20
+        for i in range(0, len(log), chunk):
+            writer.add_many((log.time[i:i + chunk] - log.time_origin_ns) / 1e9, i)
+    else:
+        # CSV timestamps are relative; keep the wall-clock origin of an earlier index
+        existing = _open_index(path)
+        writer = TimeIndexWriter(index_path(path), interval,
+                                 existing.time_origin if existing is not None else 0.0)
+        with open(path, 'rb') as f:
+            offset = len(f.readline())
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break
+                try:
+                    writer.add(float(raw[:raw.index(b',')]), offset)
+                except ValueError:
+                    pass
+                offset += len(raw)
+    writer.close()
+    return len(TimeIndex(writer.path))
+
+
+def parse_time(text, time_origin, reference=None):
+    """
+    Convert a command-line time to seconds since the log's time origin
+
+    Accepts seconds ('125.5'), a clock time on the log's start date
+    ('14:32', '14:32:10') or a date and time ('2024-05-01T14:32')
+    """
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    if not time_origin:
+        raise ValueError(f"{text!r}: the log has no wall-clock origin, use seconds")
+    try:
+        moment = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        clock = datetime.time.fromisoformat(text)
+        day = datetime.datetime.fromtimestamp(reference or time_origin).date()
+        moment = datetime.datetime.combine(day, clock)
+    return moment.timestamp() - time_origin
+
+
+def segment_paths(path):
+    """Files of a log: the segments listed in its manifest, or the log itself"""
+    if path.endswith(MANIFEST_SUFFIX):
+        return read_manifest(path)['paths']
+    manifest = os.path.splitext(path)[0] + MANIFEST_SUFFIX
+    if os.path.exists(manifest) and not os.path.exists(path):
+        return read_manifest(manifest)['paths']
+    return [path]
+
+
+def read_range(path, start, end):
+    """
+    Pull a time range out of a log or a segmented log
+
+    Args:
+        path: CSV or .m2b log, or a segmented log's manifest/logical path
+        start, end: Seconds since the log's time origin
+
+    Yields:
+        CSV row lines, or (BinaryLog, first, stop) per binary segment
+    """
+    for segment in segment_paths(path):
+        index = _open_index(segment)
+        if index is not None and index.times and index.times[0] > end:
+            break  # Segments are in time order
+        if index is not None and index.times and index.times[-1] + index.interval < start:
+            continue
+        base = index_path(segment)[:-len(INDEX_SUFFIX)]
+        if is_binary_log(base):
+            if base != segment:
+                with open_compressed(segment) as f:
+                    log = BinaryLog(base, f.read())
+            else:
+                log = None
+            yield binary_range(base, start, end, log)
+        else:
+            yield from csv_range(segment, start, end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 log time range reader')
+    parser.add_argument('log', help='CSV or .m2b log, or a segmented log (run.csv / run.manifest.json)')
+    parser.add_argument('--start', help="Range start: seconds, clock time (14:32) or date-time")
+    parser.add_argument('--end', help='Range end (default: end of the log)')
+    parser.add_argument('--around', help='Centre of the range (clock time, date-time or seconds)')
+    parser.add_argument('--window', type=float, default=600.0,
+                       help='Range length in seconds with --around (default: 600)')
+    parser.add_argument('--build', action='store_true',
+                       help='Index an existing log (written without an index)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                       help=f'Bucket size in seconds for --build (default: {DEFAULT_INTERVAL})')
+
+    args = parser.parse_args()
+
+    if args.build:
+        for segment in segment_paths(args.log):
+            print(f"{index_path(segment)}: {build_index(segment, args.interval)} entries")
+        return 0
+
+    first = segment_paths(args.log)[0]
+    index = _open_index(first)
+    if index is not None:
+        origin = index.time_origin
+    elif is_binary_log(first):
+        origin = BinaryLog(first).time_origin_ns / 1e9
+    else:
+        origin = 0.0
+
+    try:
+        if args.around:
+            centre = parse_time(args.around, origin)
+            start, end = centre - args.window / 2, centre + args.window / 2
+        else:
+            start = parse_time(args.start, origin) if args.start else -math.inf
+            end = parse_time(args.end, origin) if args.end else math.inf
+    except ValueError as e:
+        print(f"Invalid time: {e}")
+        return 1
+
+    header_written = False
+    for item in read_range(args.log, start, end):
+        if isinstance(item, str):
+            if not header_written:
+                with open_compressed(first, 'rt') as f:
+                    sys.stdout.write(f.readline())
+                header_written = True
+            sys.stdout.write(item)
+        else:
+            log, i, j = item
+            log.export_csv(sys.stdout, start=i, stop=j, header=not header_written)
+            header_written = True
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
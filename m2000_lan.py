@@ -4,12 +4,19 @@ APS M2000 Power Analyzer - LAN/Ethernet Interface
 Fully functional script for remote control via TCP/IP
 """
 
+import asyncio
 import socket
 import time
 import sys
 import argparse
-import threading
 import os
+from collections import deque
+
+from m2000_discovery import DiscoveryCache, discover, parse_network
+from m2000_framing import LineBuffer
+from m2000_plan import compile_plan, pack_reads
+from m2000_schedule import DeadlineScheduler, POLICIES, measure_rate, parse_rate
+from m2000_stats import TransportStats
 
 # Import unit formatting module
 try:
@@ -50,46 +57,107 @@ class M2000_LAN:
         self.timeout = timeout
         self.socket = None
         self.connected = False
+        self.rx = LineBuffer()  # Receive buffer, keeps bytes past the current response
+        self.last_read_command = None  # Re-sent by a warm connect so REREAD? keeps working
+        self.time_to_first_sample = None
+        self.stats = None  # TransportStats while instrumentation is enabled
+        
+    def enable_stats(self, stats=None):
+        """
+        Turn on per-query instrumentation (see m2000_stats)
+        
+        Swaps in timed send/read methods; with stats off the plain methods
+        run unchanged.
+        
+        Returns:
+            TransportStats collecting latency histograms and counters
+        """
+        self.stats = stats if stats is not None else TransportStats('lan')
+        self.send_raw = self._send_raw_timed
+        self._read_line = self._read_line_timed
+        return self.stats
+    
+    def disable_stats(self):
+        """Turn off instrumentation, restoring the plain send/read methods"""
+        self.__dict__.pop('send_raw', None)
+        self.__dict__.pop('_read_line', None)
+        self.stats = None
+    
+    def connect(self, warm=False):
+        """
+        Establish TCP connection
         
-    def connect(self):
-        """Establish TCP connection"""
+        Args:
+            warm: Skip *RST/*CLS and the settling delay so the instrument keeps its
+                  configuration. The link is checked with a single query: the last
+                  READ? command if there was one (so REREAD? can resume at once),
+                  otherwise *IDN?
+        """
         try:
+            connect_start = time.perf_counter()
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(self.timeout)
+            self.rx.clear()
             
             print(f"Connecting to M2000 at {self.host}:{self.port}...")
             self.socket.connect((self.host, self.port))
+            self.connected = True  # Link is open - allow commands during initialization
             
-            # Wait for connection to stabilize
-            time.sleep(0.1)
-            
-            # Initialize device using correct M2000 protocol
-            self.send_command('*RST')  # Reset device - no response
-            self.send_command('*CLS')  # Clear device - no response
-            
-            # Check connection with query (queries return responses)
-            response = self.query('*IDN?')
+            if warm and self.last_read_command:
+                # Re-arm REREAD? with the last READ?; its reply is the first sample
+                response = self.query(self.last_read_command)
+                alive = bool(response)
+            else:
+                if not warm:
+                    # Wait for connection to stabilize
+                    time.sleep(0.1)
+                    
+                    # Initialize device using correct M2000 protocol
+                    self.send_command('*RST')  # Reset device - no response
+                    self.send_command('*CLS')  # Clear device - no response
+                
+                # Check connection with query (queries return responses)
+                response = self.query('*IDN?')
+                alive = bool(response) and 'APS' in response
             
-            if response and 'APS' in response:
-                self.connected = True
-                print(f"Connected to: {response}")
+            if alive:
+                self.time_to_first_sample = time.perf_counter() - connect_start
+                if warm:
+                    print(f"Warm connect: first response after {self.time_to_first_sample * 1000:.1f} ms")
+                else:
+                    print(f"Connected to: {response}")
                 return True
             else:
                 print(f"Unexpected response: {response}")
-                return False
                 
         except socket.gaierror as e:
             print(f"DNS resolution failed: {e}")
-            return False
         except socket.timeout:
             print("Connection timeout - check IP address and network")
-            return False
         except ConnectionRefusedError:
             print("Connection refused - check if M2000 is powered on and LAN enabled")
-            return False
         except Exception as e:
             print(f"LAN connection failed: {e}")
-            return False
+        
+        self.drop_link()
+        return False
+    
+    def reconnect(self):
+        """Drop the link and reconnect warm (no *RST), keeping the instrument setup"""
+        if self.stats is not None:
+            self.stats.retry()
+        self.drop_link()
+        return self.connect(warm=True)
+    
+    def drop_link(self):
+        """Close the socket without sending LOCAL"""
+        if self.socket:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+        self.socket = None
+        self.connected = False
     
     def disconnect(self):
         """Close TCP connection"""
@@ -110,9 +178,14 @@ class M2000_LAN:
         if not self.connected or not self.socket:
             raise Exception("Not connected to M2000")
         
+        # Add line feed terminator and encode to ASCII
+        self.send_raw((command + '\n').encode('ascii'))
+        if command[:5].upper() == 'READ?':
+            self.last_read_command = command
+    
+    def send_raw(self, cmd_bytes):
+        """Send pre-encoded command bytes (including terminator) to M2000"""
         try:
-            # Add line feed terminator and encode to ASCII
-            cmd_bytes = (command + '\n').encode('ascii')
             self.socket.sendall(cmd_bytes)
             
         except socket.timeout:
@@ -121,24 +194,40 @@ class M2000_LAN:
             print(f"Send command error: {e}")
             raise
     
+    def _send_raw_timed(self, cmd_bytes):
+        start = time.monotonic_ns()
+        M2000_LAN.send_raw(self, cmd_bytes)
+        self.stats.sent(cmd_bytes, start, time.monotonic_ns())
+    
+    def _read_line(self):
+        """Read one response line as bytes (socket timeouts propagate)"""
+        return self.rx.read_frame(self.socket)
+    
+    def _read_line_timed(self):
+        rx = self.rx
+        start = time.monotonic_ns()
+        try:
+            frame = rx.next_frame()
+            if frame is None:
+                rx.fill(self.socket)  # Blocks until the first bytes of the reply arrive
+                first = time.monotonic_ns()
+                frame = rx.read_frame(self.socket)
+            else:
+                first = start  # Reply was already buffered (pipelining)
+        except socket.timeout:
+            self.stats.timeout()
+            raise
+        self.stats.received(len(frame) + 2, first, time.monotonic_ns())
+        return frame
+    
     def read_response(self):
         """Read response from M2000"""
         if not self.connected or not self.socket:
             raise Exception("Not connected to M2000")
         
         try:
-            # Read until line feed
-            response = ""
-            while True:
-                data = self.socket.recv(1).decode('ascii')
-                if not data:
-                    break
-                if data == '\n':
-                    break
-                if data != '\r':  # Skip carriage return
-                    response += data
-            
-            return response
+            # Read until line terminator using buffered recv_into() calls
+            return self._read_line().decode('ascii')
             
         except socket.timeout:
             raise Exception("Read timeout")
@@ -151,6 +240,98 @@ class M2000_LAN:
         self.send_command(command)
         return self.read_response()
     
+    def query_pipelined(self, commands, window=8):
+        """
+        Send queries keeping up to window of them in flight, yielding responses in order
+        
+        The M2000 answers queries in the order they are received, so keeping
+        several queries outstanding hides the network round trip. The manual
+        specifies a Tx Overrun error (*ERR? code 9) if a query arrives before
+        the previous response has been fully transmitted, so keep the window
+        small for long responses.
+        
+        Args:
+            commands: Iterable of query commands (may be endless, e.g. repeated 'REREAD?')
+            window: Maximum number of queries awaiting a response
+        
+        Yields:
+            (send_time, response) tuples in the order the commands were sent
+        
+        On a read timeout, or if the consumer stops early, late responses are
+        discarded with resync() so the next query starts in step. If the link
+        drops (peer closed, broken pipe, reset) ConnectionError is raised and
+        nothing is drained; reconnect() before querying again.
+        """
+        if not self.connected or not self.socket:
+            raise Exception("Not connected to M2000")
+        
+        window = max(1, int(window))
+        commands = iter(commands)
+        in_flight = deque()  # Send timestamps of unanswered queries
+        exhausted = False
+        link_lost = False
+        
+        try:
+            while True:
+                # Top up the window
+                while not exhausted and len(in_flight) < window:
+                    try:
+                        command = next(commands)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    try:
+                        self.send_command(command)
+                    except OSError as e:
+                        link_lost = True
+                        raise ConnectionError(f"Link lost while sending: {e}") from e
+                    in_flight.append(time.time())
+                
+                if not in_flight:
+                    return
+                
+                try:
+                    response = self._read_line().decode('ascii')
+                except socket.timeout:
+                    raise Exception(f"Read timeout with {len(in_flight)} queries in flight")
+                except OSError as e:
+                    link_lost = True
+                    raise ConnectionError(f"Link lost while reading: {e}") from e
+                if self.rx.eof:
+                    link_lost = True
+                    raise ConnectionError("Connection closed by M2000")
+                
+                yield in_flight.popleft(), response
+        finally:
+            # A dead socket has nothing left to drain - the caller reconnects
+            if in_flight and not link_lost:
+                self.resync()
+    
+    def resync(self, quiet_time=0.2):
+        """
+        Discard buffered and late responses so the next query starts in step
+        
+        Args:
+            quiet_time: Seconds without received data that ends the drain
+        """
+        if not self.socket:
+            return
+        if self.stats is not None:
+            self.stats.retry()
+        
+        try:
+            self.socket.settimeout(quiet_time)
+            while self.socket.recv_into(self.rx.chunk):
+                pass
+        except (socket.timeout, OSError):
+            pass
+        finally:
+            self.rx.clear()
+            try:
+                self.socket.settimeout(self.timeout)
+            except OSError:
+                pass
+    
     def check_errors(self):
         """Check for interface errors"""
         error_code = self.query('*ERR?')
@@ -170,63 +351,47 @@ class M2000_LAN:
         Returns:
             Dictionary with measurement data
         """
-        # Build READ command using correct M2000 syntax
-        read_fields = []
-        for param in parameters:
-            for channel in channels:
-                # Convert parameter names to M2000 format
-                m2000_param = param
-                if param == 'V':
-                    m2000_param = 'VOLTS'
-                elif param == 'A':
-                    m2000_param = 'AMPS'
-                elif param == 'W':
-                    m2000_param = 'WATTS'
-                
-                # Use M2000 command format: READ?,ch1:VOLTS:ACDC
-                read_fields.append(f"READ?,{channel.lower()}:{m2000_param}:ACDC")
+        return self.get_measurements([(channels, parameters)])[0]
+    
+    def get_measurements(self, requests):
+        """
+        Get several channel/parameter sets with as few round trips as possible
         
-        # Send multiple READ commands (can combine with semicolons)
-        command = ";".join(read_fields)
-        response = self.query(command)
+        The READ? fields of all requests are packed into command sets of at
+        most 4095 characters; a request too large for one set is split.
         
-        if response:
-            values = response.split(',')
-            results = {}
-            
-            idx = 0
-            for param in parameters:
-                for channel in channels:
-                    if idx < len(values):
-                        try:
-                            results[f"{channel}_{param}"] = float(values[idx])
-                        except ValueError:
-                            results[f"{channel}_{param}"] = values[idx]
-                        idx += 1
-            
-            return results
-        return None
+        Args:
+            requests: List of (channels, parameters) pairs
+        
+        Returns:
+            List with a measurement dictionary (or None) per request
+        """
+        # Command sets and response mapping are compiled once per request list
+        packer = pack_reads(requests)
+        if self.stats is None:
+            return packer.execute(self.query)
+        
+        responses = [self.query(command) for command in packer.commands]
+        parse_start = time.monotonic_ns()
+        results = packer.unpack(responses)
+        self.stats.parsed('READ?', time.monotonic_ns() - parse_start)
+        return results
     
     def get_3phase_power(self, vpa='VPA1'):
         """Get comprehensive 3-phase power measurements"""
-        parameters = ['W', 'VA', 'VAR', 'PF', 'FREQ']
-        channels = [vpa]
-        
-        # Also get individual phase measurements
-        phase_channels = ['CH1', 'CH2', 'CH3']
-        
-        # Get VPA measurements
-        vpa_data = self.get_measurement(channels, parameters)
-        
-        # Get individual phase V and A
-        phase_data = self.get_measurement(phase_channels, ['V', 'A'])
+        # VPA totals and individual phase V and A in one packed round trip
+        vpa_data, phase_data = self.get_measurements([
+            ([vpa], ['W', 'VA', 'VAR', 'PF', 'FREQ']),
+            (['CH1', 'CH2', 'CH3'], ['V', 'A']),
+        ])
         
         if vpa_data and phase_data:
             return {**vpa_data, **phase_data}
         return None
     
     def stream_data(self, channels=['CH1'], parameters=['V', 'A', 'W'], 
-                   duration=10, sample_rate=5.0, log_file=None):
+                   duration=10, sample_rate=5.0, log_file=None, pipeline=1, policy='skip',
+                   log_options=None, energy_options=None):
         """
         Stream measurement data for specified duration
         
@@ -234,147 +399,226 @@ class M2000_LAN:
             channels: List of channels to monitor
             parameters: List of parameters to read
             duration: Duration in seconds (0 = infinite)
-            sample_rate: Samples per second (max ~500Hz for LAN)
-            log_file: Optional CSV file to log data
+            sample_rate: Samples per second (max ~500Hz for LAN), 0 = as fast as
+                         possible, 'auto' = measure the sustainable rate first
+            log_file: Optional CSV file to log data (.m2b = binary log, see m2000_binlog)
+            pipeline: Number of REREAD? queries kept in flight (1 = no pipelining)
+            policy: Missed deadline policy, 'skip' or 'catchup' (see m2000_schedule)
+            log_options: LogWriter batching, fsync and queue options (see m2000_log)
+            energy_options: Integrate W/VA/VAR into energy while streaming: windows,
+                            gap policy and report (see m2000_energy.open_energy)
+        
+        Returns:
+            Scheduler statistics (ticks, achieved rate, overruns, missed deadlines)
         """
-        print(f"Streaming data from {channels} for {duration}s at {sample_rate}Hz")
+        if sample_rate == 'auto':
+            sample_rate = self.measure_sample_rate(channels, parameters, pipeline=pipeline)
+        
+        # Absolute monotonic deadlines - no drift, immune to wall-clock jumps
+        scheduler = DeadlineScheduler(sample_rate, duration, policy)
+        rate_text = f"{sample_rate:.1f}Hz" if scheduler.sample_rate else "maximum rate"
+        print(f"Streaming data from {channels} for {duration}s at {rate_text}")
+        if pipeline > 1:
+            print(f"Pipelining {pipeline} queries")
         if log_file:
             print(f"Logging to: {log_file}")
         print("Press Ctrl+C to stop\n")
         
-        # Set up initial READ command using correct M2000 syntax
-        read_fields = []
-        for param in parameters:
-            for channel in channels:
-                # Convert parameter names to M2000 format
-                m2000_param = param
-                if param == 'V':
-                    m2000_param = 'VOLTS'
-                elif param == 'A':
-                    m2000_param = 'AMPS'
-                elif param == 'W':
-                    m2000_param = 'WATTS'
-                
-                # Use M2000 command format: READ?,ch1:VOLTS:ACDC
-                read_fields.append(f"READ?,{channel.lower()}:{m2000_param}:ACDC")
+        # Compiled READ? command, result keys and parser
+        plan = compile_plan(channels, parameters)
+        command = plan.command
+        reread = plan.reread_bytes(b'\n')
         
-        command = ";".join(read_fields)
+        # Wh/VAh/VARh integrated on the host (m2000_energy)
+        energy = None
+        if energy_options is not None:
+            from m2000_energy import close_energy, open_energy
+            energy = open_energy(plan.keys, scheduler.start_wall, **energy_options)
         
-        # Prepare CSV header with units
+        # CSV with unit headers (or a .m2b binary log), written on the log writer thread
+        log = None
         if log_file:
-            header = create_csv_header(channels, parameters) + "\n"
+            # The logging stack (m2000_log, binlog, segments, index, rollup) loads on demand
+            from m2000_log import close_log, open_log
             
-            with open(log_file, 'w') as f:
-                f.write(header)
+            def format_row(record):
+                timestamp, values = record
+                return format_csv_row(timestamp, dict(zip(plan.keys, values)), channels, parameters) + "\n"
+            
+            log = open_log(log_file, create_csv_header(channels, parameters), format_row,
+                           plan=plan, time_origin=scheduler.start_wall, **(log_options or {}))
         
-        start_time = time.time()
         sample_count = 0
+        completed = False
+        send_times = deque()  # (seconds since start, keyword) of each query in flight
+        
+        def handle_sample(timestamp, response, keyword):
+            """Print and log one response to keyword ('READ?' or 'REREAD?')"""
+            stats = self.stats
+            parse_start = time.monotonic_ns() if stats is not None else 0
+            values = plan.parse_values(response)
+            if stats is not None:
+                stats.parsed(keyword, time.monotonic_ns() - parse_start)
+            
+            # Format console output with proper units
+            output = f"[{timestamp:8.2f}s] "
+            for (channel, param), value in zip(plan.fields, values):
+                if isinstance(value, float):
+                    value = format_measurement(value, param, include_units=True)
+                output += f"{channel}_{param}={value:>12} "
+            
+            print(output)
+            
+            # Queue for the log writer - no disk I/O on the acquisition path
+            if log:
+                log.write((timestamp, values))
+            if energy:
+                energy.add(timestamp, values)
+        
+        def paced_commands():
+            """Yield READ? then REREAD? queries on the scheduler's deadlines"""
+            for elapsed in scheduler:
+                first = scheduler.ticks == 1
+                send_times.append((elapsed, 'READ?' if first else 'REREAD?'))
+                yield command if first else 'REREAD?'
         
         try:
-            while True:
-                sample_start = time.time()
-                
-                # Check duration
-                if duration > 0 and (sample_start - start_time) > duration:
-                    break
-                
-                # Get measurement
-                if sample_count == 0:
-                    # First reading - use READ?
-                    response = self.query(command)
-                else:
-                    # Subsequent readings - use REREAD? for speed
-                    response = self.query('REREAD?')
-                
-                if response:
-                    values = response.split(',')
-                    timestamp = sample_start - start_time
-                    
-                    # Format console output with proper units
-                    output = f"[{timestamp:8.2f}s] "
-                    idx = 0
-                    for param in parameters:
-                        for channel in channels:
-                            if idx < len(values):
-                                try:
-                                    val = float(values[idx])
-                                    formatted = format_measurement(val, param, include_units=True)
-                                    output += f"{channel}_{param}={formatted:>12} "
-                                except ValueError:
-                                    output += f"{channel}_{param}={values[idx]:>12} "
-                                idx += 1
-                    
-                    print(output)
-                    sample_count += 1
-                    
-                    # Log to file with properly formatted CSV
-                    if log_file:
-                        # Create data dictionary for CSV formatting
-                        csv_data = {}
-                        idx = 0
-                        for param in parameters:
-                            for channel in channels:
-                                if idx < len(values):
-                                    csv_data[f"{channel}_{param}"] = values[idx]
-                                    idx += 1
-                        
-                        log_line = format_csv_row(timestamp, csv_data, channels, parameters) + "\n"
-                        
-                        with open(log_file, 'a') as f:
-                            f.write(log_line)
+            if pipeline > 1:
+                # Keep several queries in flight; restart the pipe after a timeout
+                resyncs = 0
+                while resyncs < 3:
+                    try:
+                        for _, response in self.query_pipelined(paced_commands(), window=pipeline):
+                            sent_at, keyword = send_times.popleft()
+                            if response:
+                                handle_sample(sent_at, response, keyword)
+                                sample_count += 1
+                                resyncs = 0
+                        break
+                    except (ConnectionError, OSError) as e:
+                        # Link dropped - warm reconnect keeps the READ? setup
+                        resyncs += 1
+                        send_times.clear()  # Responses in flight were lost
+                        print(f"Stream interrupted: {e}")
+                        if not self.reconnect():
+                            break
+                    except Exception as e:
+                        resyncs += 1
+                        send_times.clear()  # Responses in flight were discarded
+                        print(f"Pipeline resynchronized: {e}")
+            
+            else:
+                for elapsed in scheduler:
+                    # Get measurement
+                    try:
+                        if sample_count == 0:
+                            # First reading - use READ?
+                            response = self.query(command)
+                        else:
+                            # Subsequent readings - use REREAD? for speed
+                            self.send_raw(reread)
+                            response = self.read_response()
+                        if self.rx.eof:
+                            raise Exception("Connection closed by M2000")
+                    except Exception as e:
+                        # Network blip - warm reconnect keeps the READ? setup
+                        print(f"Stream interrupted: {e}")
+                        if not self.reconnect():
+                            break
+                        continue
                 
-                # Wait for next sample (accounting for processing time)
-                elapsed = time.time() - sample_start
-                sleep_time = max(0, (1.0 / sample_rate) - elapsed)
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                    if response:
+                        handle_sample(elapsed, response, 'READ?' if sample_count == 0 else 'REREAD?')
+                        sample_count += 1
                 
+            completed = True
         except KeyboardInterrupt:
             print(f"\nStreaming stopped. Collected {sample_count} samples")
+            completed = True
+        finally:
+            # Close each output even if the other fails; while an exception is
+            # already stopping the stream, a log writer error is only printed
+            try:
+                if energy:
+                    close_energy(energy)
+            except Exception:
+                completed = False
+                raise
+            finally:
+                if log:
+                    close_log(log, raise_error=completed)
+        
+        print(f"Schedule: {scheduler.summary()}")
+        return scheduler.stats()
     
-    def discover_m2000(self, network_base="192.168.1", timeout=2.0):
+    def measure_sample_rate(self, channels=['CH1'], parameters=['V', 'A', 'W'], count=20, pipeline=1):
         """
-        Discover M2000 devices on network
+        Measure the REREAD? rate this link can sustain for a channel/parameter set
         
         Args:
-            network_base: Network base (e.g., "192.168.1")
-            timeout: Timeout per IP check
+            channels: List of channels
+            parameters: List of parameters
+            count: Number of REREAD? round trips to time
+            pipeline: Number of REREAD? queries kept in flight
+        
+        Returns:
+            Sustainable samples per second (90% of the measured rate)
         """
-        print(f"Scanning network {network_base}.1-254 for M2000 devices...")
-        found_devices = []
+        plan = compile_plan(channels, parameters)
+        self.query(plan.command)  # Arm REREAD?
         
-        def check_ip(ip):
-            try:
-                test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                test_socket.settimeout(timeout)
-                result = test_socket.connect_ex((ip, 10733))
-                if result == 0:
-                    # Try to get identification
-                    test_socket.send(b'*IDN?\n')
-                    response = test_socket.recv(1024).decode('ascii').strip()
-                    if 'APS' in response:
-                        found_devices.append((ip, response))
-                        print(f"Found M2000 at {ip}: {response}")
-                test_socket.close()
-            except:
-                pass
+        if pipeline > 1:
+            def run(n):
+                for _ in self.query_pipelined(['REREAD?'] * n, window=pipeline):
+                    pass
+        else:
+            def run(n):
+                for _ in range(n):
+                    self.query('REREAD?')
         
-        # Use threading for faster scanning
-        threads = []
-        for i in range(1, 255):
-            ip = f"{network_base}.{i}"
-            thread = threading.Thread(target=check_ip, args=(ip,))
-            threads.append(thread)
-            thread.start()
+        rate = measure_rate(run, count)
+        print(f"Sustainable rate: {rate:.1f} Hz")
+        return rate
+    
+    def discover_m2000(self, network_base="192.168.1", timeout=0.3, concurrency=256,
+                       cache=True, refresh=False):
+        """
+        Discover M2000 devices on network
         
-        # Wait for all threads
-        for thread in threads:
-            thread.join()
+        Args:
+            network_base: CIDR range(s) up to /16 (e.g., "192.168.0.0/22") or
+                a /24 network base (e.g., "192.168.1")
+            timeout: TCP connect timeout per address
+            concurrency: Connects in flight at most
+            cache: Use the discovery cache (True, False or a DiscoveryCache)
+            refresh: Rescan ranges even if the cache still holds them
         
-        return found_devices
-
+        Returns:
+            List of (ip, *IDN? response)
+        """
+        networks = [network_base] if isinstance(network_base, str) else list(network_base)
+        networks = [parse_network(network) for network in networks]
+        if cache is True:
+            cache = DiscoveryCache()
+        elif cache is False:
+            cache = None
+        
+        print(f"Scanning {', '.join(map(str, networks))} for M2000 devices...")
+        
+        async def scan():
+            found_devices = []
+            async for ip, response, cached in discover(networks, self.port, concurrency,
+                                                       timeout, cache=cache, refresh=refresh):
+                found_devices.append((ip, response))
+                print(f"Found M2000 at {ip}: {response}{' (cached)' if cached else ''}")
+            return found_devices
+        
+        return asyncio.run(scan())
 
 def main():
+    from m2000_log import add_log_arguments, writer_options
+    from m2000_energy import add_energy_arguments, meter_options
+    
     parser = argparse.ArgumentParser(description='APS M2000 LAN Interface')
     parser.add_argument('--host', default='192.168.1.100',
                        help='M2000 IP address or hostname (default: 192.168.1.100)')
@@ -390,23 +634,40 @@ def main():
                        help='Stream data continuously')
     parser.add_argument('--duration', type=float, default=10,
                        help='Stream duration in seconds (default: 10)')
-    parser.add_argument('--rate', type=float, default=5.0,
-                       help='Sample rate in Hz (default: 5.0, max ~500)')
+    parser.add_argument('--rate', type=parse_rate, default=5.0,
+                       help="Sample rate in Hz, 'max' or 'auto' (default: 5.0, max ~500)")
+    parser.add_argument('--policy', choices=POLICIES, default='skip',
+                       help='Missed deadline policy while streaming (default: skip)')
     parser.add_argument('--log', type=str,
                        help='CSV file to log streaming data')
-    parser.add_argument('--3phase', action='store_true',
+    add_log_arguments(parser)
+    add_energy_arguments(parser)
+    parser.add_argument('--warm', action='store_true',
+                       help='Connect without *RST/*CLS, keeping the instrument configuration')
+    parser.add_argument('--stats', action='store_true',
+                       help='Print per-command latency histograms and transport counters at exit')
+    parser.add_argument('--pipeline', type=int, default=1,
+                       help='REREAD? queries kept in flight while streaming (default: 1)')
+    parser.add_argument('--3phase', action='store_true', dest='threephase',
                        help='Get comprehensive 3-phase measurements')
     parser.add_argument('--discover', action='store_true',
                        help='Scan network for M2000 devices')
-    parser.add_argument('--network', default='192.168.1',
-                       help='Network base for discovery (default: 192.168.1)')
+    parser.add_argument('--network', nargs='+', default=['192.168.1'],
+                       help='CIDR range(s) up to /16 or a /24 network base for discovery '
+                            '(default: 192.168.1)')
+    parser.add_argument('--refresh', action='store_true',
+                       help='Rescan ranges the discovery cache still holds')
     
     args = parser.parse_args()
     
     # Discovery mode
     if args.discover:
         m2000 = M2000_LAN()
-        found = m2000.discover_m2000(args.network)
+        try:
+            found = m2000.discover_m2000(args.network, refresh=args.refresh)
+        except ValueError as e:
+            print(f"Invalid network: {e}")
+            return 1
         if found:
             print(f"\nFound {len(found)} M2000 device(s)")
             for ip, info in found:
@@ -417,10 +678,12 @@ def main():
     
     # Create M2000 interface
     m2000 = M2000_LAN(host=args.host, port=args.port)
+    if args.stats:
+        m2000.enable_stats()
     
     try:
         # Connect
-        if not m2000.connect():
+        if not m2000.connect(warm=args.warm):
             print("Failed to connect to M2000")
             return 1
         
@@ -434,7 +697,11 @@ def main():
                 parameters=args.params,
                 duration=args.duration,
                 sample_rate=args.rate,
-                log_file=args.log
+                log_file=args.log,
+                pipeline=args.pipeline,
+                policy=args.policy,
+                log_options=writer_options(args),
+                energy_options=meter_options(args)
             )
         elif args.threephase:
             # 3-phase measurement
@@ -459,6 +726,8 @@ def main():
         print(f"Error: {e}")
         return 1
     finally:
+        if m2000.stats is not None:
+            print("\n" + m2000.stats.summary())
         m2000.disconnect()
     
     return 0
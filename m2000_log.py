@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Buffered Log Writer
+Streaming loops hand rows to a bounded queue; a background thread formats
+them, writes them in batches to one long-lived file handle and syncs the file
+according to an explicit fsync policy. When the disk falls behind, the queue
+either blocks the caller (back-pressure) or drops rows and counts them, so
+acquisition timing does not depend on disk latency.
+"""
+
+import os
+import queue
+import threading
+import time
+import sys
+import argparse
+
+from m2000_binlog import BinaryLogWriter, is_binary_log
+from m2000_index import DEFAULT_INTERVAL, TimeIndexWriter, index_path
+from m2000_rollup import DEFAULT_LEVELS, RollupSink
+from m2000_segments import COMPRESSIONS, SegmentedSink
+
+# When to fsync:
+#   none     - leave it to the OS (rows are still flushed to it every batch)
+#   periodic - at most every fsync_interval seconds
+#   batch    - after every batch written
+FSYNC_POLICIES = ('none', 'periodic', 'batch')
+
+# What write() does when the queue is full:
+#   block - wait for the writer (back-pressure, no rows lost)
+#   drop  - discard the row and count it
+FULL_POLICIES = ('block', 'drop')
+
+_CLOSE = object()  # Queue sentinel: stop the writer thread
+
+
+class CsvSink:
+    def __init__(self, path, header=None, format_row=None, index_interval=0, time_origin=None):
+        """
+        Text log file written by LogWriter
+
+        A sink turns a batch of records into file contents: write(records)
+        returns the bytes written, sync() makes them durable and close()
+        ends the file. m2000_binlog.BinaryLogWriter is the binary sink.
+
+        Args:
+            path: File to create (truncated if it exists)
+            header: Optional first line, written before any row
+            format_row: Callable turning a record into a line of text; None = records are text
+            index_interval: Seconds per time index bucket (m2000_index), 0 = no index
+            time_origin: Wall-clock seconds of timestamp 0, stored in the index
+        """
+        self.path = path
+        self.format_row = format_row
+        self.file = open(path, 'w', newline='')  # Byte offsets must match the text written
+        self.offset = 0
+        if header:
+            header = header if header.endswith('\n') else header + '\n'
+            self.file.write(header)
+            self.file.flush()
+            self.offset = len(header.encode('utf-8'))
+        self.index = None
+        if index_interval:
+            self.index = TimeIndexWriter(index_path(path), index_interval, time_origin)
+
+    def write(self, records):
+        if self.format_row is not None:
+            lines = list(map(self.format_row, records))
+        else:
+            lines = records
+        text = ''.join(lines)
+        self.file.write(text)
+        self.file.flush()
+        if self.index is not None:
+            # Index entries go out after the rows they point to
+            offset = self.offset
+            add = self.index.add
+            for line in lines:
+                try:
+                    add(float(line[:line.index(',')]), offset)
+                except ValueError:
+                    pass
+                offset += len(line) if line.isascii() else len(line.encode('utf-8'))
+            self.offset = offset
+            self.index.flush()
+        return len(text)
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+        if self.index is not None:
+            self.index.sync()
+
+    def close(self):
+        self.file.close()
+        if self.index is not None:
+            self.index.close()
+
+
+class TeeSink:
+    def __init__(self, sinks):
+        """
+        Hand every batch to several sinks, e.g. the log file and its rollups
+
+        Args:
+            sinks: Open sinks; the first one is the log file and its byte
+                   count is the one reported
+        """
+        self.sinks = list(sinks)
+
+    def write(self, records):
+        written = self.sinks[0].write(records)
+        for sink in self.sinks[1:]:
+            sink.write(records)
+        return written
+
+    def sync(self):
+        for sink in self.sinks:
+            sink.sync()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class LogWriter:
+    def __init__(self, path, header=None, format_row=None, batch_rows=256, batch_interval=0.5,
+                 fsync='none', fsync_interval=5.0, queue_size=65536, on_full='block', sink=None):
+        """
+        Open a log file and start its writer thread
+
+        Args:
+            path: File to create (truncated if it exists)
+            header: Optional first line, written before any row
+            format_row: Callable turning a queued record into a line of text, run
+                        on the writer thread; None = records are already text
+            batch_rows: Write a batch once this many rows are waiting
+            batch_interval: ... or once the oldest waiting row is this many seconds old
+            fsync: 'none', 'periodic' or 'batch' (see FSYNC_POLICIES)
+            fsync_interval: Seconds between fsyncs with the 'periodic' policy
+            queue_size: Rows held in memory at most
+            on_full: 'block' or 'drop' (see FULL_POLICIES)
+            sink: Open sink to write to instead of a CSV file at path (see CsvSink)
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+        if on_full not in FULL_POLICIES:
+            raise ValueError(f"Unknown full-queue policy {on_full!r}, expected one of {FULL_POLICIES}")
+
+        self.path = path
+        self.batch_rows = max(1, batch_rows)
+        self.batch_interval = batch_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.on_full = on_full
+        self.queue = queue.Queue(queue_size)
+
+        # Counters (written by the writer thread, except dropped)
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.dropped = 0
+        self.max_batch_ms = 0.0
+        self.error = None
+        self.closed = False
+
+        self.sink = sink if sink is not None else CsvSink(path, header, format_row)
+        self.last_fsync = time.monotonic()
+        self.last_fsync_rows = -1  # Rows written at the last fsync (-1 = header unsynced)
+        self.thread = threading.Thread(target=self._run, name='LogWriter', daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, record):
+        """
+        Queue one row; never waits for the disk unless on_full is 'block'
+
+        Returns:
+            True if queued, False if dropped
+        """
+        if self.error is not None:
+            raise Exception(f"Log writer failed: {self.error}")
+        if self.closed:
+            raise Exception("Log writer is closed")
+        if self.on_full == 'drop':
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        else:
+            self.queue.put(record)
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until every row queued so far is written (and synced per the policy)"""
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Write the remaining rows, sync and close the file"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(_CLOSE)
+        self.thread.join()
+        if self.error is not None:
+            raise Exception(f"Log writer failed: {self.error}")
+
+    def stats(self):
+        """Writer counters as a dictionary"""
+        return {
+            'rows': self.rows_written,
+            'bytes': self.bytes_written,
+            'batches': self.batches,
+            'fsyncs': self.fsyncs,
+            'dropped': self.dropped,
+            'queued': self.queue.qsize(),
+            'max_batch_ms': self.max_batch_ms,
+        }
+
+    def summary(self):
+        """One-line description of the writer counters"""
+        return (f"{self.rows_written} rows in {self.batches} batches, {self.fsyncs} fsyncs, "
+                f"{self.dropped} dropped, slowest batch {self.max_batch_ms:.1f} ms")
+
+    def _run(self):
+        """Writer thread: collect a batch, write it, sync per the policy"""
+        pending = []
+        waiters = []
+        closing = False
+        try:
+            while not closing:
+                # Block for the first row, then gather until the batch is full or due;
+                # with 'periodic', wake up to sync rows written before a quiet spell
+                try:
+                    item = self.queue.get(timeout=self.fsync_interval if self.fsync == 'periodic' else None)
+                except queue.Empty:
+                    self._sync()
+                    continue
+                deadline = time.monotonic() + self.batch_interval
+                while True:
+                    if item is _CLOSE:
+                        closing = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        pending.append(item)
+                    if closing or waiters or len(pending) >= self.batch_rows:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                if pending:
+                    self._write_batch(pending)
+                    pending = []
+                if closing or waiters or self.fsync == 'periodic':
+                    self._sync(force=closing or bool(waiters))
+                for done in waiters:
+                    done.set()
+                waiters = []
+        except Exception as e:
+            self.error = e
+            print(f"Log writer error ({self.path}): {e}")
+            # Unblock producers and flush() callers; later rows are discarded
+            self.closed = True
+            for done in waiters:
+                done.set()
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+        finally:
+            try:
+                self.sink.close()
+            except OSError:
+                pass
+
+    def _write_batch(self, records):
+        start = time.perf_counter()
+        self.bytes_written += self.sink.write(records)
+        self.rows_written += len(records)
+        self.batches += 1
+        if self.fsync == 'batch':
+            self.sink.sync()
+            self.fsyncs += 1
+            self.last_fsync = time.monotonic()
+            self.last_fsync_rows = self.rows_written
+        self.max_batch_ms = max(self.max_batch_ms, (time.perf_counter() - start) * 1000.0)
+
+    def _sync(self, force=False):
+        """fsync per the policy; force = closing or an explicit flush()"""
+        if self.fsync == 'none' or (self.fsync == 'batch' and not force):
+            return
+        if self.last_fsync_rows == self.rows_written:
+            return  # Nothing new since the last fsync
+        if not force and time.monotonic() - self.last_fsync < self.fsync_interval:
+            return
+        self.sink.sync()
+        self.fsyncs += 1
+        self.last_fsync = time.monotonic()
+        self.last_fsync_rows = self.rows_written
+
+
+def open_log(path, header=None, format_row=None, plan=None, time_origin=None,
+             max_bytes=0, max_seconds=0, compress=None, index_interval=DEFAULT_INTERVAL,
+             rollup_levels=None, **options):
+    """
+    Create a LogWriter, reporting failures the way the interface scripts do
+
+    A path ending in .m2b gets a binary log (m2000_binlog) instead of CSV.
+    With a size or age limit the log rotates into numbered segments with a
+    manifest (m2000_segments). With rollup levels the writer thread also
+    aggregates every batch into min/max/mean/count/last series per level
+    (m2000_rollup).
+
+    Args:
+        path: Log file
+        header: Optional first line (CSV)
+        format_row: Optional record formatter (CSV, see LogWriter)
+        plan: QueryPlan of the logged values (needed for binary logs)
+        time_origin: Wall-clock seconds record timestamps count from
+        max_bytes: Rotate after this many bytes per segment (0 = no limit)
+        max_seconds: Rotate after this many seconds per segment (0 = no limit)
+        compress: None, 'gzip' or 'zstd' - compress closed segments in the background
+        index_interval: Seconds per time index bucket (m2000_index), 0 = no index
+        rollup_levels: Rollup bucket lengths in seconds, e.g. (1, 10, 60, 900); None = no rollups
+        **options: LogWriter batching, fsync and queue options
+
+    Returns:
+        LogWriter
+    """
+    try:
+        if is_binary_log(path):
+            if plan is None:
+                raise ValueError("binary logs need the logged channels/parameters")
+            make_sink = lambda segment: BinaryLogWriter(segment, plan.keys, time_origin=time_origin,
+                                                        index_interval=index_interval)
+        else:
+            make_sink = lambda segment: CsvSink(segment, header, format_row, index_interval, time_origin)
+
+        if max_bytes or max_seconds:
+            sink = SegmentedSink(path, make_sink, max_bytes, max_seconds, compress, time_origin)
+        elif compress:
+            raise ValueError("compression needs segment rotation (a size or time limit)")
+        else:
+            sink = make_sink(path)
+
+        if rollup_levels:
+            if plan is None:
+                raise ValueError("rollups need the logged channels/parameters")
+            sink = TeeSink([sink, RollupSink(path, plan.keys, rollup_levels, time_origin)])
+        return LogWriter(path, sink=sink, **options)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Cannot open log file {path}: {e}")
+        raise Exception(f"Cannot open log file {path}: {e}")
+
+
+def close_log(log, raise_error=True):
+    """
+    Close a stream's log and print its summary
+
+    Args:
+        log: LogWriter from open_log()
+        raise_error: Raise a writer failure; False = only print it, for a stream
+                     that is already stopping on another exception
+    """
+    try:
+        log.close()
+    except Exception as e:
+        print(e)
+        if raise_error:
+            raise
+    finally:
+        print(f"Log: {log.summary()}")
+
+
+def add_log_arguments(parser):
+    """Add the --log-* writer options to an interface script's parser"""
+    parser.add_argument('--log-fsync', choices=FSYNC_POLICIES, default='none',
+                       help='When to fsync the log: none, periodic or batch (default: none)')
+    parser.add_argument('--log-batch', type=int, default=256,
+                       help='Rows written per batch (default: 256)')
+    parser.add_argument('--log-full', choices=FULL_POLICIES, default='block',
+                       help='When the disk falls behind: block (back-pressure) or drop rows '
+                            '(default: block)')
+    parser.add_argument('--log-rotate-mb', type=float, default=0,
+                       help='Start a new log segment every N MB, checked after each batch '
+                            '(default: 0 = never)')
+    parser.add_argument('--log-rotate-time', type=float, default=0,
+                       help='Start a new log segment every N seconds of sample time, split '
+                            'exactly at the sample timestamps (default: 0 = never)')
+    parser.add_argument('--log-compress', choices=COMPRESSIONS,
+                       help='Compress closed log segments in the background: gzip or zstd')
+    parser.add_argument('--log-index', type=float, default=DEFAULT_INTERVAL,
+                       help=f'Seconds per time index bucket (<log>.idx), 0 = no index '
+                            f'(default: {DEFAULT_INTERVAL})')
+    parser.add_argument('--log-rollup', type=float, nargs='*', metavar='SECONDS',
+                       help='Also write min/max/mean/count/last rollup series (<log>.rollup.1min.m2b, ...) '
+                            'for these bucket lengths (default levels: 1 10 60 900)')
+
+
+def writer_options(args):
+    """LogWriter options from parsed --log-* arguments"""
+    return {'fsync': args.log_fsync, 'batch_rows': args.log_batch, 'on_full': args.log_full,
+            'max_bytes': int(args.log_rotate_mb * 1e6), 'max_seconds': args.log_rotate_time,
+            'compress': args.log_compress, 'index_interval': args.log_index,
+            'rollup_levels': None if args.log_rollup is None else (args.log_rollup or DEFAULT_LEVELS)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 log writer throughput test')
+    parser.add_argument('path', help='File to write')
+    parser.add_argument('--rows', type=int, default=100000,
+                       help='Rows to write (default: 100000)')
+    parser.add_argument('--values', type=int, default=21,
+                       help='Values per row (default: 21)')
+    add_log_arguments(parser)
+    parser.add_argument('--queue-size', type=int, default=65536,
+                       help='Rows held in memory at most (default: 65536)')
+
+    args = parser.parse_args()
+
+    row = ",".join(["+2.30450E+2"] * args.values)
+    header = "Timestamp," + ",".join(f"V{i}" for i in range(args.values))
+    worst = 0.0
+    start = time.perf_counter()
+    with open_log(args.path, header, queue_size=args.queue_size, **writer_options(args)) as log:
+        for i in range(args.rows):
+            t = time.perf_counter()
+            log.write(f"{i * 0.002:.3f},{row}\n")
+            worst = max(worst, time.perf_counter() - t)
+        queued = time.perf_counter() - start
+    total = time.perf_counter() - start
+
+    print(f"Queued {args.rows} rows in {queued:.3f}s ({args.rows / queued:.0f} rows/s), "
+          f"slowest write() {worst * 1e6:.0f} us")
+    print(f"Written in {total:.3f}s: {log.summary()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - NR3 Batch Decoder
+Decodes READ?/REREAD? responses into NumPy arrays in bulk
+
+NR3 responses are fixed at 11 characters, e.g. +2.30450E+2:
+polarity, 6 digits with embedded decimal point, 'E', exponent polarity and
+a single exponent digit. +0.00000E+0 means the value is unavailable
+(a real zero is sent as +0.00000E-9) and decodes to NaN with valid=False.
+Requires: pip install numpy
+"""
+
+import math
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+NR3_WIDTH = 11
+NR3_UNAVAILABLE = '+0.00000E+0'
+NR3_UNAVAILABLE_BYTES = b'+0.00000E+0'
+
+# Column offsets within one 12-byte "+d.dddddE+d," record
+_DIGIT_COLUMNS = [1, 3, 4, 5, 6, 7]
+_PLUS = ord('+')
+_MINUS = ord('-')
+
+
+def decode_field(field):
+    """
+    Decode one NR3 field the slow way
+
+    Returns:
+        (value, valid) - value is NaN when unavailable or not numeric
+    """
+    field = field.strip()
+    if field == NR3_UNAVAILABLE:
+        return math.nan, False
+    try:
+        return float(field), True
+    except ValueError:
+        return math.nan, False
+
+
+class NR3Decoder:
+    def __init__(self, n_fields, capacity=1024):
+        """
+        Decoder with preallocated output arrays
+
+        Args:
+            n_fields: Number of NR3 fields per response (e.g. len(QueryPlan))
+            capacity: Maximum number of responses decoded per call
+        """
+        if np is None:
+            raise ImportError("NR3Decoder requires numpy: pip install numpy")
+
+        self.n_fields = n_fields
+        self.capacity = capacity
+        self.values = np.empty((capacity, n_fields), dtype=np.float64)
+        self.valid = np.empty((capacity, n_fields), dtype=bool)
+
+        # Powers of ten for the exponent range -9..+9 (mantissa has 5 decimals)
+        self._pow10 = 10.0 ** np.arange(15)
+
+    def decode(self, response):
+        """
+        Decode one response
+
+        Returns:
+            (values, valid) views of row 0 of the preallocated arrays
+        """
+        values, valid = self.decode_many([response])
+        return values[0], valid[0]
+
+    def decode_many(self, responses):
+        """
+        Decode many responses with the same field count in one pass
+
+        Args:
+            responses: Sequence of str or bytes responses (without terminators)
+
+        Returns:
+            (values, valid) views of the first len(responses) rows; a row
+            with a different field count is all NaN with valid False
+        """
+        rows = len(responses)
+        if rows > self.capacity:
+            raise ValueError(f"{rows} responses exceed decoder capacity {self.capacity}")
+        if rows == 0:
+            return self.values[:0], self.valid[:0]
+
+        encoded = [r.encode('ascii') if isinstance(r, str) else r for r in responses]
+        row_length = self.n_fields * (NR3_WIDTH + 1) - 1
+
+        # Every response must be exactly n_fields fixed-width fields long, so
+        # row boundaries fall on field boundaries; a short row followed by a
+        # long one must not be re-split across rows
+        if all(len(r) == row_length for r in encoded) and \
+           self._decode_fixed(b','.join(encoded), rows):
+            return self.values[:rows], self.valid[:rows]
+
+        # Odd widths, whitespace, short responses or non-NR3 fields
+        for row, response in enumerate(responses):
+            self._decode_slow(row, response)
+        return self.values[:rows], self.valid[:rows]
+
+    def _decode_fixed(self, data, rows):
+        """Vectorized decode of fixed 11-character fields; False if the layout does not match"""
+        n = rows * self.n_fields
+        raw = np.frombuffer(data + b',', dtype=np.uint8).reshape(n, NR3_WIDTH + 1)
+
+        sign = raw[:, 0]
+        exp_sign = raw[:, 9]
+        digits = raw[:, _DIGIT_COLUMNS].astype(np.int64) - 48
+        exp_digit = raw[:, 10].astype(np.int64) - 48
+
+        ok = ((raw[:, 2] == ord('.')) & (raw[:, 8] == ord('E')) & (raw[:, 11] == ord(','))
+              & ((sign == _PLUS) | (sign == _MINUS))
+              & ((exp_sign == _PLUS) | (exp_sign == _MINUS))
+              & (digits >= 0).all(axis=1) & (digits <= 9).all(axis=1)
+              & (exp_digit >= 0) & (exp_digit <= 9))
+        if not ok.all():
+            return False
+
+        mantissa = digits @ np.array([100000, 10000, 1000, 100, 10, 1], dtype=np.int64)
+        exponent = np.where(exp_sign == _MINUS, -exp_digit, exp_digit)
+
+        # value = mantissa * 10^(exponent - 5); divide by exact powers of ten
+        # for negative shifts so results match float() parsing
+        shift = exponent - 5
+        out = self.values[:rows].reshape(n)
+        np.divide(mantissa, self._pow10[np.clip(-shift, 0, 14)], out=out)
+        np.multiply(out, self._pow10[np.clip(shift, 0, 14)], out=out)
+        np.negative(out, out=out, where=(sign == _MINUS))
+
+        unavailable = (mantissa == 0) & (exponent == 0) & (exp_sign == _PLUS)
+        out[unavailable] = np.nan
+        np.logical_not(unavailable, out=self.valid[:rows].reshape(n))
+        return True
+
+    def _decode_slow(self, row, response):
+        if isinstance(response, bytes):
+            response = response.decode('ascii', 'replace')
+        fields = response.split(',')
+        values = self.values[row]
+        valid = self.valid[row]
+        values.fill(np.nan)
+        valid.fill(False)
+        if len(fields) != self.n_fields:
+            return  # Wrong field count: the fields cannot be matched to keys
+        for idx, field in enumerate(fields):
+            values[idx], valid[idx] = decode_field(field)
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    if np is None:
+        print("numpy not installed: pip install numpy")
+        sys.exit(1)
+
+    decoder = NR3Decoder(3)
+    responses = [
+        '+2.30450E+2,+1.23400E-3,+2.84200E-1',
+        '-2.30450E+2,+0.00000E+0,+0.00000E-9',   # unavailable and a real zero
+        '230.45,1.234E-3,0.2842',                 # odd widths use the slow path
+    ]
+
+    print("=== NR3 Decoder Test ===")
+    for response in responses:
+        values, valid = decoder.decode(response)
+        print(f"{response:<40} -> {values} valid={valid}")
+
+    values, valid = decoder.decode_many(responses[:2])
+    print(f"\nBatch of 2:\n{values}\n{valid}")
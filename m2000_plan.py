@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Compiled Query Plans
+Builds the READ? command, result keys and response parser for a
+channel/parameter set once, and shares them between all interfaces
+"""
+
+import math
+from functools import lru_cache
+
+
+# M2000 keywords for the short parameter names used by the scripts
+PARAM_MAP = {
+    'V': 'VOLTS',
+    'A': 'AMPS',
+    'W': 'WATTS',
+}
+
+REREAD_COMMAND = 'REREAD?'
+
+# Manual limits: a command set (everything between terminators) may hold at
+# most 4095 characters, a response at most 65535 (12 per NR3 field with comma)
+MAX_COMMAND_SET = 4095
+MAX_RESPONSE_FIELDS = 65535 // 12
+
+# NR3 response meaning "data unavailable" (a real zero is +0.00000E-9)
+NR3_UNAVAILABLE = '+0.00000E+0'
+
+
+def _to_value(field):
+    """Convert one response field to float, keeping non-numeric text as is"""
+    if field.strip() == NR3_UNAVAILABLE:
+        return math.nan
+    try:
+        return float(field)
+    except ValueError:
+        return field
+
+
+def parse_values(response):
+    """
+    Split a READ?/REREAD? response into a tuple of values
+
+    Numeric fields become floats, the unavailable marker +0.00000E+0
+    becomes NaN and any other text is kept as a string. For bulk decoding
+    into NumPy arrays see m2000_nr3.NR3Decoder.
+    """
+    fields = response.split(',')
+    if NR3_UNAVAILABLE not in response:
+        try:
+            return tuple(map(float, fields))
+        except ValueError:
+            pass
+    return tuple(map(_to_value, fields))
+
+
+class QueryPlan:
+    def __init__(self, channels, parameters):
+        """
+        Compile a READ? request for a channel/parameter set
+
+        Results are ordered parameter-major (all channels for the first
+        parameter, then the next parameter), matching the READ? fields.
+
+        Args:
+            channels: Sequence of channels ['CH1', 'CH2', 'CH3', 'CH4', 'VPA1', 'VPA2', 'VPA3']
+            parameters: Sequence of parameters ['V', 'A', 'W', 'VA', 'VAR', 'PF', 'FREQ']
+        """
+        self.channels = tuple(channels)
+        self.parameters = tuple(parameters)
+
+        # (channel, parameter) per result field and the matching result keys,
+        # e.g. ('CH1_V', 'CH1_A', 'CH1_W')
+        self.fields = tuple((channel, param)
+                            for param in self.parameters for channel in self.channels)
+        self.keys = tuple(f"{channel}_{param}" for channel, param in self.fields)
+
+        # M2000 command format: READ?,ch1:VOLTS:ACDC;READ?,ch1:AMPS:ACDC
+        self.read_fields = tuple(f"READ?,{channel.lower()}:{PARAM_MAP.get(param, param)}:ACDC"
+                                 for channel, param in self.fields)
+        self.command = ";".join(self.read_fields)
+
+        # Pre-encoded commands per line terminator
+        self._encoded = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return f"QueryPlan({list(self.channels)}, {list(self.parameters)})"
+
+    def command_bytes(self, terminator=b'\n'):
+        """READ? command encoded with the given terminator"""
+        try:
+            return self._encoded[terminator]
+        except KeyError:
+            data = self.command.encode('ascii') + terminator
+            self._encoded[terminator] = data
+            return data
+
+    @staticmethod
+    def reread_bytes(terminator=b'\n'):
+        """REREAD? command encoded with the given terminator"""
+        return REREAD_COMMAND.encode('ascii') + terminator
+
+    def parse_values(self, response):
+        """Split a READ?/REREAD? response into a tuple of values (see parse_values())"""
+        return parse_values(response)
+
+    def parse(self, response):
+        """Split a READ?/REREAD? response into {channel_param: value}"""
+        return dict(zip(self.keys, self.parse_values(response)))
+
+
+@lru_cache(maxsize=64)
+def _compile(channels, parameters):
+    return QueryPlan(channels, parameters)
+
+
+def compile_plan(channels, parameters):
+    """
+    Return the (memoized) QueryPlan for a channel/parameter set
+
+    Args:
+        channels: Sequence of channels
+        parameters: Sequence of parameters
+    """
+    return _compile(tuple(channels), tuple(parameters))
+
+
+class ReadPacker:
+    def __init__(self, plans, limit=MAX_COMMAND_SET):
+        """
+        Pack several logical reads into as few command sets as possible
+
+        READ? fields are packed in order, filling each command set up to the
+        character limit; a plan that does not fit in one set is split across
+        sets. unpack() maps the responses back to one result per plan.
+
+        Args:
+            plans: Sequence of QueryPlan
+            limit: Maximum characters per command set
+        """
+        self.plans = tuple(plans)
+        self.limit = limit
+        self.commands = []  # Command set strings, one round trip each
+        self.spans = []     # Per command set: [(plan_index, first_field, end_field), ...]
+
+        current = []
+        length = -1
+        spans = []
+        for index, plan in enumerate(self.plans):
+            for field_index, field in enumerate(plan.read_fields):
+                if len(field) > limit:
+                    raise ValueError(f"READ? field longer than {limit} characters: {field}")
+                if current and (length + 1 + len(field) > limit or len(current) >= MAX_RESPONSE_FIELDS):
+                    self._add_set(current, spans)
+                    current, length, spans = [], -1, []
+                current.append(field)
+                length += 1 + len(field)
+                if spans and spans[-1][0] == index:
+                    spans[-1][2] = field_index + 1
+                else:
+                    spans.append([index, field_index, field_index + 1])
+        if current:
+            self._add_set(current, spans)
+
+    def _add_set(self, fields, spans):
+        self.commands.append(";".join(fields))
+        self.spans.append(tuple(tuple(span) for span in spans))
+
+    def __len__(self):
+        return len(self.commands)
+
+    def unpack(self, responses):
+        """
+        Split command set responses back into per-plan results
+
+        Args:
+            responses: One response string per command set, in order
+
+        Returns:
+            List with {channel_param: value} per plan, or None for a plan
+            whose command set got no response
+        """
+        values = [[None] * len(plan) for plan in self.plans]
+        complete = [True] * len(self.plans)
+
+        for spans, response in zip(self.spans, responses):
+            if not response:
+                for index, _, _ in spans:
+                    complete[index] = False
+                continue
+            fields = parse_values(response)
+            pos = 0
+            for index, start, stop in spans:
+                count = stop - start
+                values[index][start:stop] = fields[pos:pos + count]
+                pos += count
+
+        results = []
+        for plan, plan_values, ok in zip(self.plans, values, complete):
+            if ok:
+                results.append({key: value for key, value in zip(plan.keys, plan_values)
+                                if value is not None})
+            else:
+                results.append(None)
+        return results
+
+    def execute(self, query):
+        """
+        Run all command sets with a blocking query function and unpack
+
+        Args:
+            query: Callable sending one command set and returning its response
+        """
+        return self.unpack([query(command) for command in self.commands])
+
+
+@lru_cache(maxsize=64)
+def _pack(plans, limit):
+    return ReadPacker(plans, limit)
+
+
+def pack_reads(requests, limit=MAX_COMMAND_SET):
+    """
+    Return the (memoized) ReadPacker for a list of logical reads
+
+    Args:
+        requests: Sequence of QueryPlan or (channels, parameters) pairs
+        limit: Maximum characters per command set
+    """
+    plans = tuple(request if isinstance(request, QueryPlan) else compile_plan(*request)
+                  for request in requests)
+    return _pack(plans, limit)
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    plan = compile_plan(['CH1', 'CH2'], ['V', 'A', 'W'])
+
+    print("=== Query Plan Test ===")
+    print(plan)
+    print(f"Command: {plan.command}")
+    crlf = plan.command_bytes(b'\r\n')
+    print(f"Bytes:   {crlf!r}")
+    print(f"Keys:    {plan.keys}")
+    print(f"Parsed:  {plan.parse('+2.30450E+2,+1.20000E+2,+1.23400E-3,+5.00000E-1,+2.84200E-1,+6.00000E+1')}")
+    print(f"Missing: {plan.parse_values('+2.30450E+2,+0.00000E+0,+1.23400E-3,+0.00000E-9,+2.84200E-1,+6.00000E+1')}")
+    print(f"Cached:  {compile_plan(('CH1', 'CH2'), ('V', 'A', 'W')) is plan}")
+
+    print("\n=== Read Packer Test ===")
+    harmonics = [f"H{h}" for h in range(1, 51)]
+    packer = pack_reads([(['CH1', 'CH2', 'CH3', 'CH4'], harmonics), (['VPA1'], ['W', 'PF'])])
+    print(f"{sum(len(p) for p in packer.plans)} fields in {len(packer)} command sets: "
+          f"{[len(command) for command in packer.commands]} characters")
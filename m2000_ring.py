@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Sample Ring Buffer
+Keeps the most recent samples of a stream in memory: one contiguous NumPy
+row per channel/parameter plus a row of timestamps, with a fixed capacity
+derived from a memory cap. Every sample is written twice (at i and
+i + capacity), so the newest n samples are always one contiguous slice:
+appends are O(1) and windows are views, never copies. The web UI serves
+chart history, reconnecting clients and quick window statistics from it.
+Requires: pip install numpy
+"""
+
+import math
+import threading
+import time
+import sys
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class SampleRing:
+    def __init__(self, keys, capacity=None, max_bytes=DEFAULT_MAX_BYTES, dtype='float64'):
+        """
+        Fixed-size buffer of the latest samples
+
+        Args:
+            keys: Result keys, e.g. ('CH1_V', 'CH1_A', 'CH1_W')
+            capacity: Samples kept; default: as many as fit in max_bytes
+            max_bytes: Memory cap for the arrays (timestamps included)
+            dtype: 'float64' or 'float32' values (timestamps are always float64)
+        """
+        if np is None:
+            raise ImportError("SampleRing requires numpy: pip install numpy")
+        self.keys = tuple(keys)
+        self.dtype = np.dtype(dtype)
+        sample_bytes = 2 * (8 + self.dtype.itemsize * len(self.keys))  # Mirrored
+        if capacity is None:
+            capacity = max_bytes // sample_bytes
+        if capacity < 1:
+            raise ValueError(f"Ring buffer of {max_bytes} bytes cannot hold one sample "
+                             f"of {len(self.keys)} values")
+
+        self.capacity = int(capacity)
+        self.columns = {key: i for i, key in enumerate(self.keys)}
+        self.times = np.full(2 * self.capacity, np.nan)
+        self.data = np.full((len(self.keys), 2 * self.capacity), np.nan, self.dtype)
+        self.head = 0       # Next write position, 0 <= head < capacity
+        self.count = 0      # Samples held, <= capacity
+        self.appended = 0   # Samples appended in total
+        self.lock = threading.Lock()  # Appends vs. readers on other threads (see snapshot())
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.data.nbytes
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, values):
+        """
+        Add one sample, overwriting the oldest once full
+
+        Args:
+            timestamp: Seconds (ascending), e.g. Unix time
+            values: Values in the order of keys; non-numeric ones are stored as NaN
+        """
+        with self.lock:
+            head = self.head
+            mirror = head + self.capacity
+            try:
+                self.data[:, head] = values
+            except (TypeError, ValueError):
+                self.data[:, head] = [_to_float(value) for value in values]
+            self.data[:, mirror] = self.data[:, head]
+            self.times[head] = self.times[mirror] = timestamp
+            self.head = head + 1 if head + 1 < self.capacity else 0
+            if self.count < self.capacity:
+                self.count += 1
+            self.appended += 1
+
+    def _span(self, n):
+        """Slice of the mirrored arrays holding the newest n samples"""
+        n = min(n, self.count)
+        end = self.head + self.capacity
+        return slice(end - n, end)
+
+    def last(self, n=None):
+        """
+        The newest n samples (default: all held), oldest first
+
+        Returns:
+            (times, values) views - times (n,), values (keys, n); valid until
+            capacity more samples are appended
+        """
+        span = self._span(self.count if n is None else n)
+        return self.times[span], self.data[:, span]
+
+    def since(self, start, end=None):
+        """
+        Samples with start <= timestamp (< end)
+
+        Returns:
+            (times, values) views, as last()
+        """
+        times, values = self.last()
+        first = np.searchsorted(times, start, 'left')
+        stop = len(times) if end is None else np.searchsorted(times, end, 'left')
+        return times[first:stop], values[:, first:stop]
+
+    def column(self, key, n=None):
+        """View of one key's newest n values"""
+        return self.data[self.columns[key], self._span(self.count if n is None else n)]
+
+    def window(self, seconds=None, points=None, keys=None):
+        """
+        Recent samples, thinned to at most points by striding (still views)
+
+        Args:
+            seconds: Only samples from the last this many seconds (None = all held)
+            points: Return at most this many samples (None = all)
+            keys: Only these keys (default: all)
+
+        Returns:
+            (times, {key: values})
+        """
+        if seconds is None or not self.count:
+            times, values = self.last()
+        else:
+            times, values = self.since(self.times[self.head + self.capacity - 1] - seconds)
+        if points and len(times) > points:
+            step = -(-len(times) // points)
+            # Stride back from the newest sample so it is always included
+            times, values = times[::-1][::step][::-1], values[:, ::-1][:, ::step][:, ::-1]
+        return times, {key: values[self.columns[key]] for key in (keys or self.keys)
+                       if key in self.columns}
+
+    def summary(self, seconds=None):
+        """Min, max, mean and last per key over the last seconds (NaN ignored)"""
+        times, columns = self.window(seconds)
+        result = {}
+        for key, values in columns.items():
+            valid = values[~np.isnan(values)]
+            result[key] = {
+                'min': float(valid.min()) if len(valid) else None,
+                'max': float(valid.max()) if len(valid) else None,
+                'mean': float(valid.mean()) if len(valid) else None,
+                'last': float(valid[-1]) if len(valid) else None,
+                'count': int(len(valid)),
+            }
+        return result
+
+    def snapshot(self, seconds=None, points=None, keys=None):
+        """
+        JSON-ready copy of window(), safe to call from another thread
+
+        NaN (unavailable) values become None.
+
+        Returns:
+            {'times': [...], 'values': {key: [...]}, 'capacity', 'count'}
+        """
+        with self.lock:
+            times, columns = self.window(seconds, points, keys)
+            return {
+                'times': times.tolist(),
+                'values': {key: [None if value != value else value for value in values.tolist()]
+                           for key, values in columns.items()},
+                'capacity': self.capacity,
+                'count': self.count,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 sample ring buffer benchmark')
+    parser.add_argument('--keys', type=int, default=21,
+                       help='Values per sample (default: 21)')
+    parser.add_argument('--samples', type=int, default=1000000,
+                       help='Samples to append (default: 1000000)')
+    parser.add_argument('--max-mb', type=float, default=DEFAULT_MAX_BYTES / 2**20,
+                       help='Memory cap in MiB (default: 16)')
+
+    args = parser.parse_args()
+
+    keys = [f"CH{i % 4 + 1}_P{i}" for i in range(args.keys)]
+    ring = SampleRing(keys, max_bytes=int(args.max_mb * 2**20))
+    row = [230.45] * args.keys
+    start = time.perf_counter()
+    for i in range(args.samples):
+        ring.append(i * 0.002, row)
+    elapsed = time.perf_counter() - start
+    print(f"{args.samples} appends in {elapsed:.3f}s ({elapsed / args.samples * 1e6:.2f} us each), "
+          f"capacity {ring.capacity} samples in {ring.nbytes / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        ring.window(seconds=60, points=500)
+    print(f"window(60s, 500 points): {(time.perf_counter() - start) * 1e3:.1f} us each")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
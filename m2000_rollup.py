@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Multi-Resolution Rollups
+Aggregates streamed samples online into fixed wall-clock buckets (1 s, 10 s,
+1 min, 15 min by default) keeping min, max, mean, count and last per
+channel/parameter. Only the finest level sees every sample; each closed
+bucket is merged into the next coarser level, so the cost per sample does
+not grow with the number of levels. Every level is persisted as its own
+.m2b binary series (run.rollup.1min.m2b, ...), so trend views over days read
+kilobytes instead of the raw stream.
+Requires: pip install numpy
+"""
+
+import math
+import os
+import time
+import sys
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from m2000_binlog import BinaryLog, BinaryLogWriter, is_binary_log
+from m2000_segments import MANIFEST_SUFFIX, CsvStream, iter_binary, manifest_path, read_manifest
+from m2000_units import get_base_unit
+
+
+DEFAULT_LEVELS = (1, 10, 60, 900)  # Seconds per bucket
+STATS = ('min', 'max', 'mean', 'count', 'last')
+
+
+def level_name(seconds):
+    """1 -> '1s', 60 -> '1min', 900 -> '15min', 3600 -> '1h'"""
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600:g}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60:g}min"
+    return f"{seconds:g}s"
+
+
+def rollup_path(log_path, seconds):
+    """Series file of one level: run.csv -> run.rollup.1min.m2b"""
+    base = os.path.splitext(log_path)[0]
+    return f"{base}.rollup.{level_name(seconds)}.m2b"
+
+
+def rollup_keys(keys):
+    """Series columns: 'CH1_V.min', 'CH1_V.max', ... for every key"""
+    return [f"{key}.{stat}" for key in keys for stat in STATS]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class RollupLevel:
+    def __init__(self, seconds, n_keys, writer=None, parent=None):
+        """
+        Open bucket of one level
+
+        Args:
+            seconds: Bucket length
+            n_keys: Values per sample
+            writer: BinaryLogWriter receiving closed buckets (None = not persisted)
+            parent: Next coarser RollupLevel, fed with closed buckets
+        """
+        self.seconds = seconds
+        self.writer = writer
+        self.parent = parent
+        self.bucket = None
+        self.count = np.zeros(n_keys)
+        self.total = np.zeros(n_keys)
+        self.min = np.full(n_keys, np.inf)
+        self.max = np.full(n_keys, -np.inf)
+        self.last = np.full(n_keys, np.nan)
+        self.closed = []  # (bucket start ns, stats row) not yet written
+
+    def merge(self, bucket, count, total, minimum, maximum, last):
+        """Fold a partial aggregate of one bucket in; closes the open bucket when it changes"""
+        if bucket != self.bucket:
+            self.close_bucket()
+            self.bucket = bucket
+        self.count += count
+        self.total += total
+        np.fmin(self.min, minimum, out=self.min)
+        np.fmax(self.max, maximum, out=self.max)
+        valid = ~np.isnan(last)
+        self.last[valid] = last[valid]
+
+    def close_bucket(self):
+        """Emit the open bucket (to the series and the parent level) and reset"""
+        if self.bucket is None:
+            return
+        count = self.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.total / count
+        empty = count == 0
+        minimum = np.where(empty, np.nan, self.min)
+        maximum = np.where(empty, np.nan, self.max)
+        start_ns = int(self.bucket * self.seconds * 1_000_000_000)
+        row = np.stack([minimum, maximum, mean, count, self.last], axis=1).ravel()
+        self.closed.append((start_ns, row))
+
+        if self.parent is not None:
+            self.parent.merge(math.floor(self.bucket * self.seconds / self.parent.seconds),
+                              count, self.total, self.min, self.max, self.last)
+
+        self.bucket = None
+        self.count = np.zeros_like(self.count)
+        self.total = np.zeros_like(self.total)
+        self.min = np.full_like(self.min, np.inf)
+        self.max = np.full_like(self.max, -np.inf)
+        self.last = np.full_like(self.last, np.nan)
+
+    def flush(self):
+        """Write closed buckets to the series"""
+        if self.closed and self.writer is not None:
+            times = np.array([t for t, _ in self.closed], np.int64)
+            self.writer.write_arrays(times, np.stack([row for _, row in self.closed]))
+        self.closed = []
+
+
+class Rollup:
+    def __init__(self, keys, levels=DEFAULT_LEVELS, log_path=None, time_origin=0.0, units=None):
+        """
+        Online rollups of a sample stream
+
+        Args:
+            keys: Result keys, e.g. QueryPlan.keys
+            levels: Bucket lengths in seconds, each a multiple of the previous one
+            log_path: Log the series are stored next to (see rollup_path()); None = in memory
+            time_origin: Wall-clock seconds of timestamp 0; buckets align to the wall clock
+            units: Unit per key (default: from m2000_units.get_base_unit)
+        """
+        if np is None:
+            raise ImportError("Rollup requires numpy: pip install numpy")
+        levels = sorted(levels)
+        for finer, coarser in zip(levels, levels[1:]):
+            if coarser % finer:
+                raise ValueError(f"Rollup level {coarser}s is not a multiple of {finer}s")
+
+        self.keys = tuple(keys)
+        self.time_origin = time_origin or 0.0
+        if units is None:
+            units = [get_base_unit(key.rpartition('_')[2]) for key in self.keys]
+        series_units = [unit if stat != 'count' else '' for unit in units for stat in STATS]
+
+        self.levels = []
+        parent = None
+        for seconds in reversed(levels):
+            writer = None
+            if log_path is not None:
+                writer = BinaryLogWriter(rollup_path(log_path, seconds), rollup_keys(self.keys),
+                                         series_units, time_origin=0.0)
+            parent = RollupLevel(seconds, len(self.keys), writer, parent)
+            self.levels.insert(0, parent)
+
+    def add(self, seconds, values):
+        """
+        Add a batch of samples
+
+        Args:
+            seconds: Timestamps in seconds since time_origin, ascending, shape (n,)
+            values: Values, shape (n, keys); NaN = unavailable
+        """
+        finest = self.levels[0]
+        wall = self.time_origin + np.asarray(seconds, np.float64)
+        buckets = np.floor(wall / finest.seconds).astype(np.int64)
+        if not len(buckets):
+            return
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+
+        valid = ~np.isnan(values)
+        counts = np.add.reduceat(valid, starts, axis=0).astype(np.float64)
+        totals = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0)
+        minimum = np.fmin.reduceat(values, starts, axis=0)
+        maximum = np.fmax.reduceat(values, starts, axis=0)
+        # Last valid value per bucket: the highest valid row index in each segment
+        rows = np.where(valid, np.arange(len(values))[:, None], -1)
+        last_rows = np.maximum.reduceat(rows, starts, axis=0)
+        last = np.where(last_rows >= 0,
+                        np.take_along_axis(values, np.maximum(last_rows, 0), axis=0), np.nan)
+
+        for i, start in enumerate(starts.tolist()):
+            finest.merge(int(buckets[start]), counts[i], totals[i], minimum[i], maximum[i], last[i])
+        self.flush()
+
+    def flush(self):
+        for level in self.levels:
+            level.flush()
+
+    def close(self):
+        """Close the open buckets (partial) and the series files"""
+        for level in self.levels:
+            level.close_bucket()
+        self.flush()
+        for level in self.levels:
+            if level.writer is not None:
+                level.writer.close()
+
+
+class RollupSink:
+    def __init__(self, log_path, keys, levels=DEFAULT_LEVELS, time_origin=None):
+        """
+        LogWriter sink feeding (timestamp, values, ...) records into rollups
+
+        Args:
+            log_path: Log the rollup series are stored next to
+            keys: Result keys
+            levels: Bucket lengths in seconds
+            time_origin: Wall-clock seconds the record timestamps count from
+        """
+        self.rollup = Rollup(keys, levels, log_path, time_origin)
+
+    def write(self, records):
+        n = len(records)
+        seconds = np.fromiter((record[0] for record in records), np.float64, n)
+        try:
+            values = np.array([record[1] for record in records], np.float64)
+        except (TypeError, ValueError):
+            values = np.array([[_to_float(v) for v in record[1]] for record in records], np.float64)
+        self.rollup.add(seconds, values)
+        return 0
+
+    def sync(self):
+        for level in self.rollup.levels:
+            if level.writer is not None:
+                level.writer.sync()
+
+    def close(self):
+        self.rollup.close()
+
+
+def _segmented(log_path):
+    """(manifest, logical log path) of a segmented log, or (None, log_path)"""
+    manifest = manifest_path(log_path)
+    if log_path.endswith(MANIFEST_SUFFIX) or (os.path.exists(manifest) and not os.path.exists(log_path)):
+        logical = os.path.join(os.path.dirname(manifest), read_manifest(manifest)['log'])
+        return manifest, logical
+    return None, log_path
+
+
+def build_rollups(log_path, levels=DEFAULT_LEVELS, chunk_rows=100000):
+    """
+    Compute the rollup series of an existing log in one pass
+
+    Args:
+        log_path: CSV or .m2b log, or a segmented log's manifest/logical path
+                  (its segments, compressed or not, are read as one stream)
+
+    Returns:
+        Number of samples aggregated
+    """
+    manifest, log_path = _segmented(log_path)
+
+    if is_binary_log(log_path):
+        rollup = None
+        samples = 0
+        for log in (iter_binary(manifest) if manifest else [BinaryLog(log_path)]):
+            if rollup is None:
+                origin_ns = log.time_origin_ns
+                rollup = Rollup(log.keys, levels, log_path, origin_ns / 1e9, log.units)
+            for i in range(0, len(log), chunk_rows):
+                rollup.add((log.time[i:i + chunk_rows] - origin_ns) / 1e9,
+                           log.values[i:i + chunk_rows].astype(np.float64))
+            samples += len(log)
+        if rollup is None:
+            raise ValueError(f"{manifest}: no segments")
+        rollup.close()
+        return samples
+
+    from m2000_convert import parse_header, read_chunks
+    from m2000_index import _open_index
+    # Segments share the stream's time origin, kept in each segment's index
+    first = read_manifest(manifest)['paths'][0] if manifest else log_path
+    index = _open_index(first)
+    origin = index.time_origin if index is not None else 0.0
+    samples = 0
+    with (CsvStream(manifest) if manifest else open(log_path, newline='')) as f:
+        names, units = parse_header(f.readline())
+        rollup = Rollup(names[1:], levels, log_path, origin, units[1:])
+        for data in read_chunks(f, len(names), chunk_rows):
+            rollup.add(data[:, 0], data[:, 1:])
+            samples += len(data)
+    rollup.close()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 rollup series tool')
+    parser.add_argument('log', help='CSV or .m2b log the rollups belong to, or a segmented log '
+                                    '(run.csv / run.manifest.json)')
+    parser.add_argument('--build', action='store_true',
+                       help='Compute the rollup series of an existing log')
+    parser.add_argument('--levels', type=float, nargs='+', default=list(DEFAULT_LEVELS),
+                       help='Bucket lengths in seconds (default: 1 10 60 900)')
+    parser.add_argument('--level', type=float, default=60,
+                       help='Level to print in seconds (default: 60)')
+    parser.add_argument('--key', help='Only this key, e.g. CH1_W')
+    parser.add_argument('--last', type=int, default=20,
+                       help='Buckets to print, newest last (default: 20)')
+
+    args = parser.parse_args()
+    levels = [int(level) if level == int(level) else level for level in args.levels]
+
+    try:
+        if args.build:
+            samples = build_rollups(args.log, levels)
+            print(f"Aggregated {samples} samples into {', '.join(map(level_name, levels))} rollups")
+            for seconds in levels:
+                path = rollup_path(_segmented(args.log)[1], seconds)
+                print(f"  {path}: {len(BinaryLog(path))} buckets, {os.path.getsize(path)} bytes")
+            return 0
+
+        level = int(args.level) if args.level == int(args.level) else args.level
+        series = BinaryLog(rollup_path(_segmented(args.log)[1], level))
+        keys = [args.key] if args.key else [key.rpartition('.')[0] for key in series.keys[::len(STATS)]]
+        for key in keys:
+            if f"{key}.min" not in series.keys:
+                raise ValueError(f"no rollups of {key!r}")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"{args.log}: {e}")
+        return 1
+
+    print(f"{level_name(level)} rollups of {args.log}: {len(series)} buckets")
+    start = max(0, len(series) - args.last)
+    for key in keys:
+        unit = series.units[series.keys.index(f"{key}.min")]
+        print(f"\n{key}" + (f" ({unit})" if unit else ""))
+        print(f"{'Bucket':<20} {'Min':>12} {'Max':>12} {'Mean':>12} {'Last':>12} {'Count':>7}")
+        for i in range(start, len(series)):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(series.time[i] / 1e9))
+            stats = {stat: series.column(f"{key}.{stat}")[i] for stat in STATS}
+            print(f"{stamp:<20} {stats['min']:>12.6g} {stats['max']:>12.6g} "
+                  f"{stats['mean']:>12.6g} {stats['last']:>12.6g} {int(stats['count']):>7}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
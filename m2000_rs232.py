@@ -16,30 +16,102 @@ import serial
 import time
 import sys
 import argparse
+import threading
+import queue
+from collections import deque
+
+from m2000_framing import RingBuffer
+from m2000_plan import compile_plan, pack_reads
+from m2000_schedule import DeadlineScheduler, POLICIES, measure_rate, parse_rate
+from m2000_stats import TransportStats
+
+
+# Rates the M2000 supports, fastest first
+BAUD_RATES = (115200, 57600, 19200, 9600)
+
+
+def parse_baud(text):
+    """Parse a --baud argument: one of BAUD_RATES or 'auto' (probe)"""
+    text = str(text).strip().lower()
+    if text == 'auto':
+        return 'auto'
+    try:
+        baud = int(text)
+    except ValueError:
+        baud = None
+    if baud not in BAUD_RATES:
+        raise argparse.ArgumentTypeError(f"invalid baud rate {text!r}: use "
+                                         f"{', '.join(map(str, sorted(BAUD_RATES)))} or 'auto'")
+    return baud
 
 
 class M2000_RS232:
-    def __init__(self, port='COM1', baudrate=115200, timeout=1.0):
+    def __init__(self, port='COM1', baudrate=115200, timeout=1.0, reader_thread=False):
         """
         Initialize RS232 connection to M2000 Power Analyzer
         
         Args:
             port: Serial port (e.g., 'COM1' on Windows, '/dev/ttyUSB0' on Linux)
-            baudrate: 9600, 19200, 57600, or 115200 (recommended)
+            baudrate: 9600, 19200, 57600, or 115200 (recommended), or 'auto' to
+                      probe the instrument's rate on connect (see probe_baudrate())
             timeout: Read timeout in seconds
+            reader_thread: Drain the port on a background thread into a
+                           response queue (see start_reader())
         """
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.reader_thread = reader_thread
         self.connection = None
         self.connected = False
+        self.last_read_command = None  # Re-sent by a warm connect so REREAD? keeps working
+        self.time_to_first_sample = None
+        self.stats = None  # TransportStats while instrumentation is enabled
+        self._first_byte_ns = None
+        self.rx = RingBuffer()      # Receive buffer, keeps bytes past the current response
+        self.reader = None          # Background reader thread, if running
+        self.reader_running = False
+        self.reader_parser = None   # Applied to each line by the reader, e.g. QueryPlan.parse_values
+        self.responses = None       # Queue of (line, values, arrival_ns) from the reader
+        
+    def enable_stats(self, stats=None):
+        """
+        Turn on per-query instrumentation (see m2000_stats)
+        
+        Swaps in timed send/read methods; with stats off the plain methods
+        run unchanged.
+        
+        Returns:
+            TransportStats collecting latency histograms and counters
+        """
+        self.stats = stats if stats is not None else TransportStats('rs232')
+        self.send_raw = self._send_raw_timed
+        self.read_response = self._read_response_timed
+        self._read_chunk = self._read_chunk_timed
+        return self.stats
+    
+    def disable_stats(self):
+        """Turn off instrumentation, restoring the plain send/read methods"""
+        for name in ('send_raw', 'read_response', '_read_chunk'):
+            self.__dict__.pop(name, None)
+        self.stats = None
+    
+    def connect(self, warm=False):
+        """
+        Establish RS232 connection
         
-    def connect(self):
-        """Establish RS232 connection"""
+        Args:
+            warm: Skip *RST/*CLS and the settling delay so the instrument keeps its
+                  configuration. The link is checked with a single query: the last
+                  READ? command if there was one (so REREAD? can resume at once),
+                  otherwise *IDN?
+        """
         try:
+            connect_start = time.perf_counter()
+            auto_baud = self.baudrate == 'auto'
             self.connection = serial.Serial(
                 port=self.port,
-                baudrate=self.baudrate,
+                baudrate=BAUD_RATES[0] if auto_baud else self.baudrate,
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
@@ -53,43 +125,71 @@ class M2000_RS232:
             try:
                 self.connection.cts_state = self.connection.cts
                 self.connection.dsr_state = self.connection.dsr
-            except AttributeError:
-                # Some serial implementations may not support these attributes
+            except (AttributeError, OSError):
+                # Some serial implementations (and pseudo-terminals) do not support these
                 pass
             
             # Clear buffers
             self.connection.reset_input_buffer()
             self.connection.reset_output_buffer()
+            self.rx.clear()
+            self.rx.skip_lf = True  # LF of a CR LF whose CR was read before the reset
             
-            # Wait for connection to stabilize
-            time.sleep(0.1)
+            self.connected = True  # Port is open - allow commands during initialization
+            if auto_baud:
+                baudrate = self.probe_baudrate()
+                if baudrate is None:
+                    print(f"No response from M2000 at {', '.join(map(str, BAUD_RATES))} baud")
+                    self.connection.close()
+                    self.connected = False
+                    return False
+                self.baudrate = baudrate
+            if self.reader_thread:
+                self.start_reader()
             
-            # Initialize device (commands don't return responses)
-            self.send_command('*RST')  # Reset device - no response
-            self.send_command('*CLS')  # Clear device - no response
-            
-            # Check connection with query (queries do return responses)
-            response = self.query('*IDN?')
+            if warm and self.last_read_command:
+                # Re-arm REREAD? with the last READ?; its reply is the first sample
+                response = self.query(self.last_read_command)
+                alive = bool(response)
+            else:
+                if not warm:
+                    # Wait for connection to stabilize
+                    time.sleep(0.1)
+                    
+                    # Initialize device (commands don't return responses)
+                    self.send_command('*RST')  # Reset device - no response
+                    self.send_command('*CLS')  # Clear device - no response
+                
+                # Check connection with query (queries do return responses)
+                response = self.query('*IDN?')
+                alive = bool(response) and 'APS' in response
             
-            if response and 'APS' in response:
-                self.connected = True
-                print(f"Connected to: {response}")
+            if alive:
+                self.time_to_first_sample = time.perf_counter() - connect_start
+                if warm:
+                    print(f"Warm connect: first response after {self.time_to_first_sample * 1000:.1f} ms")
+                else:
+                    print(f"Connected to: {response}")
                 return True
             else:
                 print(f"Unexpected response: {response}")
+                self.stop_reader()
+                self.connected = False
                 return False
                 
         except serial.SerialException as e:
             print(f"RS232 connection failed: {e}")
-            return False
         except Exception as e:
             print(f"Connection error: {e}")
-            return False
+        self.stop_reader()
+        self.connected = False
+        return False
     
     def disconnect(self):
         """Close RS232 connection"""
         if self.connection and self.connection.is_open:
             self.send_command('LOCAL')  # Return to local control
+            self.stop_reader()
             self.connection.close()
             self.connected = False
             print("RS232 connection closed")
@@ -99,11 +199,16 @@ class M2000_RS232:
         if not self.connected or not self.connection.is_open:
             raise Exception("Not connected to M2000")
         
+        # Add proper termination (from corrected info)
+        if not command.endswith('\r\n'):
+            command += '\r\n'
+        self.send_raw(command.encode('ascii'))
+        if command[:5].upper() == 'READ?':
+            self.last_read_command = command.rstrip('\r\n')
+    
+    def send_raw(self, cmd_bytes):
+        """Send pre-encoded command bytes (including CR LF terminator) to M2000"""
         try:
-            # Add proper termination (from corrected info)
-            if not command.endswith('\r\n'):
-                command += '\r\n'
-            cmd_bytes = command.encode('ascii')
             self.connection.write(cmd_bytes)
             self.connection.flush()
             
@@ -111,21 +216,183 @@ class M2000_RS232:
             print(f"Send command error: {e}")
             raise
     
+    def _send_raw_timed(self, cmd_bytes):
+        start = time.monotonic_ns()
+        M2000_RS232.send_raw(self, cmd_bytes)
+        self.stats.sent(cmd_bytes, start, time.monotonic_ns())
+    
+    def _read_chunk(self):
+        """Read everything that has arrived; blocks for 1 byte (up to 100 ms) if nothing has"""
+        connection = self.connection
+        return connection.read(connection.in_waiting or 1)
+    
+    def _read_chunk_timed(self):
+        data = M2000_RS232._read_chunk(self)
+        if data and self._first_byte_ns is None:
+            self._first_byte_ns = time.monotonic_ns()
+        return data
+    
+    def _read_response_timed(self):
+        self._first_byte_ns = None
+        response = M2000_RS232.read_response(self)
+        end = time.monotonic_ns()
+        if response is None:
+            self.stats.timeout()
+        else:
+            self.stats.received(len(response) + 2, self._first_byte_ns or end, end)
+        return response
+    
+    def _next_line(self, timeout):
+        """Read in bulk until a complete line is buffered"""
+        rx = self.rx
+        frame = rx.next_frame()
+        deadline = time.monotonic() + timeout
+        while frame is None:
+            data = self._read_chunk()
+            if data:
+                rx.write(data)
+                frame = rx.next_frame()
+            elif time.monotonic() > deadline:
+                raise Exception("Read timeout")
+        return frame.decode('ascii', 'replace')
+    
+    def _next_line_queued(self, timeout):
+        """Take the next line from the reader thread's queue"""
+        return self._get_reply(timeout)[0]
+    
     def read_response(self):
         """Read response from M2000"""
         if not self.connected or not self.connection.is_open:
             raise Exception("Not connected to M2000")
         
         try:
-            # Use read_until() method as shown in corrected info
-            read_val = self.connection.read_until()
-            response = read_val.decode("utf-8")[:-2].replace(";", "\r\n")
-            return response.strip()
+            return self._next_line(self.timeout)
             
         except Exception as e:
             print(f"Read response error: {e}")
             return None
     
+    def start_reader(self):
+        """
+        Drain the serial port on a background thread
+        
+        Everything waiting in the driver is read in one call into a ring
+        buffer, where replies are framed. Each reply is queued as (line,
+        values, arrival_ns); values is reader_parser(line) when a parser is
+        set (stream_data sets QueryPlan.parse_values), so parsing also moves
+        off the caller's thread. read_response() takes lines from the queue
+        while the reader runs.
+        """
+        if self.reader is not None:
+            return
+        self.responses = queue.Queue()
+        self.reader_running = True
+        self.reader = threading.Thread(target=self._reader_loop, name='M2000_RS232 reader', daemon=True)
+        self._next_line = self._next_line_queued
+        self.reader.start()
+    
+    def stop_reader(self):
+        """Stop the background reader; read_response() reads the port directly again"""
+        reader = self.reader
+        if reader is None:
+            return
+        self.reader_running = False
+        self.reader = None  # A reader still in a slow read exits when it returns
+        reader.join(timeout=1.0)
+        self.__dict__.pop('_next_line', None)
+        if reader.is_alive():
+            # It may still write one last chunk into its buffer - start on a new one
+            self.rx = RingBuffer(self.rx.capacity)
+        else:
+            self.rx.clear()
+    
+    def resync(self, quiet_time=0.2):
+        """
+        Discard buffered and late responses so the next query starts in step
+        
+        A running background reader is restarted with an empty buffer and queue.
+        
+        Args:
+            quiet_time: Seconds to wait for late responses before flushing them
+        """
+        if not self.connection:
+            return
+        if self.stats is not None:
+            self.stats.retry()
+        restart = self.reader is not None
+        self.stop_reader()
+        try:
+            time.sleep(quiet_time)
+            self.connection.reset_input_buffer()
+        except (serial.SerialException, OSError):
+            pass
+        self.rx.clear()
+        if restart:
+            self.start_reader()
+    
+    def _reader_loop(self):
+        rx = self.rx
+        responses = self.responses
+        thread = threading.current_thread()
+        while self.reader_running and self.reader is thread:
+            try:
+                data = self._read_chunk()  # Port timeout (100 ms) bounds the wait for stop_reader()
+                if not data:
+                    continue
+                rx.write(data)
+            except BufferError as e:
+                # Receive buffer overrun - transient: drop the partial data and carry on
+                rx.clear()
+                responses.put(e)
+                continue
+            except Exception as e:
+                # Port gone (SerialException is an OSError; an unplugged adapter can
+                # stay is_open) - stop instead of spinning, fall back to direct reads
+                # so later read_response() calls fail fast, and hand the error to a
+                # caller already waiting
+                rx.clear()
+                if self.reader is thread:
+                    self.reader_running = False
+                    self.reader = None
+                    self.__dict__.pop('_next_line', None)
+                responses.put(e)
+                return
+            
+            arrival = time.monotonic_ns()
+            frame = rx.next_frame()
+            while frame is not None:
+                line = frame.decode('ascii', 'replace')
+                values = None
+                parser = self.reader_parser
+                if parser is not None:
+                    try:
+                        values = parser(line)
+                    except Exception:
+                        pass
+                responses.put((line, values, arrival))
+                frame = rx.next_frame()
+    
+    def _get_reply(self, timeout):
+        try:
+            item = self.responses.get(timeout=timeout)
+        except queue.Empty:
+            raise Exception("Read timeout")
+        if isinstance(item, Exception):
+            raise item
+        return item
+    
+    def read_values(self, timeout=None):
+        """
+        Next reply from the reader thread (see start_reader())
+        
+        Returns:
+            (line, values, arrival_ns)
+        """
+        item = self._get_reply(self.timeout if timeout is None else timeout)
+        if self.stats is not None:
+            self.stats.received(len(item[0]) + 2, item[2], item[2])
+        return item
+    
     def query(self, command):
         """Send query command and return response"""
         self.send_command(command)
@@ -150,45 +417,140 @@ class M2000_RS232:
         Returns:
             Dictionary with measurement data
         """
-        # Build READ command using corrected M2000 syntax
-        read_fields = []
-        for param in parameters:
-            for channel in channels:
-                # Convert parameter names to M2000 format
-                m2000_param = param
-                if param == 'V':
-                    m2000_param = 'VOLTS'
-                elif param == 'A':
-                    m2000_param = 'AMPS'
-                elif param == 'W':
-                    m2000_param = 'WATTS'
-                
-                # Use M2000 command format: READ?,ch2:VOLTS:ACDC
-                read_fields.append(f"READ?,{channel.lower()}:{m2000_param}:ACDC")
+        return self.get_measurements([(channels, parameters)])[0]
+    
+    def get_measurements(self, requests):
+        """
+        Get several channel/parameter sets with as few round trips as possible
         
-        # Send multiple READ commands (can also combine with semicolons)
-        command = ";".join(read_fields)
-        response = self.query(command)
+        The READ? fields of all requests are packed into command sets of at
+        most 4095 characters; a request too large for one set is split.
         
-        if response:
-            values = response.split(',')
-            results = {}
-            
-            idx = 0
-            for param in parameters:
-                for channel in channels:
-                    if idx < len(values):
-                        try:
-                            results[f"{channel}_{param}"] = float(values[idx])
-                        except ValueError:
-                            results[f"{channel}_{param}"] = values[idx]
-                        idx += 1
+        Args:
+            requests: List of (channels, parameters) pairs
+        
+        Returns:
+            List with a measurement dictionary (or None) per request
+        """
+        # Command sets and response mapping are compiled once per request list
+        packer = pack_reads(requests)
+        if self.stats is None:
+            return packer.execute(self.query)
+        
+        responses = [self.query(command) for command in packer.commands]
+        parse_start = time.monotonic_ns()
+        results = packer.unpack(responses)
+        self.stats.parsed('READ?', time.monotonic_ns() - parse_start)
+        return results
+    
+    def probe_baudrate(self, rates=BAUD_RATES, timeout=0.25):
+        """
+        Find the baud rate the instrument is set to
+        
+        Sends *IDN? at each rate, fastest first, on the open port. At a wrong
+        rate the instrument only sees framing errors, so each attempt starts
+        with a bare terminator that ends whatever garbage it assembled.
+        
+        Args:
+            rates: Baud rates to try, in order
+            timeout: Seconds to wait for the reply at each rate
+        
+        Returns:
+            The working baud rate (the port is left set to it), or None
+        """
+        if not self.connected or not self.connection.is_open:
+            raise Exception("Not connected to M2000")
+        
+        found = None
+        for baudrate in rates:
+            self.connection.baudrate = baudrate
+            self.connection.reset_input_buffer()
+            self.rx.clear()
+            self.send_raw(b'\r\n*IDN?\r\n')
             
-            return results
-        return None
+            # Skip garbage lines until the reply or the timeout
+            deadline = time.monotonic() + timeout
+            while found is None:
+                remaining = deadline - time.monotonic()
+                try:
+                    line = self._next_line(remaining) if remaining > 0 else ''
+                except Exception:
+                    line = ''
+                if 'APS' in line:
+                    found = baudrate
+                elif not line:
+                    break
+            if found:
+                break
+        
+        if found:
+            print(f"M2000 answers at {found} baud")
+            self.check_errors()  # Clear errors left by the mismatched attempts
+        return found
+    
+    def probe_link(self, channels=['CH1'], parameters=['V', 'A', 'W'], duration=1.0, pipeline=2):
+        """
+        Measure what this link carries for a channel/parameter set
+        
+        Times REREAD? replies for duration seconds one at a time, and again
+        with pipeline queries in flight, and compares both with the line
+        limit (8N1: 10 bits per byte; replies travel on their own wire, so
+        the reply length bounds the rate).
+        
+        Returns:
+            Dictionary: baudrate, reply_bytes, line_limit_hz, sequential_hz,
+            pipelined_hz, best_pipeline, sustainable_hz (90% of the best rate)
+        """
+        plan = compile_plan(channels, parameters)
+        response = self.query(plan.command)  # Arm REREAD?
+        if not response:
+            raise Exception("No reply to READ?")
+        reread = plan.reread_bytes(b'\r\n')
+        reply_bytes = len(response) + 2
+        
+        count = 0
+        start = time.perf_counter()
+        while count < 3 or time.perf_counter() - start < duration:
+            self.send_raw(reread)
+            if self.read_response() is None:
+                raise Exception("No reply to REREAD?")
+            count += 1
+        sequential = count / (time.perf_counter() - start)
+        
+        own_reader = self.reader is None
+        if own_reader:
+            self.start_reader()
+        try:
+            count = in_flight = 0
+            start = time.perf_counter()
+            for _ in range(pipeline):
+                self.send_raw(reread)
+                in_flight += 1
+            while in_flight:
+                self.read_values()
+                count += 1
+                in_flight -= 1
+                if count < 3 or time.perf_counter() - start < duration:
+                    self.send_raw(reread)
+                    in_flight += 1
+            pipelined = count / (time.perf_counter() - start)
+        finally:
+            if own_reader:
+                self.stop_reader()
+        
+        best_pipeline = pipeline if pipelined > sequential else 1
+        return {
+            'baudrate': self.baudrate,
+            'reply_bytes': reply_bytes,
+            'line_limit_hz': self.baudrate / 10.0 / reply_bytes,
+            'sequential_hz': sequential,
+            'pipelined_hz': pipelined,
+            'best_pipeline': best_pipeline,
+            'sustainable_hz': 0.9 * max(sequential, pipelined),
+        }
     
     def stream_data(self, channels=['CH1'], parameters=['V', 'A', 'W'], 
-                   duration=10, sample_rate=1.0):
+                   duration=10, sample_rate=1.0, policy='skip', pipeline=1):
         """
         Stream measurement data for specified duration
         
@@ -196,66 +558,150 @@ class M2000_RS232:
             channels: List of channels to monitor
             parameters: List of parameters to read
             duration: Duration in seconds (0 = infinite)
-            sample_rate: Samples per second
+            sample_rate: Samples per second, 0 = as fast as possible,
+                         'auto' = measure the sustainable rate first
+            policy: Missed deadline policy, 'skip' or 'catchup' (see m2000_schedule)
+            pipeline: Number of REREAD? queries kept in flight (1 = no pipelining);
+                      more than 1 runs the background reader, so the next
+                      REREAD? goes out while the current reply is still arriving
+        
+        Returns:
+            Scheduler statistics (ticks, achieved rate, overruns, missed deadlines)
         """
-        print(f"Streaming data from {channels} for {duration}s at {sample_rate}Hz")
-        print("Press Ctrl+C to stop\n")
+        if sample_rate == 'auto':
+            sample_rate = self.measure_sample_rate(channels, parameters)
         
-        # Set up initial READ command
-        read_fields = []
-        for param in parameters:
-            for channel in channels:
-                read_fields.append(f"{param}:{channel}")
+        # Absolute monotonic deadlines - no drift, immune to wall-clock jumps
+        scheduler = DeadlineScheduler(sample_rate, duration, policy)
+        rate_text = f"{sample_rate:.1f}Hz" if scheduler.sample_rate else "maximum rate"
+        print(f"Streaming data from {channels} for {duration}s at {rate_text}")
+        if pipeline > 1:
+            print(f"Pipelining {pipeline} queries")
+        print("Press Ctrl+C to stop\n")
         
-        command = "READ? " + ",".join(read_fields)
+        # Compiled READ? command (corrected M2000 syntax), result keys and parser
+        plan = compile_plan(channels, parameters)
+        reread = plan.reread_bytes(b'\r\n')
         
-        start_time = time.time()
         sample_count = 0
+        stats = self.stats
+        
+        def handle_sample(timestamp, values):
+            """Print one sample"""
+            output = f"[{timestamp:8.2f}s] "
+            for key, value in zip(plan.keys, values):
+                output += f"{key}={value:>8} "
+            print(output)
+        
+        own_reader = pipeline > 1 and self.reader is None
+        if own_reader:
+            self.start_reader()
+        if self.reader is not None:
+            self.reader_parser = plan.parse_values
         
         try:
-            while True:
-                # Check duration
-                if duration > 0 and (time.time() - start_time) > duration:
-                    break
-                
-                # Get measurement
-                if sample_count == 0:
-                    # First reading - use READ?
-                    response = self.query(command)
-                else:
-                    # Subsequent readings - use REREAD? for speed
-                    response = self.query('REREAD?')
-                
-                if response:
-                    values = response.split(',')
-                    timestamp = time.time() - start_time
-                    
-                    # Format output
-                    output = f"[{timestamp:8.2f}s] "
-                    idx = 0
-                    for param in parameters:
-                        for channel in channels:
-                            if idx < len(values):
-                                output += f"{channel}_{param}={values[idx]:>8} "
-                                idx += 1
+            if pipeline > 1:
+                # Keep several queries in flight; restart the pipe after a lost reply
+                in_flight = deque()  # Seconds since start of each query in flight
+                resyncs = 0
+                rearm = True  # READ? must be answered before REREAD? is valid
+                while resyncs < 3:
+                    try:
+                        for timestamp in scheduler:
+                            if rearm:
+                                self.send_command(plan.command)
+                            else:
+                                self.send_raw(reread)
+                            in_flight.append(timestamp)
+                            
+                            # Take every reply that is in, and wait while the window is full
+                            while in_flight and (len(in_flight) >= pipeline or rearm
+                                                 or not self.responses.empty()):
+                                line, values, arrival = self.read_values()
+                                timestamp = in_flight.popleft()
+                                rearm = False
+                                if values is not None:
+                                    handle_sample(timestamp, values)
+                                    sample_count += 1
+                                    resyncs = 0
+                        
+                        # Collect the replies still in flight
+                        while in_flight:
+                            line, values, arrival = self.read_values()
+                            timestamp = in_flight.popleft()
+                            if values is not None:
+                                handle_sample(timestamp, values)
+                                sample_count += 1
+                        break
+                    except Exception as e:
+                        # Reply lost or port error - drain, flush and start again with READ?
+                        resyncs += 1
+                        in_flight.clear()  # Responses in flight are discarded
+                        rearm = True
+                        print(f"Pipeline resynchronized: {e}")
+                        self.resync()
+                        self.start_reader()  # In case the reader stopped on the error
+            
+            else:
+                for timestamp in scheduler:
+                    # Get measurement
+                    if sample_count == 0:
+                        # First reading - use READ?
+                        response = self.query(plan.command)
+                    else:
+                        # Subsequent readings - use REREAD? for speed
+                        self.send_raw(reread)
+                        response = self.read_response()
                     
-                    print(output)
-                    sample_count += 1
-                
-                # Wait for next sample
-                time.sleep(1.0 / sample_rate)
+                    if response:
+                        parse_start = time.monotonic_ns() if stats is not None else 0
+                        values = plan.parse_values(response)
+                        if stats is not None:
+                            stats.parsed('READ?' if sample_count == 0 else 'REREAD?', time.monotonic_ns() - parse_start)
+                        
+                        handle_sample(timestamp, values)
+                        sample_count += 1
                 
         except KeyboardInterrupt:
             print(f"\nStreaming stopped. Collected {sample_count} samples")
+        finally:
+            self.reader_parser = None
+            if own_reader:
+                self.stop_reader()
+        
+        print(f"Schedule: {scheduler.summary()}")
+        return scheduler.stats()
+    
+    def measure_sample_rate(self, channels=['CH1'], parameters=['V', 'A', 'W'], count=20):
+        """
+        Measure the REREAD? rate this link can sustain for a channel/parameter set
+        
+        Args:
+            channels: List of channels
+            parameters: List of parameters
+            count: Number of REREAD? round trips to time
+        
+        Returns:
+            Sustainable samples per second (90% of the measured rate)
+        """
+        plan = compile_plan(channels, parameters)
+        self.query(plan.command)  # Arm REREAD?
+        
+        def run(n):
+            for _ in range(n):
+                self.query('REREAD?')
+        
+        rate = measure_rate(run, count)
+        print(f"Sustainable rate: {rate:.1f} Hz")
+        return rate
 
 
 def main():
     parser = argparse.ArgumentParser(description='APS M2000 RS232 Interface')
     parser.add_argument('--port', default='/dev/ttyUSB0', 
                        help='Serial port (default: /dev/ttyUSB0)')
-    parser.add_argument('--baud', type=int, default=115200,
-                       choices=[9600, 19200, 57600, 115200],
-                       help='Baud rate (default: 115200)')
+    parser.add_argument('--baud', type=parse_baud, default=115200,
+                       help="Baud rate 9600, 19200, 57600, 115200 or 'auto' to probe (default: 115200)")
     parser.add_argument('--channels', nargs='+', default=['CH1'],
                        choices=['CH1', 'CH2', 'CH3', 'CH4'],
                        help='Channels to monitor (default: CH1)')
@@ -266,30 +712,54 @@ def main():
                        help='Stream data continuously')
     parser.add_argument('--duration', type=float, default=10,
                        help='Stream duration in seconds (default: 10)')
-    parser.add_argument('--rate', type=float, default=1.0,
-                       help='Sample rate in Hz (default: 1.0)')
+    parser.add_argument('--rate', type=parse_rate, default=1.0,
+                       help="Sample rate in Hz, 'max' or 'auto' (default: 1.0)")
+    parser.add_argument('--policy', choices=POLICIES, default='skip',
+                       help='Missed deadline policy while streaming (default: skip)')
+    parser.add_argument('--probe', action='store_true',
+                       help='Measure the reply rate of the link for the channels/params and suggest --rate')
+    parser.add_argument('--pipeline', type=int, default=1,
+                       help='REREAD? queries kept in flight while streaming (default: 1)')
+    parser.add_argument('--reader-thread', action='store_true',
+                       help='Drain the serial port on a background thread into a response queue')
+    parser.add_argument('--warm', action='store_true',
+                       help='Connect without *RST/*CLS, keeping the instrument configuration')
+    parser.add_argument('--stats', action='store_true',
+                       help='Print per-command latency histograms and transport counters at exit')
     
     args = parser.parse_args()
     
     # Create M2000 interface
-    m2000 = M2000_RS232(port=args.port, baudrate=args.baud)
+    m2000 = M2000_RS232(port=args.port, baudrate=args.baud, reader_thread=args.reader_thread)
+    if args.stats:
+        m2000.enable_stats()
     
     try:
         # Connect
-        if not m2000.connect():
+        if not m2000.connect(warm=args.warm):
             print("Failed to connect to M2000")
             return 1
         
         # Check for errors
         m2000.check_errors()
         
-        if args.stream:
+        if args.probe:
+            link = m2000.probe_link(args.channels, args.params)
+            print(f"Link probe at {link['baudrate']} baud, {link['reply_bytes']}-byte replies:")
+            print(f"  Line limit:          {link['line_limit_hz']:8.1f} Hz")
+            print(f"  One query at a time: {link['sequential_hz']:8.1f} Hz")
+            print(f"  Pipelined:           {link['pipelined_hz']:8.1f} Hz")
+            pipeline = f" --pipeline {link['best_pipeline']}" if link['best_pipeline'] > 1 else ""
+            print(f"Suggested: --rate {link['sustainable_hz']:.0f}{pipeline}")
+        elif args.stream:
             # Stream data
             m2000.stream_data(
                 channels=args.channels,
                 parameters=args.params,
                 duration=args.duration,
-                sample_rate=args.rate
+                sample_rate=args.rate,
+                policy=args.policy,
+                pipeline=args.pipeline
             )
         else:
             # Single measurement
@@ -307,6 +777,8 @@ def main():
         print(f"Error: {e}")
         return 1
     finally:
+        if m2000.stats is not None:
+            print("\n" + m2000.stats.summary())
         m2000.disconnect()
     
     return 0
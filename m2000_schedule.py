@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Deadline Scheduler
+Paces streaming loops on time.monotonic_ns() with absolute deadlines, so the
+sample phase does not drift and wall-clock jumps do not disturb the timing
+"""
+
+import asyncio
+import time
+import sys
+import argparse
+
+
+# What to do when a deadline has already passed:
+#   skip    - drop the missed deadlines and stay on the original time grid
+#   catchup - run the missed samples back to back until on schedule again
+POLICIES = ('skip', 'catchup')
+
+
+class DeadlineScheduler:
+    def __init__(self, sample_rate=5.0, duration=0, policy='skip', max_catchup=10):
+        """
+        Initialize scheduler
+
+        Args:
+            sample_rate: Samples per second (0 = as fast as possible)
+            duration: Duration in seconds (0 = infinite)
+            policy: 'skip' or 'catchup' (see POLICIES)
+            max_catchup: With 'catchup', the most periods to run back to back
+                         before falling back to skipping
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}")
+
+        self.sample_rate = sample_rate if sample_rate and sample_rate > 0 else 0
+        self.duration = duration if duration and duration > 0 else 0
+        self.policy = policy
+        self.max_catchup = max_catchup
+        self.period_ns = round(1e9 / self.sample_rate) if self.sample_rate else 0
+        self.duration_ns = round(1e9 * self.duration)
+        self.reset()
+
+    def reset(self):
+        """Restart the schedule from now"""
+        self.start_ns = time.monotonic_ns()
+        self.start_wall = time.time()  # Wall clock at start, for absolute timestamps
+        self.deadline_ns = self.start_ns
+        self.ticks = 0
+        self.overruns = 0   # Ticks whose deadline had already passed
+        self.missed = 0     # Deadlines dropped by the skip policy
+        self.max_late_ns = 0
+
+    def _next(self, now):
+        """Advance to the next deadline; returns nanoseconds to wait (<= 0 = due)"""
+        if self.ticks == 0 or not self.period_ns:
+            return 0  # First sample at start, or as fast as possible
+
+        self.deadline_ns += self.period_ns
+        late = now - self.deadline_ns
+        if late <= 0:
+            return late
+
+        # Previous sample ran past this deadline
+        self.overruns += 1
+        self.max_late_ns = max(self.max_late_ns, late)
+        if self.policy == 'skip' or late > self.max_catchup * self.period_ns:
+            skipped = late // self.period_ns
+            self.missed += skipped
+            self.deadline_ns += skipped * self.period_ns
+        return 0
+
+    def _due(self):
+        """Count the tick; returns seconds since start, or None when the duration is over"""
+        now = time.monotonic_ns()
+        if self.duration_ns and now - self.start_ns > self.duration_ns:
+            return None
+        self.ticks += 1
+        return (now - self.start_ns) / 1e9
+
+    def wait(self):
+        """
+        Block until the next sample is due
+
+        Returns:
+            Seconds since start at the moment the sample is due, or None
+            when the duration is over
+        """
+        wait_ns = -self._next(time.monotonic_ns())
+        if wait_ns > 0:
+            time.sleep(wait_ns / 1e9)
+        return self._due()
+
+    async def wait_async(self):
+        """asyncio version of wait()"""
+        wait_ns = -self._next(time.monotonic_ns())
+        if wait_ns > 0:
+            await asyncio.sleep(wait_ns / 1e9)
+        return self._due()
+
+    def __iter__(self):
+        """Yield seconds since start for each due sample until the duration is over"""
+        while True:
+            elapsed = self.wait()
+            if elapsed is None:
+                return
+            yield elapsed
+
+    async def __aiter__(self):
+        while True:
+            elapsed = await self.wait_async()
+            if elapsed is None:
+                return
+            yield elapsed
+
+    def wall_time(self, elapsed):
+        """Wall-clock timestamp for seconds since start (immune to clock jumps during the run)"""
+        return self.start_wall + elapsed
+
+    def stats(self):
+        """Return scheduling statistics as a dictionary"""
+        elapsed = (time.monotonic_ns() - self.start_ns) / 1e9
+        return {
+            'target_rate': self.sample_rate or None,
+            'policy': self.policy,
+            'ticks': self.ticks,
+            'elapsed_s': elapsed,
+            'achieved_rate': self.ticks / elapsed if elapsed > 0 else 0.0,
+            'overruns': self.overruns,
+            'missed': self.missed,
+            'max_late_ms': self.max_late_ns / 1e6,
+        }
+
+    def summary(self):
+        """One-line scheduling summary"""
+        s = self.stats()
+        target = f"{s['target_rate']:.1f} Hz" if s['target_rate'] else "as fast as possible"
+        return (f"{s['ticks']} samples in {s['elapsed_s']:.2f}s ({s['achieved_rate']:.1f} Hz, "
+                f"target {target}), {s['overruns']} overruns, {s['missed']} missed deadlines, "
+                f"max late {s['max_late_ms']:.1f} ms")
+
+
+def measure_rate(run, count=20, headroom=0.9):
+    """
+    Measure the sustainable sample rate of a link
+
+    Args:
+        run: Callable performing count round trips (e.g. REREAD? queries)
+        count: Number of round trips to time
+        headroom: Fraction of the measured rate to return
+
+    Returns:
+        Samples per second that can be sustained with the given headroom
+    """
+    start = time.monotonic_ns()
+    run(count)
+    elapsed = time.monotonic_ns() - start
+    if elapsed <= 0:
+        return 0.0
+    return headroom * count * 1e9 / elapsed
+
+
+def parse_rate(text):
+    """
+    Parse a --rate argument: Hz, 'max' (as fast as possible) or 'auto' (measure)
+
+    Returns:
+        float Hz, 0 for 'max' or the string 'auto'
+    """
+    text = str(text).strip().lower()
+    if text == 'auto':
+        return 'auto'
+    if text == 'max':
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid rate {text!r}: use Hz, 'max' or 'auto'")
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Deadline scheduler test')
+    parser.add_argument('--rate', type=parse_rate, default=100.0,
+                       help="Sample rate in Hz or 'max' (default: 100)")
+    parser.add_argument('--duration', type=float, default=2.0,
+                       help='Duration in seconds (default: 2)')
+    parser.add_argument('--policy', choices=POLICIES, default='skip',
+                       help='Policy for missed deadlines (default: skip)')
+    parser.add_argument('--work', type=float, default=0.0,
+                       help='Simulated work per sample in ms, every 10th sample 5x (default: 0)')
+    args = parser.parse_args()
+
+    scheduler = DeadlineScheduler(args.rate, args.duration, args.policy)
+    for elapsed in scheduler:
+        if args.work:
+            time.sleep(args.work / 1000.0 * (5 if scheduler.ticks % 10 == 0 else 1))
+    print(scheduler.summary())
+    sys.exit(0)
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Segmented Logs
+Rolls a log over into numbered segments (run.000001.csv, run.000002.csv, ...)
+by size or age, compresses each closed segment with gzip or zstd on a
+background thread and keeps a JSON manifest (run.manifest.json) with every
+segment's file, state, row count and time span. Readers treat the segments
+listed in a manifest as one logical stream, compressed or not.
+"""
+
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import sys
+import argparse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from m2000_binlog import BinaryLog, is_binary_log
+
+
+COMPRESSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def manifest_path(path):
+    """Manifest of a segmented log: run.csv -> run.manifest.json"""
+    if path.endswith(MANIFEST_SUFFIX):
+        return path
+    return os.path.splitext(path)[0] + MANIFEST_SUFFIX
+
+
+def open_compressed(path, mode='rb'):
+    """Open a segment, decompressing .gz/.zst transparently"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("Reading .zst segments requires zstandard: pip install zstandard")
+        return zstandard.open(path, mode)
+    return open(path, mode)
+
+
+def _compress_file(source, compression):
+    """Compress a file next to itself and remove the original; returns the new path"""
+    target = source + COMPRESSIONS[compression]
+    temp = target + '.tmp'
+    with open(source, 'rb') as src:
+        if compression == 'gzip':
+            with gzip.open(temp, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+        else:
+            with open(temp, 'wb') as raw:
+                with zstandard.ZstdCompressor(level=3).stream_writer(raw) as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(temp, target)
+    os.remove(source)
+    return target
+
+
+class SegmentedSink:
+    def __init__(self, path, make_sink, max_bytes=0, max_seconds=0, compress=None, time_origin=None):
+        """
+        LogWriter sink that rotates into numbered segments
+
+        Args:
+            path: Logical log file, e.g. run.csv (segments: run.000001.csv, ...)
+            make_sink: Callable opening the sink (CsvSink, BinaryLogWriter) for a segment path
+            max_bytes: Start a new segment once this many bytes are written (0 = no limit);
+                       checked per batch, so a segment may exceed it by one batch
+            max_seconds: Start a new segment once the current one spans this many
+                         seconds of record time (0 = no limit)
+            compress: None, 'gzip' or 'zstd' - compress closed segments in the background
+            time_origin: Wall-clock seconds that record timestamps count from; the
+                         manifest records segment spans as Unix time when given
+        """
+        if compress is not None and compress not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compress!r}, expected one of {tuple(COMPRESSIONS)}")
+        if compress == 'zstd' and zstandard is None:
+            raise ImportError("zstd compression requires zstandard: pip install zstandard")
+
+        self.base, self.ext = os.path.splitext(path)
+        self.directory = os.path.dirname(path)
+        self.manifest_path = manifest_path(path)
+        self.make_sink = make_sink
+        self.max_bytes = max_bytes or 0
+        self.max_seconds = max_seconds or 0
+        self.compress = compress
+        self.time_origin = time_origin or 0.0
+
+        self.lock = threading.Lock()  # Manifest is updated by the writer and the compressor
+        self.segments = []
+        self.sink = None
+        self.segment = None
+        self.opened = 0.0   # Monotonic time the current segment was opened
+        self.started = 0.0  # First record timestamp of the current segment
+
+        self.compress_queue = None
+        self.compress_thread = None
+        if compress:
+            self.compress_queue = queue.Queue()
+            self.compress_thread = threading.Thread(target=self._compress_loop,
+                                                    name='LogCompressor', daemon=True)
+            self.compress_thread.start()
+        self._save_manifest()
+
+    def _open_segment(self):
+        index = len(self.segments) + 1
+        path = f"{self.base}.{index:06d}{self.ext}"
+        self.sink = self.make_sink(path)
+        self.segment = {'index': index, 'file': os.path.basename(path), 'state': 'open',
+                        'rows': 0, 'bytes': 0, 'start': None, 'end': None}
+        self.opened = time.monotonic()
+        with self.lock:
+            self.segments.append(self.segment)
+        self._save_manifest()
+
+    def write(self, records):
+        """
+        Write records, rotating once a segment is full or old enough
+
+        A segment's age is measured on the record timestamps, so with
+        max_seconds a batch is split at the first record that belongs to the
+        next segment. Plain-text records fall back to the wall clock and
+        rotate between batches; the size limit is checked after each batch.
+        """
+        written = 0
+        timed = self.max_seconds and isinstance(records[0], tuple)
+        while records:
+            if self.sink is None:
+                self._open_segment()
+            batch = records
+            if timed:
+                # Records lead with seconds since the time origin
+                start = self.started if self.segment['rows'] else records[0][0]
+                limit = start + self.max_seconds
+                split = next((i for i, record in enumerate(records) if record[0] >= limit),
+                             len(records))
+                if split == 0:
+                    self.rotate()
+                    continue
+                batch, records = records[:split], records[split:]
+            else:
+                records = None
+            written += self._write_segment(batch)
+            if records:
+                self.rotate()
+
+        segment = self.segment
+        if (self.max_bytes and segment['bytes'] >= self.max_bytes) or \
+           (self.max_seconds and not timed and time.monotonic() - self.opened >= self.max_seconds):
+            self.rotate()
+        return written
+
+    def _write_segment(self, records):
+        written = self.sink.write(records)
+        segment = self.segment
+        if isinstance(records[0], tuple):
+            if not segment['rows']:
+                self.started = records[0][0]
+                segment['start'] = self.time_origin + records[0][0]
+            segment['end'] = self.time_origin + records[-1][0]
+        segment['rows'] += len(records)
+        segment['bytes'] += written
+        return written
+
+    def rotate(self):
+        """Close the current segment; the next write opens a new one"""
+        if self.sink is None:
+            return
+        self.sink.close()
+        self.sink = None
+        segment = self.segment
+        with self.lock:
+            segment['state'] = 'closed'
+        self._save_manifest()
+        if self.compress_queue is not None:
+            self.compress_queue.put(segment)
+
+    def sync(self):
+        if self.sink is not None:
+            self.sink.sync()
+        self._save_manifest(sync=True)
+
+    def close(self):
+        """Close the last segment and wait for the compressor to finish"""
+        self.rotate()
+        if self.compress_thread is not None:
+            self.compress_queue.put(None)
+            self.compress_thread.join()
+            self.compress_thread = None
+        self._save_manifest()
+
+    def _compress_loop(self):
+        """Compressor thread: compress closed segments in order"""
+        while True:
+            segment = self.compress_queue.get()
+            if segment is None:
+                return
+            source = os.path.join(self.directory, segment['file'])
+            try:
+                target = _compress_file(source, self.compress)
+            except (OSError, ValueError) as e:
+                print(f"Log compression failed ({source}): {e}")
+                continue
+            with self.lock:
+                segment['file'] = os.path.basename(target)
+                segment['compressed_bytes'] = os.path.getsize(target)
+                segment['state'] = 'compressed'
+            self._save_manifest()
+
+    def _save_manifest(self, sync=False):
+        """Write the manifest atomically"""
+        with self.lock:
+            manifest = {
+                'version': 1,
+                'log': os.path.basename(self.base + self.ext),
+                'format': 'm2b' if is_binary_log(self.ext) else 'csv',
+                'compression': self.compress,
+                'max_bytes': self.max_bytes,
+                'max_seconds': self.max_seconds,
+                'updated': time.time(),
+                'segments': [dict(segment) for segment in self.segments],
+            }
+            temp = self.manifest_path + '.tmp'
+            with open(temp, 'w') as f:
+                json.dump(manifest, f, indent=1)
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp, self.manifest_path)
+
+
+def read_manifest(path):
+    """
+    Load the manifest of a segmented log
+
+    Args:
+        path: Manifest file or the logical log path (run.csv)
+
+    Returns:
+        Manifest dictionary; 'paths' lists the segment files in order
+    """
+    path = manifest_path(path)
+    with open(path) as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(path)
+    paths = []
+    for segment in manifest['segments']:
+        segment_path = os.path.join(directory, segment['file'])
+        if not os.path.exists(segment_path) and segment['state'] == 'closed' and manifest['compression']:
+            # Compressed after the manifest was read
+            segment_path += COMPRESSIONS[manifest['compression']]
+        paths.append(segment_path)
+    manifest['paths'] = paths
+    return manifest
+
+
+def iter_csv_lines(path):
+    """
+    Lines of a segmented CSV log as one stream: the header once, then
+    every segment's rows in order
+
+    Args:
+        path: Manifest file or the logical log path
+    """
+    header = None
+    for segment_path in read_manifest(path)['paths']:
+        with open_compressed(segment_path, 'rt') as f:
+            first = f.readline()
+            if header is None:
+                header = first
+                yield first
+            yield from f
+
+
+class CsvStream:
+    def __init__(self, path):
+        """
+        Read-only text stream over a segmented CSV log, for tools that take
+        an open file (readline() and iteration)
+
+        Args:
+            path: Manifest file or the logical log path
+        """
+        self.lines = iter_csv_lines(path)
+
+    def readline(self):
+        return next(self.lines, '')
+
+    def __iter__(self):
+        return self.lines
+
+    def close(self):
+        self.lines.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_binary(path):
+    """
+    Open each segment of a segmented binary log
+
+    Uncompressed segments are memory-mapped (no copy); compressed ones are
+    decompressed into memory one at a time
+
+    Yields:
+        m2000_binlog.BinaryLog per segment
+    """
+    for segment_path in read_manifest(path)['paths']:
+        base, ext = os.path.splitext(segment_path)
+        if ext in COMPRESSIONS.values():
+            with open_compressed(segment_path) as f:
+                yield BinaryLog(base, f.read())
+        else:
+            yield BinaryLog(segment_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M2000 segmented log tool')
+    parser.add_argument('log', help='Manifest or logical log path (run.csv / run.manifest.json)')
+    parser.add_argument('--cat', action='store_true',
+                       help='Write all segments to stdout as one CSV stream')
+
+    args = parser.parse_args()
+
+    manifest = read_manifest(args.log)
+    if args.cat:
+        if manifest['format'] == 'm2b':
+            for index, log in enumerate(iter_binary(args.log)):
+                log.export_csv(sys.stdout, header=index == 0)
+        else:
+            for line in iter_csv_lines(args.log):
+                sys.stdout.write(line)
+        return 0
+
+    print(f"{manifest['log']}: {len(manifest['segments'])} segments ({manifest['format']}, "
+          f"compression {manifest['compression'] or 'none'})")
+    print(f"{'#':>6} {'File':<32} {'State':<10} {'Rows':>10} {'Bytes':>12} {'Stored':>12}  Span")
+    for segment in manifest['segments']:
+        span = ''
+        if segment['start'] is not None:
+            start = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(segment['start']))
+            span = f"{start} +{segment['end'] - segment['start']:.1f}s"
+        stored = segment.get('compressed_bytes', segment['bytes'])
+        print(f"{segment['index']:>6} {segment['file']:<32} {segment['state']:<10} "
+              f"{segment['rows']:>10} {segment['bytes']:>12} {stored:>12}  {span}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,674 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Protocol Simulator
+Simulated M2000 on TCP port 10733 for development and benchmarking without
+an analyzer. Serves synthetic 3-phase measurements in NR3 format with
+configurable latency, jitter and transmission rate, to any number of
+concurrent clients.
+
+Supported commands: *RST, *CLS, *IDN?, *ERR?, READ? (RDEF fields),
+REREAD?, LOCAL, HARMS, HARMS?, HISTORYDATA?, HISTORYTIME?
+"""
+
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+import sys
+import argparse
+from functools import lru_cache
+
+
+IDN_RESPONSE = 'APS,M2000,SIM00001,1.0'
+
+MAX_COMMAND_SET = 4095
+MAX_RESPONSE = 65535
+NR3_UNAVAILABLE = '+0.00000E+0'
+NR3_ZERO = '+0.00000E-9'
+
+# *ERR? codes (manual 10.5)
+ERR_NOT_NOW = 1
+ERR_CONFIG = 2
+ERR_RANGE = 3
+ERR_SYNTAX = 4
+ERR_MISSING = 5
+ERR_UNEXPECTED = 6
+ERR_COMMAND = 7
+ERR_TOO_LONG = 8
+ERR_RX_OVERRUN = 10
+
+# RDEF sub-field keywords (manual 10.5.10), aliases mapped to one name
+DATA_KEYWORDS = {
+    'FREQ': 'FREQ', 'PERIOD': 'PERIOD', 'INTEGTIME': 'INTEGTIME',
+    'VOLTS': 'VOLTS', 'V': 'VOLTS', 'VPH-PH': 'VPH-PH',
+    'AMPS': 'AMPS', 'A': 'AMPS', 'WATTS': 'WATTS', 'W': 'WATTS', 'LOSS': 'LOSS',
+    'EFFICIENCY': 'EFFICIENCY', 'EFF': 'EFFICIENCY', 'VAR': 'VAR', 'VA': 'VA',
+    'PF': 'PF', 'PHASE': 'PHASE', 'LOADZ': 'LOADZ', 'ZLOAD': 'LOADZ',
+    'SERIESR': 'SERIESR', 'SERIESL': 'SERIESL', 'PARALLELR': 'PARALLELR',
+    'PARALLELC': 'PARALLELC', 'SPEED': 'SPEED', 'SLIP': 'SLIP', 'TORQUE': 'TORQUE',
+    'HP': 'HP', 'STBYTIME': 'STBYTIME', 'STBYERR': 'STBYERR',
+}
+SOURCE_KEYWORDS = {
+    'CH1': 'CH1', 'CH2': 'CH2', 'CH3': 'CH3', 'CH4': 'CH4',
+    'A1': 'VPA1', 'A2': 'VPA2', 'A3': 'VPA3', 'VPA1': 'VPA1', 'VPA2': 'VPA2', 'VPA3': 'VPA3',
+    'MOTOR': 'MOTOR', 'IN': 'IN', 'MIDDLE': 'MIDDLE', 'OUT': 'OUT',
+}
+SOURCE2_KEYWORDS = {
+    'MIDDLE', 'OUT', 'PA', 'PB', 'PC', 'PD', 'PAC', 'PAB', 'PBC', 'PN', 'WYE', 'DELTA',
+    'SEQZERO', 'SEQPOS', 'SEQNEG', 'TOTAL', 'AVERAGE',
+}
+TYPE_KEYWORDS = {
+    'DC', 'AC', 'ACDC', 'RMS', 'COUPLED', 'RECTIFIED', 'FF', 'CF', 'PK', 'VALLEY', 'PK-VLY',
+    'HIPK', 'LOPK', 'THDF', 'THDSIG', 'INRUSH', 'INRUSHPK', 'INRUSHVLY', 'INTEG', 'INTAVG',
+    'CHARGE', 'DISCHARGE', 'BOUGHT', 'SOLD', 'STBY', 'STBYMIN', 'STBYMAX', 'STBYCFMIN',
+    'STBYCFMAX', 'STBYTHDMAX', 'STBYSLOPE',
+}
+HARMONIC_TYPE = re.compile(r'^(H|P|%S|%)(\d{1,3})$')
+
+# Simulated wiring: VPA1 is 3-phase 4-wire on CH1-CH3, VPA2 is CH4, VPA3 is off
+VPA_CHANNELS = {'VPA1': ('CH1', 'CH2', 'CH3'), 'VPA2': ('CH4',), 'VPA3': ()}
+PHASE_CHANNELS = {'PA': 0, 'PB': 1, 'PC': 2, 'PD': 3}
+
+TERMINATORS = re.compile(rb'[\r\n\f\x00]')
+WHITESPACE = re.compile(r'[ \t_]')
+
+
+class CommandError(Exception):
+    def __init__(self, code, message=''):
+        """Interface command error with its *ERR? code"""
+        super().__init__(message or f"error {code}")
+        self.code = code
+
+
+def nr3(value):
+    """
+    Format a value as an 11-character NR3 field, e.g. +2.30450E+2
+
+    None (unavailable) becomes +0.00000E+0; a real zero is +0.00000E-9.
+    """
+    if value is None or value != value:
+        return NR3_UNAVAILABLE
+    if abs(value) < 1e-9:
+        return NR3_ZERO
+    text = f"{value:+.5E}"           # e.g. +2.30450E+02
+    exponent = int(text[9:])
+    if exponent > 9:
+        return '+9.99999E+9' if value > 0 else '-9.99999E+9'
+    if exponent < -9:
+        return NR3_ZERO
+    return f"{text[:9]}{'+' if exponent >= 0 else '-'}{abs(exponent)}"
+
+
+@lru_cache(maxsize=4096)
+def parse_rdef(field):
+    """
+    Parse an RDEF field such as 'ch1:VOLTS:ACDC' or 'WATTS:VPA1'
+
+    Sub-fields may come in any order; missing ones take the manual defaults
+    (AMPS, CH1, TOTAL, ACDC).
+
+    Returns:
+        (data, source, source2, mtype, harmonic) with harmonic None unless
+        mtype is one of H, P, %, %S
+    """
+    data = source = source2 = mtype = None
+    harmonic = None
+    for sub in WHITESPACE.sub('', field).upper().split(':'):
+        if not sub:
+            continue
+        if data is None and sub in DATA_KEYWORDS:
+            data = DATA_KEYWORDS[sub]
+        elif source is None and sub in SOURCE_KEYWORDS:
+            source = SOURCE_KEYWORDS[sub]
+        elif source2 is None and sub in SOURCE2_KEYWORDS:
+            source2 = sub
+        elif mtype is None and sub in TYPE_KEYWORDS:
+            mtype = 'ACDC' if sub == 'RMS' else sub
+        elif mtype is None and HARMONIC_TYPE.match(sub):
+            kind, number = HARMONIC_TYPE.match(sub).groups()
+            harmonic = int(number)
+            if not 1 <= harmonic <= 500:
+                raise CommandError(ERR_RANGE, f"harmonic out of range: {sub}")
+            mtype = kind
+        elif sub.isdigit():
+            continue  # Ending harmonic for harmonic lists - not simulated
+        else:
+            raise CommandError(ERR_SYNTAX, f"invalid RDEF sub-field: {sub}")
+    return data or 'AMPS', source or 'CH1', source2 or 'TOTAL', mtype or 'ACDC', harmonic
+
+
+class WaveformModel:
+    def __init__(self, voltage=230.0, current=10.0, frequency=60.0, update_period=0.01, seed=None):
+        """
+        Synthetic 3-phase system: slowly varying load, lagging power factor
+        and odd current harmonics, with a little measurement noise
+
+        Args:
+            voltage: Nominal phase voltage (V rms)
+            current: Nominal phase current (A rms)
+            frequency: Nominal line frequency (Hz)
+            update_period: Seconds between measurement updates (results are
+                           held in between, like the analyzer's update rate)
+            seed: Random seed for reproducible noise
+        """
+        self.voltage = voltage
+        self.current = current
+        self.frequency = frequency
+        self.update_period = update_period
+        self.rng = random.Random(seed)
+        self.start = time.monotonic()
+        self._snapshot_index = None
+        self._snapshot = None
+        self.lock = threading.Lock()
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def harmonic_ratio(self, signal, n):
+        """Harmonic n amplitude relative to the fundamental"""
+        if n == 1:
+            return 1.0
+        if n % 2 == 0:
+            return 0.0
+        if signal == 'VOLTS':
+            return 0.03 / n
+        return 0.3 / n if n <= 25 else 0.0
+
+    def thd(self, signal):
+        return math.sqrt(sum(self.harmonic_ratio(signal, n) ** 2 for n in range(3, 51, 2)))
+
+    def snapshot(self, t=None):
+        """Per-channel (volts, amps, phase_deg) and frequency, held for update_period"""
+        if t is None:
+            t = self.elapsed()
+        index = int(t / self.update_period) if self.update_period > 0 else t
+        with self.lock:
+            if index == self._snapshot_index:
+                return self._snapshot
+            rng = self.rng
+            frequency = self.frequency + 0.02 * math.sin(2 * math.pi * t / 30.0)
+            channels = {}
+            for k in range(3):
+                volts = self.voltage * (1 + 0.005 * math.sin(2 * math.pi * t / 7.0 + k)) + rng.gauss(0, 0.05)
+                amps = self.current * (1 + 0.3 * math.sin(2 * math.pi * t / 20.0 + 0.7 * k)) + rng.gauss(0, 0.01)
+                phase = 25.0 + 5.0 * math.sin(2 * math.pi * t / 45.0 + k)
+                channels[f'CH{k + 1}'] = (volts, amps, phase)
+            # CH4 measures the neutral: triplen harmonics add up, little voltage
+            neutral = 3 * self.harmonic_ratio('AMPS', 3) * sum(c[1] for c in channels.values()) / 3
+            channels['CH4'] = (0.5 + rng.gauss(0, 0.01), neutral, 0.0)
+            self._snapshot_index = index
+            self._snapshot = (channels, frequency)
+            return self._snapshot
+
+    def channel_value(self, channels, frequency, channel, data, mtype, harmonic):
+        volts, amps, phase = channels[channel]
+        # Fundamentals from the rms values (rms includes the harmonics)
+        v1 = volts / math.sqrt(1 + self.thd('VOLTS') ** 2)
+        a1 = amps / math.sqrt(1 + self.thd('AMPS') ** 2)
+        pf1 = math.cos(math.radians(phase))
+
+        if data in ('VOLTS', 'AMPS'):
+            rms, fundamental = (volts, v1) if data == 'VOLTS' else (amps, a1)
+            return self.signal_value(data, rms, fundamental, mtype, harmonic, phase)
+        if data == 'VPH-PH':
+            return volts * math.sqrt(3)
+        if data == 'WATTS':
+            if mtype == 'H':
+                # Only the fundamental carries significant power
+                return v1 * a1 * pf1 if harmonic == 1 else 0.0
+            return v1 * a1 * pf1
+        if data == 'VA':
+            return volts * amps
+        if data == 'VAR':
+            va, w = volts * amps, v1 * a1 * pf1
+            return math.sqrt(max(va * va - w * w, 0.0))
+        if data == 'PF':
+            return v1 * a1 * pf1 / (volts * amps) if volts * amps else None
+        if data == 'PHASE':
+            pf = v1 * a1 * pf1 / (volts * amps) if volts * amps else 1.0
+            return math.degrees(math.acos(max(-1.0, min(1.0, pf))))
+        if data == 'FREQ':
+            return frequency
+        if data == 'PERIOD':
+            return 1.0 / frequency
+        if data == 'LOADZ':
+            return volts / amps if amps else None
+        return None  # Motor, efficiency and standby results are not simulated
+
+    def signal_value(self, signal, rms, fundamental, mtype, harmonic, phase):
+        crest = math.sqrt(2) * (1 + (self.thd(signal) if signal == 'AMPS' else 0.0))
+        if mtype in ('ACDC', 'AC', 'COUPLED', 'TOTAL'):
+            return rms
+        if mtype == 'DC':
+            return 0.001 * rms
+        if mtype == 'RECTIFIED':
+            return rms * 0.9003
+        if mtype == 'FF':
+            return math.pi / (2 * math.sqrt(2))
+        if mtype == 'CF':
+            return crest
+        if mtype in ('PK', 'HIPK'):
+            return rms * crest
+        if mtype in ('VALLEY', 'LOPK'):
+            return -rms * crest
+        if mtype == 'PK-VLY':
+            return 2 * rms * crest
+        if mtype == 'THDF':
+            return 100.0 * self.thd(signal)
+        if mtype == 'THDSIG':
+            thd = self.thd(signal)
+            return 100.0 * thd / math.sqrt(1 + thd * thd)
+        if mtype == 'H':
+            return fundamental * self.harmonic_ratio(signal, harmonic)
+        if mtype == 'P':
+            if not self.harmonic_ratio(signal, harmonic):
+                return 0.0
+            return (-phase * harmonic if signal == 'AMPS' else 0.0) % 360.0
+        if mtype == '%':
+            return 100.0 * self.harmonic_ratio(signal, harmonic)
+        if mtype == '%S':
+            return 100.0 * self.harmonic_ratio(signal, harmonic) * fundamental / rms
+        return None
+
+    def value(self, rdef, t=None, max_harmonic=500):
+        """
+        Measurement result for a parsed RDEF
+
+        Returns:
+            float, or None if the result is not available
+        """
+        data, source, source2, mtype, harmonic = rdef
+        if harmonic is not None and harmonic > max_harmonic:
+            return None
+        channels, frequency = self.snapshot(t)
+
+        if source in ('CH1', 'CH2', 'CH3', 'CH4'):
+            return self.channel_value(channels, frequency, source, data, mtype, harmonic)
+
+        members = VPA_CHANNELS.get(source)
+        if not members:
+            return None  # VPA3, MOTOR and efficiency groups are not configured
+        if source2 in PHASE_CHANNELS:
+            index = PHASE_CHANNELS[source2]
+            if index >= len(members):
+                return None
+            return self.channel_value(channels, frequency, members[index], data, mtype, harmonic)
+        if source2 in ('PAB', 'PBC', 'PAC'):
+            if data != 'VOLTS' or len(members) < 3:
+                return None
+            return channels[members[0]][0] * math.sqrt(3)
+        if source2 == 'PN':
+            return channels['CH4'][1] if data == 'AMPS' else None
+
+        values = [self.channel_value(channels, frequency, ch, data, mtype, harmonic) for ch in members]
+        if any(v is None for v in values):
+            return None
+        if data in ('WATTS', 'VA', 'VAR'):
+            return sum(values)
+        if data in ('PF', 'PHASE'):
+            w = sum(self.channel_value(channels, frequency, ch, 'WATTS', 'ACDC', None) for ch in members)
+            va = sum(self.channel_value(channels, frequency, ch, 'VA', 'ACDC', None) for ch in members)
+            pf = w / va if va else 1.0
+            return pf if data == 'PF' else math.degrees(math.acos(max(-1.0, min(1.0, pf))))
+        return sum(values) / len(values)
+
+
+class M2000Simulator:
+    def __init__(self, model=None):
+        """
+        Instrument state shared by all interfaces
+
+        Args:
+            model: WaveformModel (default: 230 V / 10 A / 60 Hz)
+        """
+        self.model = model or WaveformModel()
+        self.reset()
+
+    def reset(self):
+        """*RST: default configuration"""
+        self.harms = {'VPA1': 100, 'VPA2': 100, 'VPA3': 100}  # Highest harmonic per VPA
+
+    def max_harmonic(self, source):
+        for vpa, members in VPA_CHANNELS.items():
+            if source == vpa or source in members:
+                return self.harms[vpa]
+        return 500
+
+    def session(self):
+        """Interface state for one connection (error register, last READ?)"""
+        return M2000Session(self)
+
+
+class M2000Session:
+    def __init__(self, simulator):
+        """One interface connection: own error register and REREAD? state"""
+        self.simulator = simulator
+        self.error = 0
+        self.last_read = None  # Parsed RDEF fields of the last READ? command set
+        self.set_reads = []    # RDEF fields of the READ? commands in the current set
+        self.local = False
+        self.commands = 0
+
+    def set_error(self, code):
+        # The register holds the highest error since it was last read
+        self.error = max(self.error, code)
+
+    def execute(self, command_set):
+        """
+        Execute one command set (everything up to a terminator)
+
+        Returns:
+            Response string without terminator, or None if nothing was queried
+        """
+        if len(command_set) > MAX_COMMAND_SET:
+            self.set_error(ERR_RX_OVERRUN)
+            return None
+
+        responses = []
+        self.set_reads = []
+        for command in command_set.split(';'):
+            command = command.strip()
+            if not command:
+                continue
+            self.commands += 1
+            try:
+                result = self.execute_command(command)
+            except CommandError as e:
+                # The failing command and the rest of the set are not executed
+                self.set_error(e.code)
+                break
+            if result is not None:
+                responses.append(result)
+
+        if not responses:
+            return None
+        response = ','.join(responses)
+        if len(response) > MAX_RESPONSE:
+            self.set_error(ERR_TOO_LONG)
+            return None
+        return response
+
+    def execute_command(self, command):
+        fields = command.split(',')
+        keyword = WHITESPACE.sub('', fields[0]).upper()
+        args = fields[1:]
+        self.local = False
+
+        if keyword == 'READ?':
+            if not args:
+                raise CommandError(ERR_MISSING, "READ? needs at least one RDEF field")
+            fields = tuple(parse_rdef(field) for field in args)
+            # REREAD? repeats every READ? of the set, not just the last one
+            self.set_reads.extend(fields)
+            self.last_read = tuple(self.set_reads)
+            return self.read(fields)
+        if keyword == 'REREAD?':
+            if args:
+                raise CommandError(ERR_UNEXPECTED)
+            if self.last_read is None:
+                raise CommandError(ERR_NOT_NOW, "REREAD? before READ?")
+            return self.read(self.last_read)
+        if keyword == '*IDN?':
+            return IDN_RESPONSE
+        if keyword == '*ERR?':
+            error, self.error = self.error, 0
+            return str(error)
+        if keyword == '*RST':
+            self.simulator.reset()
+            self.last_read = None
+            return None
+        if keyword == '*CLS':
+            self.error = 0
+            return None
+        if keyword == 'LOCAL':
+            self.local = True
+            return None
+        if keyword == 'HARMS':
+            vpa, harmonic = self.vpa_arg(args, 2), self.int_arg(args[1], 0, 500)
+            self.simulator.harms[vpa] = harmonic
+            return None
+        if keyword == 'HARMS?':
+            return str(self.simulator.harms[self.vpa_arg(args, 1)])
+        if keyword == 'HISTORYTIME?':
+            return nr3(self.simulator.model.elapsed())
+        if keyword == 'HISTORYDATA?':
+            return self.history(args)
+        raise CommandError(ERR_COMMAND, f"unknown command {keyword}")
+
+    def vpa_arg(self, args, count):
+        if len(args) != count:
+            raise CommandError(ERR_MISSING if len(args) < count else ERR_UNEXPECTED)
+        vpa = WHITESPACE.sub('', args[0]).upper()
+        vpa = SOURCE_KEYWORDS.get(vpa, f"VPA{vpa}" if vpa in ('1', '2', '3') else None)
+        if vpa not in self.simulator.harms:
+            raise CommandError(ERR_SYNTAX, f"invalid VPA {args[0]}")
+        return vpa
+
+    @staticmethod
+    def int_arg(text, low, high):
+        try:
+            value = int(text.strip())
+        except ValueError:
+            raise CommandError(ERR_SYNTAX, f"invalid number {text}")
+        if not low <= value <= high:
+            raise CommandError(ERR_RANGE, f"{value} outside {low}..{high}")
+        return value
+
+    @staticmethod
+    def float_arg(text):
+        try:
+            return float(text.strip())
+        except ValueError:
+            raise CommandError(ERR_SYNTAX, f"invalid number {text}")
+
+    def read(self, rdefs):
+        model = self.simulator.model
+        t = model.elapsed()
+        return ','.join(nr3(model.value(rdef, t, self.simulator.max_harmonic(rdef[1])))
+                        for rdef in rdefs)
+
+    def history(self, args):
+        """HISTORYDATA?,n,start,end,def - n points of 1/0,max,avg,min"""
+        if len(args) != 4:
+            raise CommandError(ERR_MISSING if len(args) < 4 else ERR_UNEXPECTED)
+        n = self.int_arg(args[0], 2, 1024)
+        start, end = self.float_arg(args[1]), self.float_arg(args[2])
+        if start < 0 or end <= start:
+            raise CommandError(ERR_RANGE, "history range")
+        rdef = parse_rdef(args[3])
+        model = self.simulator.model
+        collected = model.elapsed()
+
+        points = []
+        for i in range(n):
+            t = start + (end - start) * i / (n - 1)
+            value = model.value(rdef, t) if t <= collected else None
+            if value is None:
+                points.append(f"0,{NR3_UNAVAILABLE},{NR3_UNAVAILABLE},{NR3_UNAVAILABLE}")
+            else:
+                spread = abs(value) * 0.01
+                points.append(f"1,{nr3(value + spread)},{nr3(value)},{nr3(value - spread)}")
+        return ','.join(points)
+
+
+class SimulatorServer:
+    def __init__(self, host='127.0.0.1', port=10733, simulator=None, latency=0.0, jitter=0.0,
+                 command_latency=None, byte_rate=0, seed=None):
+        """
+        TCP server speaking the M2000 LAN protocol
+
+        Args:
+            host: Address to listen on
+            port: TCP port (0 = pick a free port, see .port after start)
+            simulator: Shared M2000Simulator (default: a new one)
+            latency: Seconds before each response
+            jitter: Extra random delay, uniform 0..jitter seconds
+            command_latency: {keyword: seconds} overriding latency, e.g. {'READ?': 0.005}
+            byte_rate: Response transmission rate in bytes/s (0 = unlimited)
+            seed: Random seed for jitter and measurement noise
+        """
+        self.host = host
+        self.port = port
+        self.simulator = simulator or M2000Simulator(WaveformModel(seed=seed))
+        self.latency = latency
+        self.jitter = jitter
+        self.command_latency = {k.upper(): v for k, v in (command_latency or {}).items()}
+        self.byte_rate = byte_rate
+        self.rng = random.Random(seed)
+        self.server = None
+        self.loop = None
+        self.thread = None
+        self.writers = set()
+        self.clients = 0
+        self.connections = 0
+        self.responses = 0
+
+    def response_delay(self, command_set, response):
+        keyword = WHITESPACE.sub('', command_set.split(';', 1)[0].split(',', 1)[0]).upper()
+        delay = self.command_latency.get(keyword, self.latency)
+        if self.jitter:
+            delay += self.rng.uniform(0, self.jitter)
+        if self.byte_rate:
+            delay += (len(response) + 2) / self.byte_rate
+        return delay
+
+    async def handle_client(self, reader, writer):
+        session = self.simulator.session()
+        self.writers.add(writer)
+        self.clients += 1
+        self.connections += 1
+        pending = b''
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                parts = TERMINATORS.split(pending + data)
+                pending = parts.pop()  # Incomplete command set
+                if len(pending) > MAX_COMMAND_SET:
+                    session.set_error(ERR_RX_OVERRUN)
+                    pending = b''
+
+                for part in parts:
+                    if not part:
+                        continue
+                    command_set = part.decode('ascii', 'replace')
+                    response = session.execute(command_set)
+                    if response is None:
+                        continue
+                    delay = self.response_delay(command_set, response)
+                    if delay > 0:
+                        await writer.drain()
+                        await asyncio.sleep(delay)
+                    writer.write(response.encode('ascii') + b'\r\n')
+                    self.responses += 1
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients -= 1
+            self.writers.discard(writer)
+            writer.close()
+
+    async def start(self):
+        """Start listening; returns the bound port"""
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port,
+                                                 reuse_address=True, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        """Stop listening and close all client connections"""
+        if self.server:
+            self.server.close()
+            self.server = None
+        for writer in list(self.writers):
+            writer.close()
+
+    def start_in_thread(self):
+        """Run the server on a background event loop thread; returns the bound port"""
+        started = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.start())
+            started.set()
+            self.loop.run_forever()
+            # Stopped: close the listener and every client connection
+            self.loop.run_until_complete(self.close())
+            tasks = asyncio.all_tasks(self.loop)
+            if tasks:
+                self.loop.run_until_complete(asyncio.wait(tasks, timeout=1.0))
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name='M2000Simulator', daemon=True)
+        self.thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self):
+        """Stop a server started with start_in_thread()"""
+        if self.loop and self.thread:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+
+def parse_command_latency(items):
+    """Parse ['READ?=5', 'REREAD?=1'] (milliseconds) into {keyword: seconds}"""
+    latency = {}
+    for item in items or []:
+        keyword, _, ms = item.partition('=')
+        latency[keyword.strip().upper()] = float(ms) / 1000.0
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description='APS M2000 protocol simulator (LAN)')
+    parser.add_argument('--host', default='127.0.0.1',
+                       help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=10733,
+                       help='TCP port (default: 10733)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                       help='Response latency in ms (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                       help='Extra random latency 0..JITTER ms (default: 0)')
+    parser.add_argument('--command-latency', nargs='+', metavar='KEYWORD=MS',
+                       help='Per-command latency, e.g. READ?=5 REREAD?=1')
+    parser.add_argument('--byte-rate', type=float, default=0,
+                       help='Response transmission rate in bytes/s, 0 = unlimited (default: 0)')
+    parser.add_argument('--voltage', type=float, default=230.0,
+                       help='Nominal phase voltage (default: 230)')
+    parser.add_argument('--current', type=float, default=10.0,
+                       help='Nominal phase current (default: 10)')
+    parser.add_argument('--frequency', type=float, default=60.0,
+                       help='Nominal line frequency (default: 60)')
+    parser.add_argument('--seed', type=int,
+                       help='Random seed for reproducible noise and jitter')
+
+    args = parser.parse_args()
+
+    model = WaveformModel(args.voltage, args.current, args.frequency, seed=args.seed)
+    server = SimulatorServer(args.host, args.port, M2000Simulator(model),
+                             latency=args.latency / 1000.0, jitter=args.jitter / 1000.0,
+                             command_latency=parse_command_latency(args.command_latency),
+                             byte_rate=args.byte_rate, seed=args.seed)
+
+    async def run():
+        port = await server.start()
+        print(f"M2000 simulator listening on {args.host}:{port}")
+        print("Press Ctrl+C to stop\n")
+        await asyncio.Future()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print(f"\nSimulator stopped: {server.connections} connections, {server.responses} responses")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+APS M2000 Power Analyzer - Transport Instrumentation
+Per-keyword latency histograms (send, wait for first byte, rest of reply,
+parse) plus byte, timeout and retry counters for the LAN, RS232 and USB
+interfaces. Instrumentation is off by default; enable_stats() on an
+interface swaps in timed send/read methods, so the untimed path is unchanged.
+"""
+
+import json
+import math
+import time
+from collections import deque
+
+
+# Log-linear buckets as in HdrHistogram: exact below 2**SUB_BITS ns, then
+# 2**(SUB_BITS - 1) linear sub-buckets per power of two (~1.6% precision)
+SUB_BITS = 7
+SUB_COUNT = 1 << SUB_BITS
+
+# Phases of one query, in the order they happen
+PHASES = ('send', 'wait', 'reply', 'parse', 'total')
+
+
+def _bucket_index(value):
+    if value < SUB_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BITS
+    return (shift << (SUB_BITS - 1)) + (value >> shift)
+
+
+def _bucket_upper(index):
+    """Highest value that falls into a bucket"""
+    if index < SUB_COUNT:
+        return index
+    shift = (index >> (SUB_BITS - 1)) - 1
+    sub = index - (shift << (SUB_BITS - 1))
+    return ((sub + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self):
+        """Sparse log-linear histogram of durations in nanoseconds"""
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, ns):
+        """Add one duration in nanoseconds"""
+        ns = max(0, int(ns))
+        index = _bucket_index(ns)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+
+    def merge(self, other):
+        """Add the counts of another histogram"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        """Duration in nanoseconds at or below which p percent of the values fall"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        """Summary in milliseconds"""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count / 1e6,
+            'min_ms': self.min / 1e6,
+            'p50_ms': self.percentile(50) / 1e6,
+            'p90_ms': self.percentile(90) / 1e6,
+            'p99_ms': self.percentile(99) / 1e6,
+            'p999_ms': self.percentile(99.9) / 1e6,
+            'max_ms': self.max / 1e6,
+        }
+
+
+def command_keyword(data):
+    """Keyword of a command for grouping, e.g. b'READ?,ch1:VOLTS:ACDC\\n' -> 'READ?'"""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode('ascii', 'replace')
+    first = data.lstrip().split('\n', 1)[0]
+    return first.split(',', 1)[0].split(';', 1)[0].strip().upper()
+
+
+class TransportStats:
+    def __init__(self, interface=''):
+        """
+        Counters and latency histograms for one interface
+
+        Args:
+            interface: Label for reports ('lan', 'rs232', 'usb')
+        """
+        self.interface = interface
+        self.in_flight = deque()  # (keyword, send_start_ns, send_end_ns) awaiting a reply
+        self.reset()
+
+    def reset(self):
+        """Clear all counters and histograms"""
+        self.started = time.time()
+        self.keywords = {}  # keyword -> {phase: LatencyHistogram}
+        self.queries = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.in_flight.clear()
+
+    def _histograms(self, keyword):
+        histograms = self.keywords.get(keyword)
+        if histograms is None:
+            histograms = {phase: LatencyHistogram() for phase in PHASES}
+            self.keywords[keyword] = histograms
+        return histograms
+
+    def sent(self, data, start_ns, end_ns):
+        """Record a command write; queries (keyword ending in '?') await a reply"""
+        self.bytes_out += len(data)
+        keyword = command_keyword(data)
+        if keyword.endswith('?'):
+            self.in_flight.append((keyword, start_ns, end_ns))
+        else:
+            self._histograms(keyword)['send'].record(end_ns - start_ns)
+
+    def received(self, nbytes, first_ns, end_ns):
+        """
+        Record a complete reply to the oldest query in flight
+
+        send = writing the command, wait = until the first reply byte was
+        seen, reply = rest of the reply, total = send start to reply end.
+        """
+        self.bytes_in += nbytes
+        if not self.in_flight:
+            return
+        keyword, start_ns, sent_ns = self.in_flight.popleft()
+        first_ns = max(first_ns, sent_ns)
+        histograms = self._histograms(keyword)
+        histograms['send'].record(sent_ns - start_ns)
+        histograms['wait'].record(first_ns - sent_ns)
+        histograms['reply'].record(end_ns - first_ns)
+        histograms['total'].record(end_ns - start_ns)
+        self.queries += 1
+
+    def parsed(self, keyword, ns):
+        """Record time spent parsing a response on the host"""
+        self._histograms(keyword)['parse'].record(ns)
+
+    def timeout(self):
+        """Record a read timeout; replies still in flight are abandoned"""
+        self.timeouts += 1
+        self.in_flight.clear()
+
+    def retry(self):
+        """Record a resync or reconnect"""
+        self.retries += 1
+        self.in_flight.clear()
+
+    def to_dict(self):
+        """All statistics as a JSON-serializable dictionary"""
+        return {
+            'interface': self.interface,
+            'since': self.started,
+            'queries': self.queries,
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in,
+            'timeouts': self.timeouts,
+            'retries': self.retries,
+            'keywords': {keyword: {phase: histogram.to_dict()
+                                   for phase, histogram in histograms.items() if histogram.count}
+                         for keyword, histograms in list(self.keywords.items())},
+        }
+
+    def to_json(self, indent=None):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def summary(self):
+        """Multi-line table: per keyword and phase count, mean, p50, p99 and max in ms"""
+        lines = [f"{self.interface.upper()} transport: {self.queries} queries, "
+                 f"{self.bytes_out} bytes out, {self.bytes_in} bytes in, "
+                 f"{self.timeouts} timeouts, {self.retries} retries",
+                 f"{'Keyword':<12} {'Phase':<6} {'Count':>7} {'Mean':>9} {'p50':>9} "
+                 f"{'p99':>9} {'Max':>9}  (ms)"]
+        for keyword, histograms in sorted(self.keywords.items()):
+            for phase in PHASES:
+                h = histograms[phase]
+                if not h.count:
+                    continue
+                d = h.to_dict()
+                lines.append(f"{keyword:<12} {phase:<6} {d['count']:>7} {d['mean_ms']:>9.3f} "
+                             f"{d['p50_ms']:>9.3f} {d['p99_ms']:>9.3f} {d['max_ms']:>9.3f}")
+        return "\n".join(lines)
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    import random
+
+    print("=== Latency Histogram Test ===")
+    rng = random.Random(1)
+    values = [int(rng.lognormvariate(13.5, 0.6)) for _ in range(100000)]  # ~1 ms round trips
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for p in (50, 90, 99, 99.9):
+        exact = values[math.ceil(len(values) * p / 100) - 1]
+        print(f"p{p:<5} histogram {histogram.percentile(p) / 1e6:8.4f} ms  exact {exact / 1e6:8.4f} ms")
+    print(f"buckets used: {len(histogram.counts)}")
+
+    print("\n=== Transport Stats Test ===")
+    stats = TransportStats('lan')
+    t = time.monotonic_ns()
+    stats.sent(b'READ?,ch1:VOLTS:ACDC\n', t, t + 20000)
+    stats.received(13, t + 900000, t + 950000)
+    stats.parsed('READ?', 4000)
+    print(stats.summary())
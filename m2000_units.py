@@ -26,6 +26,10 @@ def format_measurement(value, parameter, include_units=True):
     except (ValueError, TypeError):
         return str(value)
     
+    # Unavailable data (+0.00000E+0) is decoded as NaN
+    if val != val:
+        return "N/A"
+    
     # Handle special parameters without units
     if parameter in ['PF']:  # Power Factor is dimensionless
         return f"{val:.4f}"
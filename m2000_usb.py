@@ -10,10 +10,28 @@ import time
 import sys
 import argparse
 import struct
+import threading
+import queue
+
+from m2000_framing import LineBuffer
+from m2000_plan import compile_plan, pack_reads
+from m2000_schedule import DeadlineScheduler, POLICIES, measure_rate, parse_rate
+from m2000_stats import TransportStats
+
+
+# The M2000 uses 64-byte HID reports; the first byte is the report ID
+REPORT_SIZE = 64
+REPORT_PAYLOAD = REPORT_SIZE - 1
+ZERO_PAD = bytes(REPORT_PAYLOAD)
+
+
+def expects_response(command):
+    """True if a command set contains a query (a keyword ending in '?')"""
+    return any(part.split(',', 1)[0].strip().endswith('?') for part in command.split(';'))
 
 
 class M2000_USB:
-    def __init__(self, vid=4292, pid=34869, timeout=5000):
+    def __init__(self, vid=4292, pid=34869, timeout=5000, reader_thread=False):
         """
         Initialize USB HID connection to M2000 Power Analyzer
         
@@ -21,26 +39,67 @@ class M2000_USB:
             vid: Vendor ID (4292 for APS M2000)
             pid: Product ID (34869 for APS M2000)
             timeout: Read timeout in milliseconds
+            reader_thread: Read input reports on a background thread into a
+                           response queue (see start_reader())
         """
         self.vid = vid
         self.pid = pid
         self.timeout = timeout
+        self.reader_thread = reader_thread
         self.device = None
         self.connected = False
+        self.rx = LineBuffer(REPORT_SIZE)  # Keeps partial lines across reports
+        self.report = bytearray(REPORT_SIZE)  # Reused for every output report (ID 0)
+        self.queued = []                   # Commands waiting to share the next write
+        self.reports_sent = 0
+        self.reader = None                 # Background reader thread, if running
+        self.reader_running = False
+        self.responses = None              # Queue of response lines from the reader
+        self.last_read_command = None  # Re-sent by a warm connect so REREAD? keeps working
+        self.time_to_first_sample = None
+        self.stats = None  # TransportStats while instrumentation is enabled
+        self._first_report_ns = None
+        
+    def enable_stats(self, stats=None):
+        """
+        Turn on per-query instrumentation (see m2000_stats)
+        
+        Swaps in timed send/read methods; with stats off the plain methods
+        run unchanged.
         
+        Returns:
+            TransportStats collecting latency histograms and counters
+        """
+        self.stats = stats if stats is not None else TransportStats('usb')
+        self.send_raw = self._send_raw_timed
+        self.read_response = self._read_response_timed
+        self._read_report = self._read_report_timed
+        return self.stats
+    
+    def disable_stats(self):
+        """Turn off instrumentation, restoring the plain send/read methods"""
+        for name in ('send_raw', 'read_response', '_read_report'):
+            self.__dict__.pop(name, None)
+        self.stats = None
+    
     def list_devices(self):
         """List all M2000 USB devices"""
         devices = hid.enumerate(self.vid, self.pid)
         return devices
     
-    def connect(self, device_index=0):
+    def connect(self, device_index=0, warm=False):
         """
         Establish USB HID connection
         
         Args:
             device_index: Index of device to connect to (0 for first device)
+            warm: Skip *RST/*CLS and the settling delays so the instrument keeps its
+                  configuration. The link is checked with a single query: the last
+                  READ? command if there was one (so REREAD? can resume at once),
+                  otherwise *IDN?
         """
         try:
+            connect_start = time.perf_counter()
             # List available devices
             devices = self.list_devices()
             if not devices:
@@ -62,29 +121,48 @@ class M2000_USB:
             self.device = hid.device()
             self.device.open(self.vid, self.pid)
             
-            # Set read timeout
+            # Blocking reads; each read passes its own timeout
             self.device.set_nonblocking(False)
+            self.rx.clear()
             
-            # Wait for connection to stabilize
-            time.sleep(0.2)
+            self.connected = True  # Device is open - allow commands during initialization
+            if self.reader_thread:
+                self.start_reader()
             
-            # Initialize device using correct M2000 protocol
-            self.send_command('*RST')  # Reset device - no response
-            self.send_command('*CLS')  # Clear device - no response
-            time.sleep(0.1)
-            
-            # Check connection with query (queries return responses)
-            response = self.query('*IDN?')
+            if warm and self.last_read_command:
+                # Re-arm REREAD? with the last READ?; its reply is the first sample
+                response = self.query(self.last_read_command)
+                alive = bool(response)
+            else:
+                if not warm:
+                    # Wait for connection to stabilize
+                    time.sleep(0.2)
+                    
+                    # Initialize device using correct M2000 protocol
+                    # Reset and clear device - no responses, one HID report
+                    self.send_many(['*RST', '*CLS'])
+                    time.sleep(0.1)
+                
+                # Check connection with query (queries return responses)
+                response = self.query('*IDN?')
+                alive = bool(response) and 'APS' in response
             
-            if response and 'APS' in response:
-                self.connected = True
-                print(f"Connected to: {response}")
+            if alive:
+                self.time_to_first_sample = time.perf_counter() - connect_start
+                if warm:
+                    print(f"Warm connect: first response after {self.time_to_first_sample * 1000:.1f} ms")
+                else:
+                    print(f"Connected to: {response}")
                 return True
             else:
                 print(f"Unexpected response: {response}")
+                self.stop_reader()
+                self.connected = False
                 return False
                 
         except Exception as e:
+            self.stop_reader()
+            self.connected = False
             print(f"USB connection failed: {e}")
             print("Make sure:")
             print("1. M2000 is powered on and USB cable connected")
@@ -100,86 +178,212 @@ class M2000_USB:
                 if self.connected:
                     self.send_command('LOCAL')  # Return to local control
                     time.sleep(0.1)
-                self.device.close()
             except:
                 pass
             finally:
+                # Join the reader before closing: it may be inside hid read() on this handle
+                self.stop_reader()
+                try:
+                    self.device.close()
+                except:
+                    pass
                 self.connected = False
                 self.device = None
                 print("USB connection closed")
     
     def send_command(self, command):
         """Send command to M2000 via USB HID"""
+        self.send_many([command])
+    
+    def queue_command(self, command):
+        """
+        Hold a command back until the next send, so it shares that write's
+        HID reports (e.g. settings queued ahead of the next query)
+        """
+        self.queued.append(command)
+    
+    def send_many(self, commands):
+        """
+        Send several commands packed into as few 64-byte HID reports as possible
+        
+        Each command stays its own LF-terminated command set, so queries
+        still get one response line each. Queued commands go first.
+        
+        Args:
+            commands: List of command strings
+        
+        Returns:
+            Number of HID reports written
+        """
         if not self.connected or not self.device:
             raise Exception("Not connected to M2000")
         
+        if self.queued:
+            commands = self.queued + list(commands)
+            self.queued = []
+        for command in commands:
+            if command[:5].upper() == 'READ?':
+                self.last_read_command = command
+        
+        # Add line feed terminators and encode to ASCII
+        data = ''.join([command + '\n' for command in commands]).encode('ascii')
+        self.send_raw(data)
+        return -(-len(data) // REPORT_PAYLOAD)
+    
+    def query_many(self, commands):
+        """
+        Send several commands in as few reports as possible, then read the replies
+        
+        Returns:
+            List with the response (or None for commands without a query) per command
+        """
+        self.send_many(commands)
+        return [self.read_response() if expects_response(command) else None
+                for command in commands]
+    
+    def send_raw(self, cmd_bytes):
+        """Send pre-encoded command bytes (including terminators) as HID reports"""
         try:
-            # Add line feed terminator and encode to ASCII
-            cmd_str = command + '\n'
-            cmd_bytes = cmd_str.encode('ascii')
-            
-            # USB HID requires specific packet format
-            # The M2000 uses 64-byte HID reports
-            packet_size = 64
+            report = self.report
+            write = self.device.write
+            data = memoryview(cmd_bytes)
             
-            # Send data in chunks if necessary
-            for i in range(0, len(cmd_bytes), packet_size - 1):
-                chunk = cmd_bytes[i:i + packet_size - 1]
+            # Fill the preallocated report in place; hidapi copies it on write
+            for i in range(0, len(data), REPORT_PAYLOAD):
+                chunk = data[i:i + REPORT_PAYLOAD]
+                n = len(chunk)
+                report[1:n + 1] = chunk
+                if n < REPORT_PAYLOAD:
+                    report[n + 1:] = ZERO_PAD[n:]
                 
-                # Create HID report (first byte is report ID, usually 0)
-                report = [0] + list(chunk) + [0] * (packet_size - len(chunk) - 1)
-                
-                # Send the report
-                bytes_written = self.device.write(report)
-                if bytes_written < 0:
+                if write(report) < 0:
                     raise Exception("USB write failed")
+                self.reports_sent += 1
             
         except Exception as e:
             print(f"Send command error: {e}")
             raise
     
+    def _send_raw_timed(self, cmd_bytes):
+        start = time.monotonic_ns()
+        M2000_USB.send_raw(self, cmd_bytes)
+        end = time.monotonic_ns()
+        # One entry per command, so each queued query is matched to its reply
+        for line in bytes(cmd_bytes).split(b'\n'):
+            if line:
+                self.stats.sent(line + b'\n', start, end)
+    
+    def _read_report(self, timeout_ms):
+        """Read one HID report (empty if none arrived within timeout_ms)"""
+        return self.device.read(REPORT_SIZE, timeout_ms)
+    
+    def _read_report_timed(self, timeout_ms):
+        data = self.device.read(REPORT_SIZE, timeout_ms)
+        if data and self._first_report_ns is None:
+            self._first_report_ns = time.monotonic_ns()
+        return data
+    
+    def _read_response_timed(self):
+        self._first_report_ns = None
+        response = M2000_USB.read_response(self)
+        end = time.monotonic_ns()
+        if response is None:
+            self.stats.timeout()
+        else:
+            self.stats.received(len(response) + 2, self._first_report_ns or end, end)
+        return response
+    
+    def _next_frame(self, timeout):
+        """Read reports until a complete line is buffered; the HID read itself waits"""
+        rx = self.rx
+        if rx.pending:
+            frame = rx.next_frame()
+            if frame is not None:
+                return frame
+        
+        deadline = time.monotonic() + timeout
+        remaining = timeout
+        while remaining > 0:
+            data = self._read_report(max(1, int(remaining * 1000)))
+            if data:
+                rx.feed_report(data)
+                frame = rx.next_frame()
+                if frame is not None:
+                    return frame
+            remaining = deadline - time.monotonic()
+        raise Exception("Read timeout")
+    
+    def _next_frame_queued(self, timeout):
+        """Take the next line from the reader thread's queue"""
+        try:
+            item = self.responses.get(timeout=timeout)
+        except queue.Empty:
+            raise Exception("Read timeout")
+        if isinstance(item, Exception):
+            raise item
+        return item
+    
     def read_response(self):
         """Read response from M2000 via USB HID"""
         if not self.connected or not self.device:
             raise Exception("Not connected to M2000")
         
         try:
-            response = ""
-            start_time = time.time()
-            
-            while True:
-                # Check timeout
-                if (time.time() - start_time) * 1000 > self.timeout:
-                    raise Exception("Read timeout")
-                
-                # Read HID report
-                try:
-                    data = self.device.read(64, timeout_ms=100)
-                    if not data:
-                        continue
-                        
-                    # Extract ASCII data (skip report ID at index 0)
-                    for byte_val in data[1:]:
-                        if byte_val == 0:  # Null terminator
-                            break
-                        elif byte_val == 10:  # Line feed - end of response
-                            return response
-                        elif byte_val == 13:  # Carriage return - skip
-                            continue
-                        elif 32 <= byte_val <= 126:  # Printable ASCII
-                            response += chr(byte_val)
-                        else:
-                            break  # Invalid character
-                            
-                except Exception as read_error:
-                    # No data available yet, continue waiting
-                    time.sleep(0.01)
-                    continue
-            
+            return self._next_frame(self.timeout / 1000.0).decode('ascii', 'replace')
         except Exception as e:
             print(f"Read response error: {e}")
             return None
     
+    def start_reader(self):
+        """
+        Read input reports on a background thread
+        
+        Complete response lines go to a queue that read_response() takes
+        from, so reports are drained as they arrive, even while the caller
+        is busy parsing or logging.
+        """
+        if self.reader is not None:
+            return
+        self.responses = queue.Queue()
+        self.rx.clear()
+        self.reader_running = True
+        self.reader = threading.Thread(target=self._reader_loop, name='M2000_USB reader', daemon=True)
+        self._next_frame = self._next_frame_queued
+        self.reader.start()
+    
+    def stop_reader(self):
+        """Stop the background reader; read_response() reads reports directly again"""
+        if self.reader is None:
+            return
+        self.reader_running = False
+        self.reader.join(timeout=1.0)
+        self.reader = None
+        self.__dict__.pop('_next_frame', None)
+        self.rx.clear()
+    
+    def _reader_loop(self):
+        rx = self.rx
+        responses = self.responses
+        while self.reader_running:
+            try:
+                data = self._read_report(100)  # Short timeout so stop_reader() is noticed
+            except Exception as e:
+                # Device gone - fall back to direct reads (which fail too) so later
+                # read_response() calls see the error instead of waiting on this queue,
+                # and hand the error to a caller already waiting
+                self.reader_running = False
+                self.reader = None
+                self.__dict__.pop('_next_frame', None)
+                responses.put(e)
+                return
+            if not data:
+                continue
+            rx.feed_report(data)
+            frame = rx.next_frame()
+            while frame is not None:
+                responses.put(frame)
+                frame = rx.next_frame()
+    
     def query(self, command):
         """Send query command and return response"""
         self.send_command(command)
@@ -204,45 +408,36 @@ class M2000_USB:
         Returns:
             Dictionary with measurement data
         """
-        # Build READ command using correct M2000 syntax
-        read_fields = []
-        for param in parameters:
-            for channel in channels:
-                # Convert parameter names to M2000 format
-                m2000_param = param
-                if param == 'V':
-                    m2000_param = 'VOLTS'
-                elif param == 'A':
-                    m2000_param = 'AMPS'
-                elif param == 'W':
-                    m2000_param = 'WATTS'
-                
-                # Use M2000 command format: READ?,ch1:VOLTS:ACDC
-                read_fields.append(f"READ?,{channel.lower()}:{m2000_param}:ACDC")
+        return self.get_measurements([(channels, parameters)])[0]
+    
+    def get_measurements(self, requests):
+        """
+        Get several channel/parameter sets with as few round trips as possible
         
-        # Send multiple READ commands (can combine with semicolons)
-        command = ";".join(read_fields)
-        response = self.query(command)
+        The READ? fields of all requests are packed into command sets of at
+        most 4095 characters; a request too large for one set is split.
         
-        if response:
-            values = response.split(',')
-            results = {}
-            
-            idx = 0
-            for param in parameters:
-                for channel in channels:
-                    if idx < len(values):
-                        try:
-                            results[f"{channel}_{param}"] = float(values[idx])
-                        except ValueError:
-                            results[f"{channel}_{param}"] = values[idx]
-                        idx += 1
-            
-            return results
-        return None
+        Args:
+            requests: List of (channels, parameters) pairs
+        
+        Returns:
+            List with a measurement dictionary (or None) per request
+        """
+        # Command sets and response mapping are compiled once per request list
+        packer = pack_reads(requests)
+        # All command sets go out together, sharing HID reports
+        responses = self.query_many(packer.commands)
+        if self.stats is None:
+            return packer.unpack(responses)
+        
+        parse_start = time.monotonic_ns()
+        results = packer.unpack(responses)
+        self.stats.parsed('READ?', time.monotonic_ns() - parse_start)
+        return results
     
     def stream_data(self, channels=['CH1'], parameters=['V', 'A', 'W'], 
-                   duration=10, sample_rate=2.0, log_file=None):
+                   duration=10, sample_rate=2.0, log_file=None, policy='skip', log_options=None,
+                   energy_options=None):
         """
         Stream measurement data for specified duration
         
@@ -250,104 +445,135 @@ class M2000_USB:
             channels: List of channels to monitor
             parameters: List of parameters to read
             duration: Duration in seconds (0 = infinite)
-            sample_rate: Samples per second (USB is slower, max ~10Hz practical)
-            log_file: Optional CSV file to log data
+            sample_rate: Samples per second (at least one HID report each way per
+                         sample), 0 = as fast as possible, 'auto' = measure the sustainable rate first
+            log_file: Optional CSV file to log data (.m2b = binary log, see m2000_binlog)
+            policy: Missed deadline policy, 'skip' or 'catchup' (see m2000_schedule)
+            log_options: LogWriter batching, fsync and queue options (see m2000_log)
+            energy_options: Integrate W/VA/VAR into energy while streaming: windows,
+                            gap policy and report (see m2000_energy.open_energy)
+        
+        Returns:
+            Scheduler statistics (ticks, achieved rate, overruns, missed deadlines)
         """
-        print(f"Streaming data from {channels} for {duration}s at {sample_rate}Hz")
-        print("Note: USB interface is slower than LAN/RS232")
+        if sample_rate == 'auto':
+            sample_rate = self.measure_sample_rate(channels, parameters)
+        
+        # Absolute monotonic deadlines - no drift, immune to wall-clock jumps
+        scheduler = DeadlineScheduler(sample_rate, duration, policy)
+        rate_text = f"{sample_rate:.1f}Hz" if scheduler.sample_rate else "maximum rate"
+        print(f"Streaming data from {channels} for {duration}s at {rate_text}")
         if log_file:
             print(f"Logging to: {log_file}")
         print("Press Ctrl+C to stop\n")
         
-        # Set up initial READ command using correct M2000 syntax
-        read_fields = []
-        for param in parameters:
-            for channel in channels:
-                # Convert parameter names to M2000 format
-                m2000_param = param
-                if param == 'V':
-                    m2000_param = 'VOLTS'
-                elif param == 'A':
-                    m2000_param = 'AMPS'
-                elif param == 'W':
-                    m2000_param = 'WATTS'
-                
-                # Use M2000 command format: READ?,ch1:VOLTS:ACDC
-                read_fields.append(f"READ?,{channel.lower()}:{m2000_param}:ACDC")
+        # Compiled READ? command, result keys and parser
+        plan = compile_plan(channels, parameters)
         
-        command = ";".join(read_fields)
+        # Wh/VAh/VARh integrated on the host (m2000_energy)
+        energy = None
+        if energy_options is not None:
+            from m2000_energy import close_energy, open_energy
+            energy = open_energy(plan.keys, scheduler.start_wall, **energy_options)
         
-        # Prepare CSV header
+        # CSV rows (or .m2b binary records) are built and written on the log writer thread
+        log = None
         if log_file:
-            header = "Timestamp"
-            for param in parameters:
-                for channel in channels:
-                    header += f",{channel}_{param}"
-            header += "\n"
+            # The logging stack (m2000_log, binlog, segments, index, rollup) loads on demand
+            from m2000_log import close_log, open_log
+            
+            def format_row(record):
+                timestamp, _, response = record
+                return f"{timestamp:.3f},{response}\n"
             
-            with open(log_file, 'w') as f:
-                f.write(header)
+            log = open_log(log_file, "Timestamp," + ",".join(plan.keys), format_row,
+                           plan=plan, time_origin=scheduler.start_wall, **(log_options or {}))
         
-        start_time = time.time()
         sample_count = 0
+        completed = False
+        stats = self.stats
         
         try:
-            while True:
-                sample_start = time.time()
-                
-                # Check duration
-                if duration > 0 and (sample_start - start_time) > duration:
-                    break
-                
+            for timestamp in scheduler:
                 # Get measurement
                 if sample_count == 0:
                     # First reading - use READ?
-                    response = self.query(command)
+                    response = self.query(plan.command)
                 else:
                     # Subsequent readings - use REREAD? for speed
                     response = self.query('REREAD?')
                 
                 if response:
-                    values = response.split(',')
-                    timestamp = sample_start - start_time
+                    parse_start = time.monotonic_ns() if stats is not None else 0
+                    parsed = plan.parse_values(response)
+                    if stats is not None:
+                        stats.parsed('READ?' if sample_count == 0 else 'REREAD?', time.monotonic_ns() - parse_start)
                     
                     # Format console output
                     output = f"[{timestamp:8.2f}s] "
-                    idx = 0
-                    for param in parameters:
-                        for channel in channels:
-                            if idx < len(values):
-                                try:
-                                    val = float(values[idx])
-                                    output += f"{channel}_{param}={val:>8.3f} "
-                                except ValueError:
-                                    output += f"{channel}_{param}={values[idx]:>8} "
-                                idx += 1
+                    for key, value in zip(plan.keys, parsed):
+                        if isinstance(value, float):
+                            output += f"{key}={value:>8.3f} "
+                        else:
+                            output += f"{key}={value:>8} "
                     
                     print(output)
                     sample_count += 1
                     
-                    # Log to file
-                    if log_file:
-                        log_line = f"{timestamp:.3f}"
-                        for value in values:
-                            log_line += f",{value}"
-                        log_line += "\n"
-                        
-                        with open(log_file, 'a') as f:
-                            f.write(log_line)
-                
-                # Wait for next sample (accounting for processing time)
-                elapsed = time.time() - sample_start
-                sleep_time = max(0, (1.0 / sample_rate) - elapsed)
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                    # Queue for the log writer - no disk I/O on the acquisition path
+                    if log:
+                        log.write((timestamp, parsed, response))
+                    if energy:
+                        energy.add(timestamp, parsed)
                 
+            completed = True
         except KeyboardInterrupt:
             print(f"\nStreaming stopped. Collected {sample_count} samples")
+            completed = True
+        finally:
+            # Close each output even if the other fails; while an exception is
+            # already stopping the stream, a log writer error is only printed
+            try:
+                if energy:
+                    close_energy(energy)
+            except Exception:
+                completed = False
+                raise
+            finally:
+                if log:
+                    close_log(log, raise_error=completed)
+        
+        print(f"Schedule: {scheduler.summary()}")
+        return scheduler.stats()
+    
+    def measure_sample_rate(self, channels=['CH1'], parameters=['V', 'A', 'W'], count=20):
+        """
+        Measure the REREAD? rate this link can sustain for a channel/parameter set
+        
+        Args:
+            channels: List of channels
+            parameters: List of parameters
+            count: Number of REREAD? round trips to time
+        
+        Returns:
+            Sustainable samples per second (90% of the measured rate)
+        """
+        plan = compile_plan(channels, parameters)
+        self.query(plan.command)  # Arm REREAD?
+        
+        def run(n):
+            for _ in range(n):
+                self.query('REREAD?')
+        
+        rate = measure_rate(run, count)
+        print(f"Sustainable rate: {rate:.1f} Hz")
+        return rate
 
 
 def main():
+    from m2000_log import add_log_arguments, writer_options
+    from m2000_energy import add_energy_arguments, meter_options
+    
     parser = argparse.ArgumentParser(description='APS M2000 USB Interface')
     parser.add_argument('--list', action='store_true',
                        help='List available M2000 USB devices')
@@ -363,17 +589,29 @@ def main():
                        help='Stream data continuously')
     parser.add_argument('--duration', type=float, default=10,
                        help='Stream duration in seconds (default: 10)')
-    parser.add_argument('--rate', type=float, default=2.0,
-                       help='Sample rate in Hz (default: 2.0, USB is slower)')
+    parser.add_argument('--rate', type=parse_rate, default=2.0,
+                       help="Sample rate in Hz, 'max' or 'auto' (default: 2.0)")
+    parser.add_argument('--policy', choices=POLICIES, default='skip',
+                       help='Missed deadline policy while streaming (default: skip)')
     parser.add_argument('--log', type=str,
                        help='CSV file to log streaming data')
+    add_log_arguments(parser)
+    add_energy_arguments(parser)
     parser.add_argument('--timeout', type=int, default=5000,
                        help='Read timeout in milliseconds (default: 5000)')
+    parser.add_argument('--warm', action='store_true',
+                       help='Connect without *RST/*CLS, keeping the instrument configuration')
+    parser.add_argument('--stats', action='store_true',
+                       help='Print per-command latency histograms and transport counters at exit')
+    parser.add_argument('--reader-thread', action='store_true',
+                       help='Read HID reports on a background thread into a response queue')
     
     args = parser.parse_args()
     
     # Create M2000 interface
-    m2000 = M2000_USB(timeout=args.timeout)
+    m2000 = M2000_USB(timeout=args.timeout, reader_thread=args.reader_thread)
+    if args.stats:
+        m2000.enable_stats()
     
     # List devices mode
     if args.list:
@@ -396,7 +634,7 @@ def main():
     
     try:
         # Connect
-        if not m2000.connect(args.device):
+        if not m2000.connect(args.device, warm=args.warm):
             print("Failed to connect to M2000")
             return 1
         
@@ -410,7 +648,10 @@ def main():
                 parameters=args.params,
                 duration=args.duration,
                 sample_rate=args.rate,
-                log_file=args.log
+                log_file=args.log,
+                policy=args.policy,
+                log_options=writer_options(args),
+                energy_options=meter_options(args)
             )
         else:
             # Single measurement
@@ -428,6 +669,8 @@ def main():
         print(f"Error: {e}")
         return 1
     finally:
+        if m2000.stats is not None:
+            print("\n" + m2000.stats.summary())
         m2000.disconnect()
     
     return 0
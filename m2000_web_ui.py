@@ -5,6 +5,7 @@ Web-based interface with live data streaming and visualization
 """
 
 import asyncio
+import concurrent.futures
 import websockets
 import json
 import threading
@@ -15,25 +16,56 @@ import os
 import sys
 from urllib.parse import parse_qs, urlparse
 
-# Import M2000 interfaces
+# Import M2000 interfaces (asyncio clients; RS232/USB drivers load on demand)
 try:
-    from m2000_lan import M2000_LAN
-    from m2000_rs232 import M2000_RS232  
-    from m2000_usb import M2000_USB
+    from m2000_async import AsyncM2000_LAN, AsyncM2000_RS232, AsyncM2000_USB
     from m2000_units import format_measurement, get_base_unit
+    from m2000_ring import DEFAULT_MAX_BYTES, SampleRing
 except ImportError as e:
     print(f"Error importing M2000 modules: {e}")
     sys.exit(1)
 
 
+def format_measurements(data):
+    """
+    Group a sample by channel for the dashboard
+
+    Args:
+        data: {'CH1_V': 230.1, ...}; unavailable values are NaN
+
+    Returns:
+        {'CH1': {'V': {'raw', 'formatted', 'unit'}}} - NaN becomes None (JSON null,
+        a gap in the charts), since json.dumps would write a bare NaN that
+        JSON.parse rejects
+    """
+    formatted_data = {}
+    for key, value in data.items():
+        if '_' in key:
+            channel, param = key.split('_', 1)
+            if channel not in formatted_data:
+                formatted_data[channel] = {}
+
+            # Add both raw and formatted values
+            formatted_data[channel][param] = {
+                'raw': None if value != value else value,
+                'formatted': format_measurement(value, param, include_units=True),
+                'unit': get_base_unit(param)
+            }
+    return formatted_data
+
+
 class M2000WebServer:
-    def __init__(self, web_port=8080, websocket_port=8081):
+    def __init__(self, web_port=8080, websocket_port=8081, history_bytes=DEFAULT_MAX_BYTES):
         self.web_port = web_port
         self.websocket_port = websocket_port
         self.m2000 = None
+        self.stream_task = None
+        self.loop = None  # Event loop of run(); the HTTP thread hands work to it
         self.running = False
         self.connected_clients = set()
         self.current_data = {}
+        self.history_bytes = history_bytes
+        self.history = None  # SampleRing of recent samples, reset when the keys change
         self.sample_rate = 2.0
         self.channels = ['CH1']
         self.parameters = ['V', 'A', 'W']
@@ -54,14 +86,18 @@ class M2000WebServer:
             }
             await websocket.send(json.dumps(config_msg))
             
+            # Recent samples first, so a reconnecting client can redraw its charts
+            if self.history is not None and len(self.history):
+                await websocket.send(json.dumps(self.get_history(points=100)))
+            
             # Send current data if available
             if self.current_data:
                 data_msg = {
                     'type': 'data',
                     'timestamp': time.time(),
-                    'measurements': self.current_data
+                    'measurements': format_measurements(self.current_data)
                 }
-                await websocket.send(json.dumps(data_msg))
+                await websocket.send(json.dumps(data_msg, allow_nan=False))
             
             # Handle incoming messages
             async for message in websocket:
@@ -96,7 +132,7 @@ class M2000WebServer:
             
         elif msg_type == 'disconnect':
             # Disconnect from M2000
-            self.disconnect_m2000()
+            await self.disconnect_m2000()
             response = {
                 'type': 'disconnect_response',
                 'success': True
@@ -119,31 +155,57 @@ class M2000WebServer:
                 }
             }
             await websocket.send(json.dumps(response))
+            
+        elif msg_type == 'history':
+            # Chart history from the server's ring buffer
+            response = self.get_history(msg.get('seconds'), msg.get('points'), msg.get('keys'))
+            await websocket.send(json.dumps(response))
+    
+    def get_history(self, seconds=None, points=None, keys=None):
+        """Recent samples from the ring buffer as a 'history' message"""
+        message = {'type': 'history', 'times': [], 'values': {}}
+        if self.history is not None:
+            message.update(self.history.snapshot(seconds, points, keys))
+        return message
+    
+    def record_sample(self, timestamp, data):
+        """Append a sample to the ring buffer, starting a new one when the keys change"""
+        history = self.history
+        if history is None or history.keys != tuple(data):
+            try:
+                history = self.history = SampleRing(data, max_bytes=self.history_bytes)
+            except (ImportError, ValueError) as e:
+                print(f"Sample history disabled: {e}")
+                self.history_bytes = 0
+                return
+        history.append(timestamp, tuple(data.values()))
     
     async def connect_m2000(self, interface, config):
         """Connect to M2000 device"""
         try:
+            connect_args = []
             if interface == 'lan':
                 host = config.get('host', '192.168.1.100')
                 port = config.get('port', 10733)
-                self.m2000 = M2000_LAN(host=host, port=port)
+                self.m2000 = AsyncM2000_LAN(host=host, port=port)
                 
             elif interface == 'rs232':
                 port = config.get('port', '/dev/ttyUSB0')
                 baudrate = config.get('baudrate', 9600)
-                self.m2000 = M2000_RS232(port=port, baudrate=baudrate)
+                self.m2000 = AsyncM2000_RS232(port=port, baudrate=baudrate)
                 
             elif interface == 'usb':
-                device_index = config.get('device_index', 0)
-                self.m2000 = M2000_USB()
+                connect_args = [config.get('device_index', 0)]
+                self.m2000 = AsyncM2000_USB()
                 
             else:
                 return False
             
-            # Connect in a separate thread to avoid blocking
-            success = await asyncio.get_event_loop().run_in_executor(
-                None, self.m2000.connect, *([device_index] if interface == 'usb' else [])
-            )
+            # Per-query latency histograms for /api/stats
+            self.m2000.enable_stats()
+            
+            # LAN connects on the event loop; RS232/USB use their own worker thread
+            success = await self.m2000.connect(*connect_args)
             
             if success:
                 # Start data streaming
@@ -158,11 +220,14 @@ class M2000WebServer:
             self.m2000 = None
             return False
     
-    def disconnect_m2000(self):
+    async def disconnect_m2000(self):
         """Disconnect from M2000 device"""
+        if self.stream_task:
+            self.stream_task.cancel()
+            self.stream_task = None
         if self.m2000:
             try:
-                self.m2000.disconnect()
+                await self.m2000.disconnect()
             except:
                 pass
             finally:
@@ -170,84 +235,49 @@ class M2000WebServer:
     
     def start_data_streaming(self):
         """Start streaming data from M2000"""
-        if not self.m2000 or not getattr(self.m2000, 'connected', False):
+        if not self.m2000 or not self.m2000.connected:
             return
         
-        def stream_worker():
-            """Worker thread for data streaming"""
-            sample_count = 0
-            
-            while self.m2000 and getattr(self.m2000, 'connected', False):
-                try:
-                    # Get measurement data
-                    if sample_count == 0:
-                        # First reading
-                        data = self.m2000.get_measurement(self.channels, self.parameters)
-                    else:
-                        # Use REREAD? for speed if available
-                        try:
-                            response = self.m2000.query('REREAD?')
-                            if response:
-                                values = response.split(',')
-                                data = {}
-                                idx = 0
-                                for param in self.parameters:
-                                    for channel in self.channels:
-                                        if idx < len(values):
-                                            try:
-                                                data[f"{channel}_{param}"] = float(values[idx])
-                                            except ValueError:
-                                                data[f"{channel}_{param}"] = values[idx]
-                                            idx += 1
-                            else:
-                                data = self.m2000.get_measurement(self.channels, self.parameters)
-                        except:
-                            data = self.m2000.get_measurement(self.channels, self.parameters)
+        # Stream as a task on the event loop, no extra thread needed
+        self.stream_task = asyncio.create_task(self.stream_worker())
+    
+    async def stream_worker(self):
+        """Read samples from the M2000 and broadcast them to clients"""
+        sample_count = 0
+        
+        while self.m2000 and self.m2000.connected:
+            config = (list(self.channels), list(self.parameters), self.sample_rate)
+            try:
+                # READ? once, then REREAD? until the configuration changes
+                async for timestamp, data in self.m2000.stream(*config):
+                    if not data:
+                        continue
+                    self.current_data = data
+                    if self.history_bytes:
+                        self.record_sample(timestamp, data)
+                    sample_count += 1
                     
-                    if data:
-                        self.current_data = data
-                        sample_count += 1
-                        
-                        # Format data for web display
-                        formatted_data = {}
-                        for key, value in data.items():
-                            if '_' in key:
-                                channel, param = key.split('_', 1)
-                                if channel not in formatted_data:
-                                    formatted_data[channel] = {}
-                                
-                                # Add both raw and formatted values
-                                formatted_data[channel][param] = {
-                                    'raw': value,
-                                    'formatted': format_measurement(value, param, include_units=True),
-                                    'unit': get_base_unit(param)
-                                }
-                        
-                        # Send to all connected clients
-                        if self.connected_clients:
-                            message = {
-                                'type': 'data',
-                                'timestamp': time.time(),
-                                'measurements': formatted_data,
-                                'sample_count': sample_count
-                            }
-                            
-                            # Send to all connected clients
-                            asyncio.run_coroutine_threadsafe(
-                                self.broadcast_to_clients(json.dumps(message)),
-                                asyncio.get_event_loop()
-                            )
+                    # Format data for web display
+                    formatted_data = format_measurements(data)
                     
-                    # Wait for next sample
-                    time.sleep(1.0 / self.sample_rate)
+                    # Send to all connected clients
+                    if self.connected_clients:
+                        message = {
+                            'type': 'data',
+                            'timestamp': timestamp,
+                            'measurements': formatted_data,
+                            'sample_count': sample_count
+                        }
+                        await self.broadcast_to_clients(json.dumps(message, allow_nan=False))
                     
-                except Exception as e:
-                    print(f"Streaming error: {e}")
-                    time.sleep(1.0)  # Wait before retrying
-        
-        # Start streaming in background thread
-        thread = threading.Thread(target=stream_worker, daemon=True)
-        thread.start()
+                    if config != (self.channels, self.parameters, self.sample_rate):
+                        break
+                    
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Streaming error: {e}")
+                await asyncio.sleep(1.0)  # Wait before retrying
     
     async def broadcast_to_clients(self, message):
         """Broadcast message to all connected WebSocket clients"""
@@ -265,13 +295,60 @@ class M2000WebServer:
             # Remove disconnected clients
             self.connected_clients -= disconnected
     
+    async def get_stats(self):
+        """
+        Transport latency histograms and stream schedule statistics as a dictionary
+
+        Runs on the event loop, where the stream updates them.
+        """
+        m2000 = self.m2000
+        return {
+            'connected': bool(m2000 and m2000.connected),
+            'transport': await m2000.stats_snapshot() if m2000 else None,
+            'schedule': m2000.scheduler.stats() if m2000 and m2000.scheduler is not None else None,
+            'history': {'capacity': self.history.capacity, 'count': len(self.history),
+                        'bytes': self.history.nbytes} if self.history is not None else None,
+        }
+    
     def start_web_server(self):
         """Start HTTP server for web interface"""
+        web_ui = self
+        
         class M2000Handler(SimpleHTTPRequestHandler):
             def __init__(self, *args, **kwargs):
                 super().__init__(*args, directory='/home/bob43/APSM2000', **kwargs)
             
+            def send_json(self, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
             def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/api/history':
+                    # Recent samples from RAM: ?seconds=60&points=500&keys=CH1_V,CH1_W
+                    query = parse_qs(url.query)
+                    try:
+                        seconds = float(query['seconds'][0]) if 'seconds' in query else None
+                        points = int(query['points'][0]) if 'points' in query else None
+                    except ValueError:
+                        self.send_error(400, 'seconds and points must be numbers')
+                        return
+                    keys = query['keys'][0].split(',') if 'keys' in query else None
+                    self.send_json(web_ui.get_history(seconds, points, keys))
+                    return
+                if url.path == '/api/stats':
+                    # JSON statistics: where acquisition time goes (network vs host)
+                    future = asyncio.run_coroutine_threadsafe(web_ui.get_stats(), web_ui.loop)
+                    try:
+                        self.send_json(future.result(timeout=5.0))
+                    except concurrent.futures.TimeoutError:
+                        future.cancel()
+                        self.send_error(503, 'statistics not available')
+                    return
                 if self.path == '/' or self.path == '/index.html':
                     self.path = '/m2000_dashboard.html'
                 super().do_GET()
@@ -299,6 +376,8 @@ class M2000WebServer:
     
     async def run(self):
         """Run the complete web interface"""
+        self.loop = asyncio.get_running_loop()
+        
         # Start HTTP server
         web_server = self.start_web_server()
         
@@ -315,7 +394,7 @@ class M2000WebServer:
             await asyncio.Future()  # Run forever
         except KeyboardInterrupt:
             print("\nShutting down web interface...")
-            self.disconnect_m2000()
+            await self.disconnect_m2000()
 
 
 def main():
@@ -332,11 +411,13 @@ def main():
                        help='Default parameters to read')
     parser.add_argument('--rate', type=float, default=2.0,
                        help='Default sample rate in Hz')
+    parser.add_argument('--history-mb', type=float, default=DEFAULT_MAX_BYTES / 2**20,
+                       help='Memory for recent samples served to charts, in MiB; 0 = off (default: 16)')
     
     args = parser.parse_args()
     
     # Create web server
-    server = M2000WebServer(args.web_port, args.websocket_port)
+    server = M2000WebServer(args.web_port, args.websocket_port, int(args.history_mb * 2**20))
     server.channels = args.channels
     server.parameters = args.params
     server.sample_rate = args.rate